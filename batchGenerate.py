@@ -0,0 +1,138 @@
+"""Landscaper batch generator
+
+Generates random terrains without Maya, spread across a pool of worker
+processes, and writes each one to disk as a .npz file.
+
+usage: python batchGenerate.py 1-500 --params params.json --out terrains --workers 8
+
+--obj also writes each terrain as an OBJ file (see objExport.py), with its
+trees baked in if --assets points at the folder holding tree.obj and tree2.obj.
+
+The parameter file is JSON, every key is optional:
+{
+    "options": {"trees": true, "sea": true, "mountains": true, "lowSubdivs": false, "cube": true, "caves": true, "erosion": true},
+    "overrides": {"trees": {"density": 0.3}}
+}
+
+Each terrain's seed is its number in the seed range, so any terrain of a
+batch can be regenerated on its own (or in Maya with the same seed).
+
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+import objExport
+import pipeline
+import stageCache
+
+OPTION_NAMES = ('trees', 'sea', 'mountains', 'lowSubdivs', 'cube', 'caves', 'erosion')
+
+
+def parseSeedRange(text):
+    ''' Returns the list of seeds in a range string such as '1-100' or '7' (both ends included) '''
+    if '-' in text:
+        first, last = text.split('-', 1)
+        return list(range(int(first), int(last) + 1))
+    return [int(text)]
+
+def loadParameterFile(path):
+    ''' Returns (options, overrides) read from the JSON parameter file, or the defaults if path is None '''
+    settings = {}
+    if path is not None:
+        with open(path) as parameterFile:
+            settings = json.load(parameterFile)
+    options = dict((name, True) for name in OPTION_NAMES)
+    options['lowSubdivs'] = False
+    options.update(settings.get('options', {}))
+    return options, settings.get('overrides', {})
+
+def terrainParameters(seed, options, overrides):
+    ''' Returns the stage parameters of the terrain with the given seed '''
+    parameters = pipeline.randomParameters(seed, **options)
+    for stage in overrides:
+        parameters[stage].update(overrides[stage])
+    return parameters
+
+def saveResults(path, results):
+    ''' Writes the stage outputs a terrain is made from to a compressed .npz file
+
+    seaLevel is NaN when there is no sea, tree arrays are empty when there are no trees
+    '''
+    seaLevel = results['sea']['seaLevel']
+    trees = results['trees'] or {'positions': np.zeros((0, 3)), 'rotations': np.zeros(0), 'scales': np.zeros(0), 'tall': np.zeros(0, dtype=bool)}
+    arrays = {
+        'heights': results['rivers']['heights'],
+        'seaLevel': np.nan if seaLevel is None else seaLevel,
+        'treePositions': trees['positions'],
+        'treeRotations': trees['rotations'],
+        'treeScales': trees['scales'],
+        'treeTall': trees['tall'],
+    }
+    for i, lake in enumerate(results['lakes']):
+        arrays['lake%dCells' % i] = lake['cells']
+        arrays['lake%dLevel' % i] = lake['level']
+    for i, cave in enumerate(results['caves']):
+        arrays['cave%dPositions' % i] = cave['positions']
+        arrays['cave%dRadii' % i] = cave['radii']
+    np.savez_compressed(path, **arrays)
+
+def loadTreeMeshes(assetFolder):
+    ''' Returns the tree prototypes for objExport (scaled by 0.3 like importOBJ), or None if there is no asset folder '''
+    if assetFolder is None:
+        return None
+    treeMeshes = {}
+    for species, fileName in (('small', 'tree.obj'), ('tall', 'tree2.obj')):
+        points, faceCounts, faceConnects = objExport.readObj(os.path.join(assetFolder, fileName))
+        treeMeshes[species] = (points * 0.3, faceCounts, faceConnects)
+    return treeMeshes
+
+def generateTerrain(job):
+    ''' Worker function: generates one terrain and saves it, returns (seed, path, seconds)
+
+    job:    Tuple of (seed, options, overrides, outputFolder, cacheFolder, writeObj, assetFolder)
+    '''
+    seed, options, overrides, outputFolder, cacheFolder, writeObj, assetFolder = job
+    start = time.time()
+    cache = stageCache.StageCache(maxEntries=len(pipeline.STAGES), directory=cacheFolder)
+    results, keys, computed = pipeline.runPipeline(terrainParameters(seed, options, overrides), cache)
+    path = os.path.join(outputFolder, 'terrain_%d.npz' % seed)
+    saveResults(path, results)
+    if writeObj:
+        objExport.exportTerrain(os.path.join(outputFolder, 'terrain_%d.obj' % seed), results['rivers']['heights'],
+                                pipeline.TERRAIN_SIZE, results['sea']['seaLevel'], results['trees'], loadTreeMeshes(assetFolder), results['lakes'])
+    return seed, path, time.time() - start
+
+def main(arguments=None):
+    ''' Command line entry point '''
+    parser = argparse.ArgumentParser(description='Generate random Landscaper terrains without Maya.')
+    parser.add_argument('seeds', help="seed range, e.g. '1-500' or '42'")
+    parser.add_argument('--params', help='JSON parameter file with "options" and "overrides"')
+    parser.add_argument('--out', default='terrains', help='output folder (default: terrains)')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help='n.o. worker processes (default: all cores)')
+    parser.add_argument('--cache', help='folder for the on-disk stage cache, shared by the workers')
+    parser.add_argument('--obj', action='store_true', help='also write each terrain as an OBJ file')
+    parser.add_argument('--assets', help='folder with tree.obj and tree2.obj, bakes the trees into the OBJ files')
+    arguments = parser.parse_args(arguments)
+
+    options, overrides = loadParameterFile(arguments.params)
+    if not os.path.isdir(arguments.out):
+        os.makedirs(arguments.out)
+    jobs = [(seed, options, overrides, arguments.out, arguments.cache, arguments.obj, arguments.assets) for seed in parseSeedRange(arguments.seeds)]
+
+    start = time.time()
+    pool = multiprocessing.Pool(max(1, arguments.workers))
+    try:
+        for seed, path, seconds in pool.imap_unordered(generateTerrain, jobs):
+            print('seed %d -> %s (%.2fs)' % (seed, path, seconds))
+    finally:
+        pool.close()
+        pool.join()
+    print('%d terrains in %.1fs' % (len(jobs), time.time() - start))
+
+if __name__ == '__main__':
+    main()
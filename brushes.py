@@ -0,0 +1,92 @@
+"""Landscaper brushes
+
+Raise/lower brushes (mountains, trenches, ...) as analytic radial falloff
+kernels applied straight to the heightfield. A brush only touches the
+window of samples inside its radius, and any number of brushes are
+applied together in one vectorized pass: their windows are laid end to
+end in one array, weighted, and summed back onto the grid with a single
+bincount, so dozens of mountains cost about the same as one.
+
+A brush is a dictionary:
+x, z:            Float world position of the centre
+radius:          Float distance the brush falls off over
+height:          Float height added at the centre (negative lowers)
+profile:         String name of the falloff curve, one of PROFILES (default 'smooth')
+selectedSize:    Float width of the square in the middle moved by the full height, e.g. one face (default 0)
+
+"""
+import numpy as np
+
+PROFILES = ('smooth', 'linear', 'dome', 'peak')
+
+
+def profileWeights(t, profiles):
+    ''' Returns the falloff weight of each distance fraction t (0 at the centre, 1 at the radius)
+
+    smooth:    Maya's soft select curve, 1 - (3t^2 - 2t^3)
+    linear:    A cone, 1 - t
+    dome:      A rounded hill, sqrt(1 - t^2)
+    peak:      A sharp peak with concave sides, (1 - t)^2
+
+    profiles:    Integer array of each t's index into PROFILES
+    '''
+    t = np.clip(t, 0.0, 1.0)
+    return np.select([profiles == 0, profiles == 1, profiles == 2],
+                     [1.0 - t * t * (3.0 - 2.0 * t), 1.0 - t, np.sqrt(1.0 - t * t)],
+                     (1.0 - t) ** 2)
+
+def mountainBrushes(x, z, radius, height, selectedSize=0.0):
+    ''' Returns the brushes of a mountain like createMountain: a steep top 1 high over half the radius, then the full height over the radius '''
+    return [{'x': x, 'z': z, 'radius': 0.5 * radius, 'height': 1.0, 'selectedSize': selectedSize},
+            {'x': x, 'z': z, 'radius': radius, 'height': height, 'selectedSize': selectedSize}]
+
+def applyBrushes(heights, size, brushes, combine='add'):
+    ''' Returns a copy of the heights with every brush applied, in one pass
+
+    heights:    2D array of heights covering a size x size area (polyPlane layout)
+    size:       Float width and depth of the area in world units
+    brushes:    List of brush dictionaries (see the top of this file)
+    combine:    String 'add' to add overlapping brushes up, 'max' to keep the highest raise or 'min' the deepest lowering
+                where they overlap (like one soft select move of several faces)
+    '''
+    heights = np.asarray(heights)
+    if not brushes:
+        return heights.copy()
+    rows, columns = heights.shape
+    spacing = size / (columns - 1)
+    x = np.array([brush['x'] for brush in brushes], dtype=np.float64)
+    z = np.array([brush['z'] for brush in brushes], dtype=np.float64)
+    radius = np.array([brush['radius'] for brush in brushes], dtype=np.float64)
+    height = np.array([brush['height'] for brush in brushes], dtype=np.float64)
+    halfSelected = 0.5 * np.array([brush.get('selectedSize', 0.0) for brush in brushes], dtype=np.float64)
+    profile = np.array([PROFILES.index(brush.get('profile', 'smooth')) for brush in brushes])
+
+    # the window of samples each brush reaches, clipped to the grid
+    reach = radius + halfSelected
+    firstColumn = np.clip(np.ceil((x - reach + 0.5 * size) / spacing - 1e-9), 0, columns).astype(np.int64)
+    lastColumn = np.clip(np.floor((x + reach + 0.5 * size) / spacing + 1e-9) + 1, 0, columns).astype(np.int64)
+    firstRow = np.clip(np.ceil((0.5 * size - z - reach) / spacing - 1e-9), 0, rows).astype(np.int64)
+    lastRow = np.clip(np.floor((0.5 * size - z + reach) / spacing + 1e-9) + 1, 0, rows).astype(np.int64)
+    windowColumns = np.maximum(lastColumn - firstColumn, 0)
+    counts = np.maximum(lastRow - firstRow, 0) * windowColumns
+
+    # every window sample of every brush in one array
+    brush = np.repeat(np.arange(len(brushes)), counts)
+    local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    row = firstRow[brush] + local // np.maximum(windowColumns[brush], 1)
+    column = firstColumn[brush] + local % np.maximum(windowColumns[brush], 1)
+
+    dx = np.maximum(np.abs(-0.5 * size + column * spacing - x[brush]) - halfSelected[brush], 0.0)
+    dz = np.maximum(np.abs(0.5 * size - row * spacing - z[brush]) - halfSelected[brush], 0.0)
+    distance = np.sqrt(dx * dx + dz * dz)
+    t = np.where(radius[brush] > 0, distance / np.where(radius[brush] > 0, radius[brush], 1.0), np.where(distance > 0, 1.0, 0.0))
+    sample = row * columns + column
+    moves = height[brush] * profileWeights(t, profile[brush])
+    if combine == 'add':
+        offsets = np.bincount(sample, weights=moves, minlength=heights.size)
+    elif combine in ('max', 'min'):
+        offsets = np.zeros(heights.size)
+        (np.maximum if combine == 'max' else np.minimum).at(offsets, sample, moves)
+    else:
+        raise ValueError("combine must be 'add', 'max' or 'min', not %r" % (combine,))
+    return (heights + offsets.reshape(heights.shape)).astype(heights.dtype)
@@ -0,0 +1,105 @@
+"""Landscaper caves
+
+Maya-free part of the cave generator: the random walk of spheres that
+make up a cave, blended into one shape as a smooth-min signed distance
+field on a voxel grid and turned into a single mesh, so Maya only has to
+cut it out of the terrain.
+
+"""
+import numpy as np
+
+import heightfield
+import meshBuild
+
+VOXEL_SIZE = 0.35
+BLEND = 1.0 #how far (in world units) the spheres melt into each other
+
+
+def caveSpheres(sphereRadiusMax, sphereRadiusMin, noSpheres, seed=None):
+    ''' Random walks a chain of spheres and returns where the cave goes
+
+    sphereRadiusMax:    Float biggest sphere radius
+    sphereRadiusMin:    Float smallest sphere radius
+    noSpheres:          Integer n.o. spheres in the cave
+    seed:               Integer seed or RandomState
+
+    up, left:           Booleans storing which way the walk is currently heading
+
+    Returns a dictionary:
+    positions:          (noSpheres, 3) array of the sphere centres
+    radii:              (noSpheres,) array of the sphere radii
+    subdivisions:       (noSpheres, 2) integer array of the sphere axis/height subdivisions (4 to 6)
+    offset:             (3,) array the whole cave is moved by to sink it into the terrain
+    rotation:           Float y rotation of the whole cave in degrees
+    '''
+    rng = heightfield.getRandomState(seed)
+    position = np.zeros(3)
+    up = True
+    left = True
+    positions = []
+    for i in range(noSpheres):
+        #calculate their positions
+        xPosDiff = rng.uniform(2, 3)
+        yPosDiff = rng.uniform(-1, 1)
+        zPosDiff = rng.uniform(-1, 1)
+        if up == True:
+            position[1] += 1.5
+        else:
+            position[1] -= 1.5
+        if left == True:
+            position[2] -= 1.5
+        else:
+            position[2] += 1.5
+        up = yPosDiff > 0
+        left = zPosDiff <= 0
+        position += (xPosDiff, yPosDiff, zPosDiff)
+        positions.append(position.copy())
+
+    return {
+        'positions': np.array(positions).reshape(-1, 3),
+        'radii': rng.uniform(sphereRadiusMin, sphereRadiusMax, noSpheres),
+        'subdivisions': rng.randint(4, 7, (noSpheres, 2)),
+        'offset': np.array([-20.0, rng.uniform(-5, -12), 0.0]),
+        'rotation': float(rng.randint(0, 361)),
+    }
+
+def smoothMin(a, b, blend):
+    ''' Polynomial smooth minimum of two distance arrays, rounding the crease where they meet over about the blend distance '''
+    if blend <= 0:
+        return np.minimum(a, b)
+    h = np.clip(0.5 + 0.5 * (b - a) / blend, 0.0, 1.0)
+    return b + (a - b) * h - blend * h * (1.0 - h)
+
+def caveField(positions, radii, voxelSize=VOXEL_SIZE, blend=BLEND):
+    ''' Samples the signed distance to the blended spheres on a grid round them
+
+    positions:    (k, 3) array of the sphere centres
+    radii:        (k,) array of the sphere radii
+
+    Returns (field, origin): the 3D distance array (negative inside the cave) and the position of field[0, 0, 0]
+    '''
+    margin = 2 * voxelSize + blend
+    lower = (positions - radii[:, None]).min(axis=0) - margin
+    upper = (positions + radii[:, None]).max(axis=0) + margin
+    axes = [lower[axis] + voxelSize * np.arange(int(np.ceil((upper[axis] - lower[axis]) / voxelSize)) + 1) for axis in range(3)]
+    x, y, z = np.meshgrid(axes[0], axes[1], axes[2], indexing='ij', sparse=True)
+    field = None
+    for position, radius in zip(positions, radii):
+        distance = np.sqrt((x - position[0]) ** 2 + (y - position[1]) ** 2 + (z - position[2]) ** 2) - radius
+        field = distance if field is None else smoothMin(field, distance, blend)
+    return field, lower
+
+def caveMesh(spheres, voxelSize=VOXEL_SIZE, blend=BLEND):
+    ''' Returns (points, faceCounts, faceConnects) of a cave from caveSpheres, already moved and rotated into the terrain
+
+    Like moving then rotating the merged spheres in Maya: rotated about the y axis through the cave's origin, then offset.
+    '''
+    field, origin = caveField(spheres['positions'], spheres['radii'], voxelSize, blend)
+    points, faceCounts, faceConnects = meshBuild.isosurface(field, origin, voxelSize)
+    angle = np.radians(spheres['rotation'])
+    cos, sin = np.cos(angle), np.sin(angle)
+    placed = np.empty_like(points)
+    placed[:, 0] = cos * points[:, 0] + sin * points[:, 2]
+    placed[:, 1] = points[:, 1]
+    placed[:, 2] = cos * points[:, 2] - sin * points[:, 0]
+    return placed + spheres['offset'], faceCounts, faceConnects
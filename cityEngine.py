@@ -0,0 +1,161 @@
+"""Landscaper city engine
+
+Maya-free layout of buildings. Every selected face (or every face inside a
+mask) is split into a grid of lots, buildingsPerFace of them are picked per
+face, and the position, size, rotation and height of every building are
+drawn as arrays, so a city of thousands of buildings is laid out in a few
+array operations and created in Maya in one batched step.
+
+"""
+import numpy as np
+
+import flatten
+import heightfield
+
+
+def facesInMask(topologyIndex, mask):
+    ''' Returns an integer array of the faces whose vertices are all inside the mask
+
+    mask:    Boolean array with one entry per vertex (e.g. the flat land above the sea)
+    '''
+    mask = np.asarray(mask, dtype=bool)
+    faceOf = np.repeat(np.arange(len(topologyIndex.faceCounts)), topologyIndex.faceCounts)
+    outside = np.bincount(faceOf, weights=~mask[topologyIndex.faceConnects], minlength=len(topologyIndex.faceCounts))
+    return np.nonzero(outside == 0)[0]
+
+def faceQuads(points, topologyIndex, faces):
+    ''' Returns an (f, 4, 3) array of the corners of each face
+
+    Faces that aren't quads get their centre as all four corners, so their lots all sit in the middle.
+    '''
+    points = np.asarray(points, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64)
+    vertices, faceOf = flatten.faceCorners(topologyIndex, faces)
+    counts = topologyIndex.faceCounts[faces]
+    centres = np.stack([np.bincount(faceOf, weights=points[vertices, axis], minlength=len(faces)) for axis in range(3)], axis=1) / counts[:, None]
+    quads = np.repeat(centres[:, None, :], 4, axis=1)
+    isQuad = counts == 4
+    quads[isQuad] = points[vertices[np.repeat(isQuad, counts)]].reshape(-1, 4, 3)
+    return quads
+
+def layoutBuildings(points, topologyIndex, faces, buildingsPerFace, minSize, maxSize, rotation=0.0, rotationJitter=0.0, heightRange=(0.0, 0.0), seed=None):
+    ''' Lays out buildingsPerFace buildings on every face and returns their transforms
+
+    Each face is split into a k x k grid of lots (k = ceil(sqrt(buildingsPerFace))), buildingsPerFace
+    of them are picked at random and every building is scaled down by k so it fits its lot.
+
+    points:              (n, 3) array of vertex positions
+    topologyIndex:       TopologyIndex of the mesh
+    faces:               Integer array of the faces to build on
+    buildingsPerFace:    Integer n.o. buildings on each face
+    minSize:             Float minimum building size (scale factor %)
+    maxSize:             Float maximum building size (scale factor %)
+    rotation:            Float y rotation of every building in degrees
+    rotationJitter:      Float max/min limits of a random change to each building's rotation
+    heightRange:         (low, high) Floats limits of how far each building's roof is raised (in prototype units)
+    seed:                Integer seed or RandomState
+
+    Returns a dictionary of arrays with one entry per building:
+    positions:    (k, 3) array of the centre of the bottom of each building
+    rotations:    (k,) array of the y rotations in degrees
+    scales:       (k,) array of the uniform scale factors
+    heights:      (k,) array of how far each roof is raised
+    faces:        (k,) array of the face each building stands on
+    '''
+    rng = heightfield.getRandomState(seed)
+    faces = np.asarray(faces, dtype=np.int64)
+    lotsPerSide = int(np.ceil(np.sqrt(buildingsPerFace)))
+    quads = faceQuads(points, topologyIndex, faces)
+
+    '''pick buildingsPerFace different lots on every face'''
+    lots = rng.rand(len(faces), lotsPerSide * lotsPerSide).argsort(axis=1)[:, :buildingsPerFace].ravel()
+    buildingFaces = np.repeat(np.arange(len(faces)), buildingsPerFace)
+    u = ((lots % lotsPerSide + 0.5) / lotsPerSide)[:, None]
+    v = ((lots // lotsPerSide + 0.5) / lotsPerSide)[:, None]
+    corners = quads[buildingFaces]
+    positions = (1 - u) * (1 - v) * corners[:, 0] + u * (1 - v) * corners[:, 1] + u * v * corners[:, 2] + (1 - u) * v * corners[:, 3]
+
+    count = len(positions)
+    return {
+        'positions': positions,
+        'rotations': rotation + rng.uniform(-rotationJitter, rotationJitter, count),
+        'scales': rng.uniform(minSize, maxSize, count) / (100.0 * lotsPerSide),
+        'heights': rng.uniform(heightRange[0], heightRange[1], count),
+        'faces': faces[buildingFaces],
+    }
+
+def prototypeBase(points):
+    ''' Returns the (x, y, z) middle of the bottom of a prototype's points '''
+    points = np.asarray(points, dtype=np.float64)
+    low, high = points.min(axis=0), points.max(axis=0)
+    return np.array([(low[0] + high[0]) / 2.0, low[1], (low[2] + high[2]) / 2.0])
+
+def groundPrototype(points):
+    ''' Returns a copy of a prototype's points moved so the middle of its bottom is at the origin '''
+    return np.array(points, dtype=np.float64) - prototypeBase(points)
+
+def rotateY(vectors, degrees):
+    ''' Returns the (k, ..., 3) vectors rotated about y by each of the k angles, the same direction as cmds.rotate '''
+    vectors = np.array(vectors, dtype=np.float64)
+    angles = np.radians(degrees).reshape((-1,) + (1,) * (vectors.ndim - 2))
+    cos, sin = np.cos(angles), np.sin(angles)
+    x, z = vectors[..., 0].copy(), vectors[..., 2].copy()
+    vectors[..., 0] = cos * x + sin * z
+    vectors[..., 2] = cos * z - sin * x
+    return vectors
+
+def raiseRoof(prototypePoints, heights):
+    ''' Returns a (k, n, 3) array of the prototype raised by each height
+
+    Vertices in the top half of the prototype move up by the height, like moving its roof face,
+    the roof is never lowered below a tenth of the prototype's height.
+    '''
+    prototypePoints = np.asarray(prototypePoints, dtype=np.float64)
+    top = prototypePoints[:, 1].max()
+    roof = prototypePoints[:, 1] > 0.5 * top
+    heights = np.maximum(heights, -0.9 * top)
+    raised = np.repeat(prototypePoints[None, :, :], len(heights), axis=0)
+    raised[:, roof, 1] += heights[:, None]
+    return raised
+
+def buildingMeshes(prototypePoints, faceCounts, faceConnects, layout):
+    ''' Returns (points, faceCounts, faceConnects) of one mesh holding every building of the layout
+
+    prototypePoints:              (n, 3) array of the building's points, from groundPrototype
+    faceCounts, faceConnects:     The building's faces
+    layout:                       Dictionary of arrays from layoutBuildings
+    '''
+    count = len(layout['positions'])
+    raised = rotateY(raiseRoof(prototypePoints, layout['heights']) * layout['scales'][:, None, None], layout['rotations'])
+    raised += layout['positions'][:, None, :]
+
+    faceConnects = np.asarray(faceConnects, dtype=np.int64)
+    offsets = np.arange(count, dtype=np.int64)[:, None] * len(prototypePoints)
+    return raised.reshape(-1, 3), np.tile(np.asarray(faceCounts, dtype=np.int64), count), (faceConnects[None, :] + offsets).ravel()
+
+def heightScales(prototypePoints, heights):
+    ''' Returns the y scale of each building stretching the prototype to the height its raised roof would have '''
+    prototypePoints = np.asarray(prototypePoints, dtype=np.float64)
+    top = prototypePoints[:, 1].max() - prototypePoints[:, 1].min()
+    if top <= 0:
+        return np.ones(len(heights))
+    return np.maximum(top + np.asarray(heights, dtype=np.float64), 0.1 * top) / top
+
+def instanceTransforms(prototypePoints, layout):
+    ''' Returns (translations, rotations, scales) (k, 3) arrays placing an instance of the prototype per building
+
+    Instances share the prototype's mesh, so instead of raising the roof each building is stretched
+    in y to the height the raised roof would have.
+
+    prototypePoints:    (n, 3) array of the prototype's object space points (not grounded)
+    layout:             Dictionary of arrays from layoutBuildings
+    '''
+    prototypePoints = np.asarray(prototypePoints, dtype=np.float64)
+    base = prototypeBase(prototypePoints)
+    count = len(layout['positions'])
+    scales = np.repeat(layout['scales'][:, None], 3, axis=1)
+    scales[:, 1] *= heightScales(prototypePoints, layout['heights'])
+    translations = layout['positions'] - rotateY(base[None, :] * scales, layout['rotations']) #puts the bottom of each instance on its lot
+    rotations = np.zeros((count, 3))
+    rotations[:, 1] = layout['rotations']
+    return translations, rotations, scales
@@ -0,0 +1,74 @@
+"""Landscaper derived maps
+
+Normals, slope and aspect of a whole heightfield from finite differences,
+cached next to the heightfield until its heights change.
+
+Grid layout (the same as the terrain polyPlane): row 0 is the +z edge and
+column 0 is the -x edge, so x grows with the column and z shrinks with the row.
+
+"""
+import numpy as np
+
+
+def heightGradients(heights, spacing):
+    ''' Returns (dh/dx, dh/dz) arrays of the heightfield's slope along each world axis
+
+    heights:    2D array of heights
+    spacing:    Float world distance between neighbouring samples
+    '''
+    heights = np.asarray(heights, dtype=np.float64)
+    dRow, dColumn = np.gradient(heights, spacing)
+    return dColumn, -dRow #z shrinks as the row grows
+
+def gridNormals(heights, spacing):
+    ''' Returns a (rows, columns, 3) array of unit normals '''
+    dx, dz = heightGradients(heights, spacing)
+    normals = np.stack((-dx, np.ones_like(dx), -dz), axis=-1)
+    return normals / np.sqrt((normals ** 2).sum(axis=-1))[..., None]
+
+def gridSlope(heights, spacing):
+    ''' Returns a 2D array of the slope angle in degrees (0 is flat, 90 is a vertical cliff) '''
+    dx, dz = heightGradients(heights, spacing)
+    return np.degrees(np.arctan(np.sqrt(dx * dx + dz * dz)))
+
+def gridAspect(heights, spacing):
+    ''' Returns a 2D array of the direction each slope faces (downhill), in degrees clockwise from +z seen from above
+
+    Flat samples have an aspect of 0.
+    '''
+    dx, dz = heightGradients(heights, spacing)
+    return np.degrees(np.arctan2(-dx, -dz)) % 360.0
+
+
+class DerivedMaps(object):
+    ''' Lazily computed maps of a Heightfield, thrown away whenever its version changes
+
+    field:      The Heightfield the maps are computed from
+    version:    The field version the cached maps belong to
+    maps:       Dictionary of the maps computed so far
+    '''
+    def __init__(self, field):
+        self.field = field
+        self.version = None
+        self.maps = {}
+
+    def getMap(self, name, function):
+        ''' Returns the named map, computing it with function(heights, spacing) if it isn't cached '''
+        if self.version != self.field.version:
+            self.maps = {}
+            self.version = self.field.version
+        if name not in self.maps:
+            self.maps[name] = function(self.field.heights, self.field.spacing)
+        return self.maps[name]
+
+    def normals(self):
+        ''' Returns the (rows, columns, 3) array of unit normals '''
+        return self.getMap('normals', gridNormals)
+
+    def slope(self):
+        ''' Returns the 2D array of slope angles in degrees '''
+        return self.getMap('slope', gridSlope)
+
+    def aspect(self):
+        ''' Returns the 2D array of slope directions in degrees '''
+        return self.getMap('aspect', gridAspect)
@@ -0,0 +1,112 @@
+"""Landscaper erosion
+
+Hydraulic and thermal erosion of a heightfield, every iteration done as
+whole-array NumPy updates over the four grid neighbours.
+
+Hydraulic: rain falls on every cell, water flows to lower neighbours in
+proportion to the drop of the water surface, picking up soil where it
+flows fast and dropping it where it slows down, then some evaporates.
+Thermal: soil on slopes steeper than the talus angle slides down to the
+lower neighbours.
+
+Soil is only ever moved between cells, so the total height is conserved
+(water and sediment never leave the grid).
+
+"""
+import numpy as np
+
+
+def neighbourDrops(field, out=None):
+    ''' Returns a (4, rows, columns) array of how far each cell is above each neighbour (0 past the border)
+
+    out:    (4, rows, columns) array to reuse, its border cells must already be 0
+    '''
+    drops = np.zeros((4,) + field.shape, dtype=field.dtype) if out is None else out
+    np.subtract(field[1:], field[:-1], out=drops[0, 1:])
+    np.negative(drops[0, 1:], out=drops[1, :-1])
+    np.subtract(field[:, 1:], field[:, :-1], out=drops[2, :, 1:])
+    np.negative(drops[2, :, 1:], out=drops[3, :, :-1])
+    return drops
+
+def gather(flows):
+    ''' Returns the amount each cell receives from its neighbours' (4, rows, columns) outflows '''
+    received = np.zeros(flows.shape[1:], dtype=flows.dtype)
+    received[:-1] += flows[0, 1:]
+    received[1:] += flows[1, :-1]
+    received[:, :-1] += flows[2, :, 1:]
+    received[:, 1:] += flows[3, :, :-1]
+    return received
+
+def spread(drops, amount):
+    ''' Splits each cell's outgoing amount between its neighbours in proportion to the (positive) drops '''
+    total = drops.sum(axis=0)
+    share = np.divide(amount, total, out=np.zeros_like(total), where=total > 0)
+    return drops * share
+
+def hydraulicErosion(heights, iterations, rain=0.01, capacity=1.0, erosionRate=0.3, depositionRate=0.3, evaporation=0.05):
+    ''' Returns a copy of the heights worn down by running water
+
+    heights:           2D array of heights
+    iterations:        Integer n.o. rain/flow/erode steps
+    rain:              Float height of water added to every cell each step
+    capacity:          Float sediment carried per unit of water flowing out of a cell (times the drop it flows down)
+    erosionRate:       Float fraction of the spare capacity picked up as soil each step
+    depositionRate:    Float fraction of the sediment over capacity dropped each step
+    evaporation:       Float fraction of the water that evaporates each step
+
+    water:             2D array of water depth on each cell
+    sediment:          2D array of soil carried by the water on each cell
+    '''
+    terrain = np.array(heights, dtype=np.float32)
+    water = np.zeros_like(terrain)
+    sediment = np.zeros_like(terrain)
+    drops = np.zeros((4,) + terrain.shape, dtype=np.float32)
+    for i in range(iterations):
+        water += rain
+
+        # water flows down the water surface, at most half the drop so it doesn't overshoot and slosh back
+        np.maximum(neighbourDrops(terrain + water, drops), 0, out=drops)
+        steepest = drops.max(axis=0)
+        outflow = np.minimum(water, 0.5 * steepest)
+        flows = spread(drops, outflow)
+        concentration = np.divide(sediment, water, out=np.zeros_like(water), where=water > 0)
+        water += gather(flows) - outflow
+        sediment += gather(flows * concentration) - outflow * concentration #sediment goes wherever its water goes
+
+        # fast (lots of water down a steep drop) water picks soil up, slow water drops it
+        spare = capacity * outflow * steepest - sediment
+        change = spare * np.where(spare > 0, np.float32(erosionRate), np.float32(depositionRate))
+        terrain -= change
+        sediment += change
+        water *= np.float32(1 - evaporation)
+
+    return (terrain + sediment).astype(np.asarray(heights).dtype) #whatever is still carried settles where it is
+
+def thermalErosion(heights, iterations, spacing, talusAngle=35.0, rate=0.5):
+    ''' Returns a copy of the heights with slopes steeper than the talus angle slumped down
+
+    heights:       2D array of heights
+    iterations:    Integer n.o. steps
+    spacing:       Float world distance between neighbouring samples
+    talusAngle:    Float steepest stable slope in degrees
+    rate:          Float fraction (0 to 1) of the excess moved each step
+    '''
+    terrain = np.array(heights, dtype=np.float32)
+    talus = np.float32(np.tan(np.radians(talusAngle)) * spacing)
+    excess = np.zeros((4,) + terrain.shape, dtype=np.float32)
+    for i in range(iterations):
+        neighbourDrops(terrain, excess)
+        excess -= talus
+        np.maximum(excess, 0, out=excess)
+        moved = np.float32(0.5 * rate) * excess.max(axis=0) #half the excess levels the steepest slope out
+        flows = spread(excess, moved)
+        terrain += gather(flows) - moved
+    return terrain.astype(np.asarray(heights).dtype)
+
+def erodeHeights(heights, hydraulicIterations, thermalIterations, size=20.0, **hydraulicSettings):
+    ''' Returns a copy of the heights after the hydraulic then the thermal erosion
+
+    size:    Float width and depth of the terrain in world units
+    '''
+    eroded = hydraulicErosion(heights, hydraulicIterations, **hydraulicSettings)
+    return thermalErosion(eroded, thermalIterations, size / (np.asarray(heights).shape[1] - 1))
@@ -0,0 +1,83 @@
+"""Landscaper flattening
+
+Flattens any number of faces at once: their vertices come from the cached
+topology index, the target heights are worked out per face, per connected
+region or for the whole selection as array operations, and an optional
+falloff ring blends the ground around them in, ready for one bulk write.
+
+"""
+import numpy as np
+
+import meshSync
+
+MODES = ('region', 'face', 'selection')
+
+
+def faceCorners(topologyIndex, faces):
+    ''' Returns (vertices, faceOf): every corner vertex of the faces and the position in faces of the face it belongs to '''
+    faces = np.asarray(faces, dtype=np.int64)
+    counts = topologyIndex.faceCounts[faces]
+    faceOf = np.repeat(np.arange(len(faces)), counts)
+    corner = np.repeat(topologyIndex.faceStarts[faces], counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return topologyIndex.faceConnects[corner], faceOf
+
+def faceRegions(topologyIndex, faces):
+    ''' Returns each face's region number, faces sharing a vertex are in the same region
+
+    Every face starts labelled with its own position, then each pass gives every vertex the smallest
+    label of its faces and every face the smallest label of its vertices (jumping each label to its
+    own label too), until nothing changes and each region holds the smallest label in it.
+    '''
+    vertices, faceOf = faceCorners(topologyIndex, faces)
+    vertexNumber = np.unique(vertices, return_inverse=True)[1]
+    labels = np.arange(len(faces))
+    while True:
+        vertexLabels = np.full(vertexNumber.max() + 1 if len(vertexNumber) else 0, len(faces), dtype=np.int64)
+        np.minimum.at(vertexLabels, vertexNumber, labels[faceOf])
+        newLabels = labels.copy()
+        np.minimum.at(newLabels, faceOf, vertexLabels[vertexNumber])
+        newLabels = newLabels[newLabels] #each label is a face of the same region, so follow it
+        if np.array_equal(newLabels, labels):
+            return np.unique(labels, return_inverse=True)[1]
+        labels = newLabels
+
+def flattenedHeights(points, topologyIndex, faces, mode='region', falloff=0.0):
+    ''' Returns the y value of every vertex after flattening the faces
+
+    points:           (n, 3) array of vertex positions
+    topologyIndex:    TopologyIndex of the mesh
+    faces:            Integer array of the faces to flatten
+    mode:             String 'region' flattens each group of touching faces to its own mean height,
+                      'face' each face to its own (vertices shared by faces get the mean of their targets),
+                      'selection' every face to the mean of the whole selection
+    falloff:          Float distance the ground around the faces is blended in over, 0 only moves the faces
+    '''
+    if mode not in MODES:
+        raise ValueError('mode must be one of %s, not %r' % (MODES, mode))
+    points = np.asarray(points, dtype=np.float64)
+    heights = points[:, 1].copy()
+    if len(faces) == 0:
+        return heights
+    vertices, faceOf = faceCorners(topologyIndex, faces)
+    if mode == 'face':
+        faceTargets = np.bincount(faceOf, weights=heights[vertices]) / np.bincount(faceOf)
+        targetSum = np.bincount(vertices, weights=faceTargets[faceOf], minlength=len(points))
+        targetCount = np.bincount(vertices, minlength=len(points))
+        selected = np.nonzero(targetCount)[0]
+        targets = targetSum[selected] / targetCount[selected]
+    else:
+        groups = faceRegions(topologyIndex, faces) if mode == 'region' else np.zeros(len(faces), dtype=np.int64)
+        selected, first = np.unique(vertices, return_index=True)
+        vertexGroups = groups[faceOf[first]] #touching faces share a region, so every corner of a vertex agrees
+        groupTargets = np.bincount(vertexGroups, weights=heights[selected]) / np.bincount(vertexGroups)
+        targets = groupTargets[vertexGroups]
+
+    flattened = heights.copy()
+    if falloff > 0:
+        # the ring blends towards the target of its closest flattened vertex
+        candidates, distance, nearest = meshSync.nearestSelected(points, selected, falloff)
+        t = np.clip(distance / falloff, 0.0, 1.0)
+        weights = 1.0 - t * t * (3.0 - 2.0 * t)
+        flattened[candidates] += weights * (targets[nearest] - heights[candidates])
+    flattened[selected] = targets
+    return flattened
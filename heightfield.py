@@ -0,0 +1,199 @@
+"""Landscaper heightfield engine
+
+Maya-free terrain generation working on NumPy float32 arrays, so the
+terrain maths can run without an open scene (and without per-cell
+interpreter overhead).
+
+"""
+import numpy as np
+
+import derivedMaps
+
+
+def getRandomState(seed=None):
+    ''' Returns a NumPy RandomState for the passed seed
+
+    seed:    Integer seed, an existing RandomState (returned untouched) or None for a random seed
+    '''
+    if isinstance(seed, np.random.RandomState):
+        return seed
+    return np.random.RandomState(seed)
+
+def diamondSquare(n, c1Height, c2Height, c3Height, c4Height, seed=None, edges=None):
+    ''' Performs the diamond square algorithm on a (2**n + 1) x (2**n + 1) grid
+        Vectorized version of the algorithm adapted from Xiaosong Yang
+
+    Every resolution level is calculated as whole-array operations: the
+    square step fills every block centre at once and the diamond step fills
+    the two interleaved sets of edge midpoints at once.
+
+    n:             Integer number of subdivision levels (the grid has 2**n quads per side)
+    c[n]Height:    Float height of a corner of the grid
+    seed:          Integer seed or RandomState used for the random offsets
+    edges:         Tuple of four (2**n + 1) arrays (top row, bottom row, left column, right column) the border
+                   is fixed to, so tiles sharing an edge match (the corners then come from the edges), or None
+
+    width:         Integer number of samples per side (2**n + 1)
+    heights:       2D float32 array, heights[row, column] matches terrain.vtx[row*width + column]
+    '''
+    rng = getRandomState(seed)
+    width = 2 ** n + 1
+    heights = np.zeros((width, width), dtype=np.float32)
+    # the four corners, laid out like the original terrainData list
+    heights[0, 0] = c1Height
+    heights[0, -1] = c2Height
+    heights[-1, -1] = c3Height
+    heights[-1, 0] = c4Height
+    if edges is not None:
+        setEdges(heights, edges)
+
+    for i in range(n, 0, -1): # different resolution
+        blockSize = 2 ** i
+        half = blockSize // 2
+
+        # square step: each block centre is the mean of its four corners plus a random offset
+        corners = heights[0:-1:blockSize, 0:-1:blockSize] + heights[0:-1:blockSize, blockSize::blockSize] + \
+                  heights[blockSize::blockSize, 0:-1:blockSize] + heights[blockSize::blockSize, blockSize::blockSize]
+        centres = 0.25 * corners + rng.random_sample(corners.shape)
+        heights[half::blockSize, half::blockSize] = centres
+
+        # diamond step (rows on the block grid, columns halfway between): left/right are block corners,
+        # up/down are the square centres, which don't exist past the top and bottom rows
+        total = heights[0::blockSize, 0:-1:blockSize] + heights[0::blockSize, blockSize::blockSize]
+        count = np.full(total.shape, 2.0, dtype=np.float32)
+        total[1:] += centres
+        count[1:] += 1
+        total[:-1] += centres
+        count[:-1] += 1
+        heights[0::blockSize, half::blockSize] = total / count + rng.random_sample(total.shape)
+
+        # diamond step (rows halfway between, columns on the block grid)
+        total = heights[0:-1:blockSize, 0::blockSize] + heights[blockSize::blockSize, 0::blockSize]
+        count = np.full(total.shape, 2.0, dtype=np.float32)
+        total[:, 1:] += centres
+        count[:, 1:] += 1
+        total[:, :-1] += centres
+        count[:, :-1] += 1
+        heights[half::blockSize, 0::blockSize] = total / count + rng.random_sample(total.shape)
+        if edges is not None: #the diamond step also fills the border midpoints, put the fixed edges back
+            setEdges(heights, edges)
+
+    return heights
+
+def setEdges(heights, edges):
+    ''' Writes the (top row, bottom row, left column, right column) edge arrays onto the border of the heights '''
+    top, bottom, left, right = edges
+    heights[0, :] = top
+    heights[-1, :] = bottom
+    heights[:, 0] = left
+    heights[:, -1] = right
+
+def midpointDisplacement(n, startHeight, endHeight, seed=None):
+    ''' The 1D version of diamond square: a (2**n + 1) line of heights between two end heights
+
+    Each level sets the midpoints to the mean of their two neighbours plus the same random offset
+    diamond square uses, so the line looks like an edge of a diamond square grid.
+
+    startHeight, endHeight:    Float heights of the two ends
+    seed:                      Integer seed or RandomState used for the random offsets
+    '''
+    rng = getRandomState(seed)
+    width = 2 ** n + 1
+    heights = np.zeros(width, dtype=np.float32)
+    heights[0] = startHeight
+    heights[-1] = endHeight
+    for i in range(n, 0, -1):
+        blockSize = 2 ** i
+        ends = heights[0:-1:blockSize] + heights[blockSize::blockSize]
+        heights[blockSize // 2::blockSize] = 0.5 * ends + rng.random_sample(ends.shape)
+    return heights
+
+def bumpHeights(heights, heightOffset, mask=None, seed=None):
+    ''' Returns a copy of the heights with random bumps added, or slightly flattened
+
+    heights:         Float array of heights (any shape)
+    heightOffset:    Float maximum bump height, the heights are offset by a random value in [-heightOffset, heightOffset]
+                     or if heightOffset == 0 the heights are scaled to 80% instead
+    mask:            Boolean array (same shape as heights) of the heights that may change, None changes them all
+    seed:            Integer seed or RandomState used for the random offsets
+    '''
+    heights = np.asarray(heights)
+    if heightOffset == 0:
+        bumped = heights * 0.8 #works with positive and negative values
+    else:
+        rng = getRandomState(seed)
+        bumped = heights + rng.uniform(-1.0*heightOffset, heightOffset, heights.shape)
+    if mask is not None:
+        bumped = np.where(mask, bumped, heights)
+    return bumped.astype(heights.dtype)
+
+def gridPoints(heights, size=20.0):
+    ''' Returns an (n, 3) array of vertex positions laid out like a polyPlane of the same size
+
+    Row 0 is the +z edge and column 0 is the -x edge, vertex row*width + column gets heights[row, column].
+
+    heights:    2D array of heights
+    size:       Float width and depth of the plane in world units
+    '''
+    rows, columns = np.asarray(heights).shape
+    x = np.linspace(-0.5*size, 0.5*size, columns)
+    z = np.linspace(0.5*size, -0.5*size, rows)
+    points = np.empty((rows, columns, 3))
+    points[..., 0] = x[None, :]
+    points[..., 1] = heights
+    points[..., 2] = z[:, None]
+    return points.reshape(-1, 3)
+
+
+class Heightfield(object):
+    ''' A square grid of heights covering a size x size area, with its derived maps
+
+    heights:    2D float32 array of heights, heights[row, column]
+    size:       Float width and depth of the area in world units (the terrain plane is 20x20)
+    version:    Integer increased whenever the heights change, so cached maps know to recompute
+    maps:       DerivedMaps (normals, slope, aspect) of the heights
+    '''
+    def __init__(self, heights, size=20.0):
+        self.heights = np.asarray(heights, dtype=np.float32)
+        self.size = float(size)
+        self.version = 0
+        self.maps = derivedMaps.DerivedMaps(self)
+
+    @property
+    def spacing(self):
+        ''' Float world distance between neighbouring samples '''
+        return self.size / (self.heights.shape[1] - 1)
+
+    def markChanged(self):
+        ''' Call after editing the heights in place so the derived maps are recomputed '''
+        self.version += 1
+
+    def setHeights(self, heights):
+        ''' Replaces the heights (keeping the grid shape) '''
+        self.heights = np.asarray(heights, dtype=np.float32).reshape(self.heights.shape)
+        self.markChanged()
+
+    def points(self):
+        ''' Returns an (n, 3) array of the grid's vertex positions in polyPlane order '''
+        return gridPoints(self.heights, self.size)
+
+def subdivideHeights(heights, levels):
+    ''' Returns the heights subdivided levels times, like a polySmooth of the terrain plane
+
+    Each level doubles the n.o. quads per side. On a regular grid Catmull-Clark subdivision is the
+    cubic B-spline rule along each axis: new midpoints are the average of their two neighbours and
+    old samples move to (left + 6*centre + right)/8, the outer samples keep their height.
+
+    heights:    2D array of heights
+    levels:     Integer n.o. subdivisions
+    '''
+    heights = np.asarray(heights, dtype=np.float32)
+    for i in range(levels):
+        for axis in (0, 1):
+            heights = np.swapaxes(heights, 0, axis)
+            fine = np.empty((2 * heights.shape[0] - 1,) + heights.shape[1:], dtype=np.float32)
+            fine[1::2] = 0.5 * (heights[:-1] + heights[1:])
+            fine[0::2] = heights
+            fine[2:-1:2] = 0.125 * (heights[:-2] + 6.0 * heights[1:-1] + heights[2:])
+            heights = np.swapaxes(fine, 0, axis)
+    return heights
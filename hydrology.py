@@ -0,0 +1,228 @@
+"""Landscaper hydrology
+
+Where water goes on a heightfield: a priority-flood from the outlets (the
+terrain border and anything under the sea) gives every cell the neighbour
+it drains into, the order cells drain in and the heights with every
+depression filled to its spill level, in O(n log n). Flow accumulation
+then counts how many cells drain through each cell, and rivers are carved
+along the cells most water flows through.
+
+Cells are indexed row * columns + column like the terrain vertices.
+
+"""
+import heapq
+
+import numpy as np
+
+# the eight neighbours as (row, column) offsets
+NEIGHBOURS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+
+def borderMask(shape):
+    ''' Returns a boolean array that is True on the outside rows and columns '''
+    border = np.zeros(shape, dtype=bool)
+    border[0, :] = border[-1, :] = border[:, 0] = border[:, -1] = True
+    return border
+
+def priorityFlood(heights, outlets=None):
+    ''' Floods the heightfield inwards from its outlets, lowest cell first
+
+    heights:    2D array of heights
+    outlets:    2D boolean array of the cells water leaves the terrain through, None for the border
+
+    Returns (filled, receivers, order):
+    filled:       2D float64 array of the heights with every depression filled up to where it spills over
+    receivers:    Integer array of the cell each cell drains into, -1 for outlets
+    order:        Integer array of every cell, each one after the cell it drains into (outlets first)
+    '''
+    rows, columns = heights.shape
+    if outlets is None:
+        outlets = borderMask(heights.shape)
+
+    # work on a grid padded by one closed cell, so neighbours never need bounds checks
+    paddedColumns = columns + 2
+    padded = np.zeros((rows + 2, columns + 2))
+    padded[1:-1, 1:-1] = heights
+    closed = np.ones((rows + 2, columns + 2), dtype=bool)
+    closed[1:-1, 1:-1] = False
+    padded = padded.ravel().tolist()
+    closed = closed.ravel().tolist()
+    offsets = [dr * paddedColumns + dc for dr, dc in NEIGHBOURS]
+    receivers = [-1] * len(padded)
+
+    rowIndex, columnIndex = np.nonzero(outlets)
+    heap = [(padded[cell], cell, cell) for cell in ((rowIndex + 1) * paddedColumns + columnIndex + 1).tolist()]
+    heapq.heapify(heap)
+    for level, tie, cell in heap:
+        closed[cell] = True
+    order = []
+    count = len(padded) #tie breaker, cells reached first on a flat are popped first so flats drain towards their spill point
+    while heap:
+        level, tie, cell = heapq.heappop(heap)
+        order.append(cell)
+        for offset in offsets:
+            neighbour = cell + offset
+            if closed[neighbour]:
+                continue
+            closed[neighbour] = True
+            receivers[neighbour] = cell
+            if padded[neighbour] < level: #in a depression, fill it up to the spill level
+                padded[neighbour] = level
+            count += 1
+            heapq.heappush(heap, (padded[neighbour], count, neighbour))
+
+    # back to unpadded indices
+    order = np.array(order, dtype=np.int64)
+    receivers = np.array(receivers, dtype=np.int64)[order]
+    def unpad(cells):
+        return (cells // paddedColumns - 1) * columns + cells % paddedColumns - 1
+    orderCells = unpad(order)
+    receiverCells = np.full(rows * columns, -1, dtype=np.int64)
+    receiverCells[orderCells] = np.where(receivers >= 0, unpad(receivers), -1)
+    filled = np.array(padded).reshape(rows + 2, columns + 2)[1:-1, 1:-1]
+    return filled, receiverCells, orderCells
+
+def flowAccumulation(receivers, order):
+    ''' Returns the n.o. cells (including itself) draining through each cell
+
+    receivers, order:    Arrays from priorityFlood
+    '''
+    accumulation = [1] * len(receivers)
+    receiverList = receivers.tolist()
+    for cell in reversed(order.tolist()): #upstream cells come after the cell they drain into
+        receiver = receiverList[cell]
+        if receiver >= 0:
+            accumulation[receiver] += accumulation[cell]
+    return np.array(accumulation, dtype=np.int64)
+
+def riverBed(filled, receivers, order, river, depths):
+    ''' Returns the height of the bed of every river cell, never lower than the river cell it flows into
+
+    river:     Boolean array of the river cells
+    depths:    Float array of how far each river cell is carved below the filled heights
+    '''
+    bed = filled.ravel() - depths
+    for cell in order[river[order]].tolist(): #downstream first
+        receiver = receivers[cell]
+        if receiver >= 0 and river[receiver] and bed[cell] < bed[receiver]:
+            bed[cell] = bed[receiver]
+    return bed
+
+def carveRivers(heights, size=20.0, minAccumulation=0.03, width=0.5, depth=1.0, seaLevel=None):
+    ''' Returns a copy of the heights with rivers carved along the paths the most water drains along
+
+    heights:            2D array of heights
+    size:               Float width and depth of the terrain in world units
+    minAccumulation:    Float fraction of the terrain that has to drain through a cell for it to be a river
+    width:              Float half width of the river banks in world units
+    depth:              Float depth of the rivers where they reach the sea (or the terrain edge)
+    seaLevel:           Float sea level (cells under it are outlets and never carved), None for no sea
+
+    Each river cell only lowers the cells in a small window around it to a rounded channel.
+    '''
+    heights = np.asarray(heights)
+    rows, columns = heights.shape
+    spacing = size / (columns - 1)
+    outlets = borderMask(heights.shape)
+    if seaLevel is not None:
+        outlets |= heights <= seaLevel
+    filled, receivers, order = priorityFlood(heights, outlets)
+    accumulation = flowAccumulation(receivers, order)
+
+    river = (accumulation >= minAccumulation * heights.size) & ~outlets.ravel()
+    depths = depth * np.sqrt(accumulation / float(accumulation[river].max())) if river.any() else np.zeros(heights.size)
+    bed = riverBed(filled, receivers, order, river, depths)
+
+    carved = np.array(heights, dtype=np.float64)
+    radius = int(np.ceil(width / spacing))
+    offsets = np.arange(-radius, radius + 1) * spacing
+    profile = (offsets[:, None] ** 2 + offsets[None, :] ** 2) / (width * width) #0 in the middle of the channel, 1 at the banks
+    for cell in np.nonzero(river)[0].tolist():
+        row, column = divmod(cell, columns)
+        top, bottom = max(0, row - radius), min(rows, row + radius + 1)
+        left, right = max(0, column - radius), min(columns, column + radius + 1)
+        channel = bed[cell] + depths[cell] * profile[top - row + radius:bottom - row + radius, left - column + radius:right - column + radius]
+        window = carved[top:bottom, left:right]
+        np.minimum(window, channel, out=window)
+    return carved.astype(heights.dtype)
+
+
+class UnionFind(object):
+    ''' Disjoint sets of the integers 0 to count-1, merged with union and looked up with find
+
+    parent:    List of each element's parent, roots are their own parent
+    '''
+    def __init__(self, count):
+        self.parent = list(range(count))
+
+    def find(self, element):
+        ''' Returns the root of the element's set, halving the path to it on the way '''
+        parent = self.parent
+        while parent[element] != element:
+            parent[element] = parent[parent[element]]
+            element = parent[element]
+        return element
+
+    def union(self, first, second):
+        ''' Merges the sets of the two elements '''
+        firstRoot, secondRoot = self.find(first), self.find(second)
+        if firstRoot != secondRoot:
+            self.parent[max(firstRoot, secondRoot)] = min(firstRoot, secondRoot)
+
+def connectedComponents(mask):
+    ''' Labels the 4-connected groups of True cells of a 2D mask
+
+    Returns (labels, count): labels is an integer array of each cell's group from 0 to count-1, -1 for False cells
+    '''
+    rows, columns = mask.shape
+    cells = np.arange(mask.size).reshape(mask.shape)
+    sets = UnionFind(mask.size)
+    across = mask[:, :-1] & mask[:, 1:]
+    down = mask[:-1, :] & mask[1:, :]
+    for first, second in zip(np.concatenate((cells[:, :-1][across], cells[:-1, :][down])).tolist(),
+                             np.concatenate((cells[:, 1:][across], cells[1:, :][down])).tolist()):
+        sets.union(first, second)
+
+    masked = np.nonzero(mask.ravel())[0]
+    roots = np.array([sets.find(cell) for cell in masked.tolist()], dtype=np.int64)
+    uniqueRoots, rootLabels = np.unique(roots, return_inverse=True)
+    labels = np.full(mask.size, -1, dtype=np.int64)
+    labels[masked] = rootLabels
+    return labels.reshape(mask.shape), len(uniqueRoots)
+
+def minLakeCells(cellCount):
+    ''' Returns the n.o. wet cells a lake needs on a grid of cellCount cells, so finer grids don't fill every little dip '''
+    return max(4, cellCount // 1000)
+
+def findLakes(heights, seaLevel=None, minDepth=0.05, minCells=4):
+    ''' Finds the bodies of water on a heightfield: every enclosed basin filled to where it spills over, and the sea
+
+    heights:     2D array of heights
+    seaLevel:    Float sea level, None for no sea
+    minDepth:    Float shallowest water that counts as wet (ignores the tiny pits left by the random bumps)
+    minCells:    Integer n.o. wet cells a lake needs
+
+    Returns a list of dictionaries, one per lake:
+    cells:    Integer array of the lake's wet cells
+    level:    Float height of the water (the spill height of the basin, or the sea level)
+    depth:    Float deepest point of the lake
+    '''
+    heights = np.asarray(heights, dtype=np.float64)
+    filled, receivers, order = priorityFlood(heights)
+    if seaLevel is not None:
+        filled = np.maximum(filled, seaLevel)
+    wet = filled - heights > minDepth
+    labels, count = connectedComponents(wet)
+
+    labels = labels.ravel()
+    cells = np.argsort(labels, kind='mergesort')
+    cells = cells[labels[cells] >= 0]
+    starts = np.searchsorted(labels[cells], np.arange(count + 1))
+    lakes = []
+    for lake in range(count):
+        lakeCells = cells[starts[lake]:starts[lake + 1]]
+        if len(lakeCells) < minCells:
+            continue
+        level = float(filled.ravel()[lakeCells].max())
+        lakes.append({'cells': lakeCells, 'level': level, 'depth': level - float(heights.ravel()[lakeCells].min())})
+    return lakes
@@ -0,0 +1,150 @@
+"""Landscaper commands
+
+Maya plugin with undoable commands building objects from whole arrays.
+maya.cmds has no command that takes arrays like these, and OpenMaya calls
+made straight from a script never reach the undo queue, so meshSync loads
+this plugin and runs its commands instead. Each command is a single undo
+entry however many objects it creates.
+
+The arrays are too big to pass as command flags, so meshSync hands them
+over with meshSync.commandArguments and the commands take no arguments.
+
+"""
+import numpy as np
+import maya.api.OpenMaya as om
+
+import meshSync
+
+
+def maya_useNewAPI():
+    ''' Tells Maya the plugin uses OpenMaya 2.0 '''
+    pass
+
+def findNode(name):
+    ''' Returns the MObject of the named node, None if it doesn't exist '''
+    selection = om.MSelectionList()
+    try:
+        selection.add(name)
+    except RuntimeError:
+        return None
+    return selection.getDependNode(0)
+
+
+class CreateMeshCommand(om.MPxCommand):
+    ''' landscaperCreateMesh: builds a mesh from vertex and face arrays with MFnMesh.create
+
+    The mesh goes under a new transform with the given name and gets the default material.
+    UVs are per vertex, so every face corner uses the UV of its vertex. Returns the transform name.
+
+    transform:    MObject of the transform created by the last redoIt
+    '''
+    commandName = 'landscaperCreateMesh'
+
+    @classmethod
+    def creator(cls):
+        return cls()
+
+    def isUndoable(self):
+        return True
+
+    def doIt(self, args):
+        self.meshName, points, self.faceCounts, self.faceConnects, self.uvs = meshSync.commandArguments(self.commandName)
+        self.points = om.MPointArray([om.MPoint(p) for p in points])
+        self.redoIt()
+
+    def redoIt(self):
+        modifier = om.MDagModifier()
+        self.transform = modifier.createNode('transform')
+        modifier.renameNode(self.transform, self.meshName)
+        modifier.doIt()
+        fnMesh = om.MFnMesh()
+        if self.uvs is None:
+            shape = fnMesh.create(self.points, self.faceCounts, self.faceConnects, parent=self.transform)
+        else:
+            shape = fnMesh.create(self.points, self.faceCounts, self.faceConnects, self.uvs[0], self.uvs[1], parent=self.transform)
+            fnMesh.assignUVs(self.faceCounts, self.faceConnects)
+        om.MFnSet(findNode('initialShadingGroup')).addMember(om.MDagPath.getAPathTo(shape))
+        self.clearResult()
+        self.setResult(om.MFnDagNode(self.transform).partialPathName())
+
+    def undoIt(self):
+        modifier = om.MDagModifier()
+        modifier.deleteNode(self.transform)
+        modifier.doIt()
+
+
+class CreateInstancesCommand(om.MPxCommand):
+    ''' landscaperCreateInstances: instances prototypes[i] with the i'th row of the transform arrays
+
+    Every transform is created by one MDagModifier (inside the group, which is created if it doesn't exist),
+    the prototype shapes are then parented under them as instances. Returns the instance names.
+
+    transforms:      List of the MObjects of the transforms created by the last redoIt
+    createdGroup:    MObject of the group if redoIt created it, else None
+    '''
+    commandName = 'landscaperCreateInstances'
+
+    @classmethod
+    def creator(cls):
+        return cls()
+
+    def isUndoable(self):
+        return True
+
+    def doIt(self, args):
+        self.prototypes, self.translations, self.rotations, self.scales, self.namePrefix, self.group, self.firstNumber = meshSync.commandArguments(self.commandName)
+        self.redoIt()
+
+    def redoIt(self):
+        modifier = om.MDagModifier()
+        groupNode = findNode(self.group)
+        self.createdGroup = None
+        if groupNode is None:
+            groupNode = self.createdGroup = modifier.createNode('transform')
+            modifier.renameNode(groupNode, self.group)
+        self.transforms = []
+        for i in range(len(self.prototypes)):
+            transform = modifier.createNode('transform', groupNode)
+            modifier.renameNode(transform, self.namePrefix + str(self.firstNumber + i))
+            self.transforms.append(transform)
+        modifier.doIt()
+
+        shapes = {}
+        instances = []
+        for prototype, transform, translation, rotation, scale in zip(self.prototypes, self.transforms, self.translations, self.rotations, self.scales):
+            if prototype not in shapes:
+                selection = om.MSelectionList()
+                selection.add(prototype)
+                shapes[prototype] = selection.getDagPath(0).extendToShape().node()
+            om.MFnDagNode(transform).addChild(shapes[prototype], om.MFnDagNode.kNextPos, True)
+            fnTransform = om.MFnTransform(transform)
+            fnTransform.setTranslation(om.MVector(*translation), om.MSpace.kTransform)
+            fnTransform.setRotation(om.MEulerRotation(*np.radians(rotation)), om.MSpace.kTransform)
+            fnTransform.setScale(list(scale))
+            instances.append(fnTransform.partialPathName())
+        self.clearResult()
+        self.setResult(instances)
+
+    def undoIt(self):
+        ''' Takes the instanced shapes back off the transforms (so deleting them leaves the prototypes alone), then deletes them '''
+        modifier = om.MDagModifier()
+        for transform in self.transforms:
+            fnTransform = om.MFnDagNode(transform)
+            fnTransform.removeChild(fnTransform.child(0))
+            modifier.deleteNode(transform)
+        if self.createdGroup is not None:
+            modifier.deleteNode(self.createdGroup)
+        modifier.doIt()
+
+
+commands = (CreateMeshCommand, CreateInstancesCommand)
+
+def initializePlugin(plugin):
+    fnPlugin = om.MFnPlugin(plugin)
+    for command in commands:
+        fnPlugin.registerCommand(command.commandName, command.creator)
+
+def uninitializePlugin(plugin):
+    fnPlugin = om.MFnPlugin(plugin)
+    for command in commands:
+        fnPlugin.deregisterCommand(command.commandName)
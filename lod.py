@@ -0,0 +1,92 @@
+"""Landscaper levels of detail
+
+Diamond square fills the grid coarse to fine and never changes a sample
+once a level has set it, so level k of the pyramid is every 2**(n-k)th
+row and column of the finished heights. The pyramid is kept as strided
+views of the one array: no extra memory, and any level can be turned into
+a mesh without resampling.
+
+Tiles further from the camera use coarser levels. Where a tile meets a
+coarser neighbour its border is snapped onto the neighbour's straight
+edge segments so there are no cracks between them.
+
+"""
+import math
+
+import numpy as np
+
+LOD_DISTANCE = 30.0 #tiles closer than this use the finest level, each doubling of the distance drops a level
+
+
+def levelCount(heights):
+    ''' Returns n for a (2**n + 1) x (2**n + 1) heights array '''
+    n = int(round(math.log(heights.shape[0] - 1, 2)))
+    if heights.shape[0] != heights.shape[1] or 2 ** n + 1 != heights.shape[0]:
+        raise ValueError('heights must be (2**n + 1) x (2**n + 1), not %s' % (heights.shape,))
+    return n
+
+def lodLevel(heights, level):
+    ''' Returns the (2**level + 1) x (2**level + 1) view of the heights at a diamond square level
+
+    level:    Integer from 0 (just the corners) to n (the full heights)
+    '''
+    step = 2 ** (levelCount(heights) - level)
+    return heights[::step, ::step]
+
+def lodPyramid(heights):
+    ''' Returns the list of every level's view of the heights, coarsest (the four corners) first '''
+    return [lodLevel(heights, level) for level in range(levelCount(heights) + 1)]
+
+def selectLevel(distance, n, minLevel=0, lodDistance=LOD_DISTANCE):
+    ''' Returns the level to draw a tile at from its distance to the camera
+
+    distance:       Float distance in world units
+    n:              Integer finest level
+    minLevel:       Integer coarsest level allowed
+    lodDistance:    Float distance the finest level is used up to
+    '''
+    if distance <= lodDistance:
+        return n
+    return int(max(minLevel, n - int(math.log(distance / lodDistance, 2))))
+
+def selectTileLevels(cameraX, cameraZ, columns, rows, n, tileSize=20.0, minLevel=0, lodDistance=LOD_DISTANCE):
+    ''' Returns a dictionary of (column, row) -> level for every tile of a world
+
+    The distance is measured from the camera to the closest point of each tile, so the tile the camera is over is always the finest.
+
+    cameraX, cameraZ:    Float camera position in world units
+    '''
+    levels = {}
+    for row in range(rows):
+        for column in range(columns):
+            dx = max(0.0, abs(cameraX - column * tileSize) - 0.5 * tileSize)
+            dz = max(0.0, abs(cameraZ + row * tileSize) - 0.5 * tileSize)
+            levels[(column, row)] = selectLevel(math.hypot(dx, dz), n, minLevel, lodDistance)
+    return levels
+
+def stitchEdge(edge, step):
+    ''' Returns a copy of a 1D border with every sample between each step-th one linearly interpolated '''
+    coarse = edge[::step]
+    fraction = (np.arange(len(edge) - 1) % step) / float(step)
+    stitched = np.empty_like(edge)
+    stitched[:-1] = (1 - fraction) * np.repeat(coarse[:-1], step) + fraction * np.repeat(coarse[1:], step)
+    stitched[-1] = edge[-1]
+    return stitched
+
+def stitchTile(heights, level, neighbourLevels):
+    ''' Returns the heights of a tile at a level with its borders matched to coarser neighbours
+
+    heights:            Full resolution heights of the tile
+    neighbourLevels:    Tuple of the (top, bottom, left, right) neighbours' levels, None where there is no neighbour
+    '''
+    stitched = np.array(lodLevel(heights, level))
+    sides = ((0, slice(None)), (-1, slice(None)), (slice(None), 0), (slice(None), -1))
+    for side, neighbourLevel in zip(sides, neighbourLevels):
+        if neighbourLevel is not None and neighbourLevel < level:
+            stitched[side] = stitchEdge(stitched[side], 2 ** (level - neighbourLevel))
+    return stitched
+
+def tileLevelsAround(levels, column, row):
+    ''' Returns the (top, bottom, left, right) neighbour levels of a tile from a selectTileLevels dictionary '''
+    return (levels.get((column, row - 1)), levels.get((column, row + 1)),
+            levels.get((column - 1, row)), levels.get((column + 1, row)))
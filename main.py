@@ -5,8 +5,27 @@ This is a maya python script
 """
 import maya.cmds as cmds
 import random
+import numpy as np
 import math as m
-import pymel.core as pm
+import os
+
+import heightfield
+import meshSync
+import topology
+import scatter
+import meshBuild
+import caveEngine
+import erosionEngine
+import hydrology
+import brushes
+import flatten
+import cityEngine
+import objectRegistry
+import pipeline
+import stageCache
+import tiledTerrain
+import lod
+import mappedHeightfield
 
 #Global Variables
 globalSeperatedSea=False
@@ -14,6 +33,9 @@ wallsExist=False
 buildingType=0
 globalSeaLevel = -10
 globalBottomOfCube = -10
+maxTerrainVertices = 2049 * 2049 #biggest heightfield file loadTerrainFile will turn into a mesh
+terrainField = None #Heightfield the terrain was generated from, holds its cached normal/slope/aspect maps
+randomTerrainCache = stageCache.StageCache(maxEntries=64) #outputs of the random terrain stages, reused when their parameters don't change
 filePath="C:\Users\jamal\OneDrive - Bournemouth University\Year 1\Semester 2\Python Project\Final Submission"
 
 def errorMessage(error):
@@ -27,14 +49,22 @@ def cancelProc():
 delOBJList = 'tallTreeOBJ', 'smallTreeOBJ', 'houseOBJ', 'cityOBJ'
 delTreeList = 'tree', 'pCylinder1', 'Trees'
 delTerrainList = 'tree', 'pCylinder1', 'Trees', 'terrain', 'Buildings', 'water'
+registeredCategories = 'Trees', 'Buildings' #generated objects tracked by the registry instead of by name
+registry = objectRegistry.ObjectRegistry(cmds)
 
 def deleteObjects(objectsToDelete):
     ''' deletes the existing objects in the objectstToDelete list
         
+    names:   List of the object names to delete, registered categories are cleared through the registry
     objs:    List containing the existing object  
     '''
     global wallsExist
-    objs = cmds.ls(objectsToDelete) 
+    names = [objectsToDelete] if isinstance(objectsToDelete, str) else list(objectsToDelete)
+    for category in registeredCategories:
+        if category in names: #the whole category is deleted in one call, without searching the scene
+            registry.clear(category)
+            names.remove(category)
+    objs = cmds.ls(names) if names else []
     if objs: #if any of the objects in the list exist they are deleted
         cmds.delete(objs)
     if objectsToDelete == delTerrainList: #if the terrain list is passed deleted wallsExist is set to false so the next terrain can be turned into a cube
@@ -43,6 +73,57 @@ def deleteObjects(objectsToDelete):
     if objectsToDelete == 'water':
         globalSeperatedSea=False
 
+def getTerrainField(points):
+    ''' Returns the terrain's Heightfield updated to the current vertex positions,
+        or None if the terrain is no longer the plane it was generated as (e.g. smoothed or turned into a cube)
+    
+    points:     Array of the X Y Z values of every terrain vertex
+    '''
+    if terrainField is None or len(points) != terrainField.heights.size:
+        return None
+    heights = points[:, 1].reshape(terrainField.heights.shape)
+    if not np.allclose(heights, terrainField.heights, atol=1e-5): #only invalidate the cached maps if the terrain was edited
+        terrainField.setHeights(heights)
+    return terrainField
+
+def getTopField(points):
+    ''' Returns the terrain's Heightfield from its top surface (the whole plane, or the top of a cube terrain), or None
+    
+    points:     Array of the X Y Z values of every terrain vertex, the top of a cube terrain is its first vertices
+    count:      Integer n.o. vertices on the terrain's top surface
+    '''
+    if terrainField is not None and wallsExist:
+        count = terrainField.heights.size
+        if len(points) != 2 * count or not (points[count:, 1] == globalBottomOfCube).all(): #not the cube createWalls built (e.g. smoothed since)
+            return None
+        points = points[:count]
+    return getTerrainField(points)
+
+def selectedFaceIndices():
+    ''' Returns an integer array of the selected terrain faces '''
+    faces = cmds.filterExpand(cmds.ls(sl=True), sm=34) or [] #sm flag 34 only keeps faces
+    return np.array([int(face.split('[')[-1][:-1]) for face in faces if face.split('.')[0] == 'terrain'], dtype=np.int64)
+
+def selectedFaceCentres():
+    ''' Returns an (f, 2) array of the x z centre of every selected terrain face '''
+    terrainTopology = topology.getTopology('terrain')
+    points = meshSync.getPoints('terrain')
+    return np.array([points[terrainTopology.faceVertices(face)][:, [0, 2]].mean(axis=0) for face in selectedFaceIndices().tolist()]).reshape(-1, 2)
+
+def brushTerrain(brushList, combine='add'):
+    ''' Applies raise/lower brushes (see brushes.py) to the top of the terrain in one pass, returns False if it can't be brushed
+    
+    combine:    String how overlapping brushes combine, 'add', 'max' or 'min'
+    '''
+    points = meshSync.getPoints('terrain')
+    field = getTopField(points)
+    if field is None:
+        return False
+    field.setHeights(brushes.applyBrushes(field.heights, field.size, brushList, combine))
+    points[:field.heights.size, 1] = field.heights.ravel()
+    meshSync.setPoints('terrain', points)
+    return True
+
 def bumpTerrain(heightOffset):
     ''' if heightOffset is passed add some texture to the terrain by randomly increasing the vertex height by the heightOffset amount
         or 
@@ -50,41 +131,57 @@ def bumpTerrain(heightOffset):
         
     heightOffset:              Stores the bump height or 0 to flatten the terrain
 
-    totalVerts:             Total integer n.o. vertices on the terrain plane
-    progressCancelled:      Boolean storing True if the function is cancelled (ESC is pressed)
+    points:                 Array of the X Y Z values of every terrain vertex, read and written once
+    notWall:                Boolean array, False for the vertices on the bottom of the cube
     '''
     deleteObjects(delTreeList) #As the terrain is modified, delete the trees as they will look strange
     cmds.softSelect(sse=False) #disable softselect 
-    cmds.select('terrain')
-    totalVerts = cmds.polyEvaluate('terrain', v=True) #finds the n.o. vertices on the terrain
-    cmds.progressWindow(t='Progress Bar', progress=0, status='', ii=True) #create the progress window
-    progressCancelled=False
-    for vtx in range(0, totalVerts): #loops through each vertex in the terrain
-        if(cmds.progressWindow(q=True, ic=True)): #if the escape key is pressed, stop the function
-            progressCancelled=True
-            break
-        if (cmds.pointPosition('terrain.vtx[' + str(vtx) + ']')[1] == globalBottomOfCube): #if the current vertex y coordinate is -10, it isn't move as it will modify the cubes walls
-                continue
-        if heightOffset == 0: #if 0 is passed, the terrain is flattened instead
-            vtxPos1 = cmds.pointPosition('terrain.vtx[' + str(vtx) + ']') #store the coordinates of the current vertex
-            cmds.select('terrain.vtx[' + str(vtx) + ']') #select the vertex
-            cmds.move(vtxPos1[1]*0.8, y=True ) #move the vertex's y coordinate to 80% of it's original height (works with positive and negative values) 
-            progressStatus = 'Flattening'
-        else: #if any other number is passed the terrain is made more
-            randomHeight = random.uniform(-1.0*heightOffset, heightOffset) #the vertex's location will be offset by a random value between the positive and negative heightOffset magnitude
-            cmds.select('terrain.vtx[' + str(vtx) + ']') #select the vertex
-            cmds.move(randomHeight, y=True, r=True) #move the vertex relatively by the random height
-            progressStatus = 'Adding bumps'
-        progress = float((float(vtx)/float(totalVerts)) * 100) #calculate the progress of the function
-        cmds.progressWindow(edit=True, progress=progress, status=progressStatus) #update the progress bar
-    cmds.progressWindow(endProgress=1) 
+    points = meshSync.getPoints('terrain')
+    notWall = points[:, 1] != globalBottomOfCube #vertices at the bottom of the cube aren't moved as it will modify the cubes walls
+    points[:, 1] = heightfield.bumpHeights(points[:, 1], heightOffset, notWall) #bump (or flatten) every other vertex at once
+    meshSync.setPoints('terrain', points)
+
+def erodeTerrain(hydraulicIterations, thermalIterations):
+    ''' Wears the terrain down with rain (hydraulic erosion) then landslides (thermal erosion)
+    
+    hydraulicIterations:    Integer n.o. rain/flow steps
+    thermalIterations:      Integer n.o. landslide steps
+    '''
+    points = meshSync.getPoints('terrain')
+    field = getTerrainField(points)
+    if field is None:
+        errorMessage('Only a terrain plane that has not been smoothed or turned into a cube can be eroded')
+        return
+    deleteObjects(delTreeList) #As the terrain is modified, delete the trees as they will look strange
+    field.setHeights(erosionEngine.erodeHeights(field.heights, hydraulicIterations, thermalIterations, field.size))
+    points[:, 1] = field.heights.ravel()
+    meshSync.setPoints('terrain', points)
+
+def carveRivers(minAccumulation, width, depth):
+    ''' Carves rivers along the paths most of the terrain drains along, ending in the sea if there is one
+    
+    minAccumulation:    Float fraction of the terrain that has to drain through a point for it to be a river
+    width:              Float half width of the rivers
+    depth:              Float depth of the rivers where they end
+    '''
+    points = meshSync.getPoints('terrain')
+    field = getTerrainField(points)
+    if field is None:
+        errorMessage('Only a terrain plane that has not been smoothed or turned into a cube can have rivers carved')
+        return
+    deleteObjects(delTreeList) #As the terrain is modified, delete the trees as they will look strange
+    seaLevel = globalSeaLevel if cmds.objExists('water') else None
+    field.setHeights(hydrology.carveRivers(field.heights, field.size, minAccumulation, width, depth, seaLevel))
+    points[:, 1] = field.heights.ravel()
+    meshSync.setPoints('terrain', points)
 
 def smoothTerrain():
     ''' Performs a subdivision on the terrain plane if the n.o. vertices is < 100k (prevents lag issues '''
-    
+    global terrainField
     if(cmds.polyEvaluate('terrain', v=True) > 100000): #if the n.o. verts on the terriain is > 10000
         errorMessage('Over 100,000 vertices, smoothing not executed')
         return #return before smoothing
+    terrainField = None #polySmooth renumbers the vertices, so they no longer match the heightfield
     cmds.select('terrain')
     cmds.polySmooth(dv=1) 
     cmds.delete(ch=True)
@@ -94,28 +191,9 @@ def getVTXPosition(vtx):
     
     vtx:         Integer identifier of the vertex used
     
-    polyInfo:    List of one string element containing the edge identifies connected to the vertex
-    Split:       List of the polyinfo string split up into words
-    list:        List holding only the edge integer identifiers connected to the vertex
+    The terrain's topology is looked up in a cached index which is only rebuilt when its vertex count changes
     '''
-    cmds.select('terrain.vtx[' + str(vtx) + ']') #select the vertex being passed in
-    polyInfo = cmds.polyInfo(ve=True) #find the edges connected to the vertex
-    
-    ''' manipulate the polyInfo list to extract the data'''
-    split = polyInfo[0].split(' ')
-    split.remove('')
-    list = []
-    for i in split:
-        if i == '' or i == 'VERTEX' or i == '\n':
-            continue
-        else:
-            list.append(i)
-    if len(list) > 4: #if there are four edges connected to the vertex, return 'inside' indicating the vertex is on the inside of the plane 
-        return('Inside')
-    elif len(list) > 3:
-        return('Edge')
-    else:
-        return('Corner')
+    return topology.getTopology('terrain').classify(vtx)
 
 def areFacesSelected(multiple):
     ''' This function is run to detects what's selected and returns an error if not one or multiple faces
@@ -146,72 +224,35 @@ def createMountain(r, h):
     '''
     if areFacesSelected(False) == 0: #if faces aren't selected, exit function
         return()
-    cmds.softSelect(sse=True, ssd=0.5*r) #Enable soft select with a distance of half the input radius to create a better mountain
+    if terrainField is not None:
+        x, z = selectedFaceCentres()[0]
+        if brushTerrain(brushes.mountainBrushes(x, z, r, h, terrainField.spacing)): #the same two moves as brushes on the heights
+            return()
+    cmds.softSelect(sse=True, ssd=0.5*r) #(on an edited terrain) Enable soft select with a distance of half the input radius to create a better mountain
     cmds.move(0, 1, 0, r=True) #create the top steepest part of the mountain
     cmds.softSelect(ssd=r) #change SS distance to be the raidus
     cmds.move(0, (1)*h, 0, r=True) #move the mountain up higher#dond
     cmds.softSelect(sse=False) #disable SS
 
-def getFaceVTXValues(face):
-    ''' Returns a list of a passed faces' vertices
+def flattenFaces(mode='region', falloff=2): 
+    ''' Flattens every selected face at once, see flatten.py
     
-    face:               Passes in the face
+    mode:           String 'region' flattens each group of touching faces to its own average y level,
+                    'face' each face to its own, 'selection' all of them to the average of the whole selection
+    falloff:        Float distance the ground around the faces is blended in over (like a soft select move), 0 only moves the faces
 
-    faceObjectName:     Stores the face's object's name as a string
-    polyInfo:           Stores a list which holds a string of the face's vertices in one element
-    split:              A list which seperates the polyInfo string into multiple elements
-    list:               A list containing each of the face's vertices in seperate elements
-    '''
-    faceObjectName = face[0].split('.')[0]
-    polyInfo = cmds.polyInfo(fv=True)
-    split = polyInfo[0].split(' ')
-    if(split[0] != 'FACE' or faceObjectName != 'terrain'): #if the face var doesn't store a face or is not on the terrain object, exit function
-        cmds.confirmDialog( title='Error', message="Select a face/faces to flatten on the terrain", button=['ok'], defaultButton='ok', cancelButton='ok', dismissString='ok' )
-        return
-    ''' modifying the list to extract the data '''
-    split.remove('')
-    list = []
-    for i in split:
-        if i == '' or i == 'FACE' or i == '\n':
-            continue
-        else:
-            list.append(str(i))
-    list.remove(list[0])
-    return(list) #returns a list containing the verts which make up the selected face
-
-def listSelectedFaces():
-    ''' Lists selected faces
-    '''
-    selection = cmds.ls(sl=True) #stores the maya selection as a var 
-    faces = []
-    for face in selection: #loops through each selected face
-        seperatedFaces = cmds.filterExpand(face, sm=34) #sm flag is a selection mask where passing 34 only selects faces
-        faces.append(str(seperatedFaces[0]).split(',')) #appends the face list with the current selected face
-    return faces
-
-def flattenFaces(): 
-    ''' Flattens the face selected by the user to its average y level
-    
-    vtxYValues:     integer holding the sum of the vertices' y values
-    faceVerts:           List containing each of the face's vertices in seperate elements
-    vtx:            Integer storing integer number of the current vertex being accessed
-    vtxXYZ:         List storing the X Y and Z integer values of the current vertex
+    faces:          Integer array of the selected terrain faces
+    points:         Array of the X Y Z values of every terrain vertex
     '''
     if areFacesSelected(True) == 0: #if faces aren't selected, exit function
         return
-    selectedFaces = listSelectedFaces() #store the selected faces in the variable
-    for face in selectedFaces: #loop through each face
-        vtxYValues=0 #intialise vtxYValues variable
-        face = cmds.ls(sl=True) #store the selected face in the face var
-        faceVerts = getFaceVTXValues(face) #store the 
-        for i in range(len(faceVerts)): #loop the n.o. times that there are faces
-            vtx=faceVerts[int(i)] #set the current vtx
-            vtxXYZ = cmds.pointPosition('terrain.vtx['+vtx+']') #extract the vtx's XYZ coords
-            vtxYValues = vtxYValues + vtxXYZ[1] #add the y values of the verts together
-        for i in faceVerts:
-            cmds.softSelect(sse=True, ssd=2)  
-            cmds.move(vtxYValues/len(faceVerts),y=True) #move each of the face's vertices to the average Y value of all of them
-            cmds.softSelect(sse=False)              
+    faces = selectedFaceIndices()
+    if len(faces) == 0:
+        cmds.confirmDialog( title='Error', message="Select a face/faces to flatten on the terrain", button=['ok'], defaultButton='ok', cancelButton='ok', dismissString='ok' )
+        return
+    points = meshSync.getPoints('terrain')
+    points[:, 1] = flatten.flattenedHeights(points, topology.getTopology('terrain'), faces, mode, falloff) #every face's target worked out together
+    meshSync.setPoints('terrain', points) #one write back to the mesh
 
 def createTrenches(softSelectDist, depth):
     '''  Creates trenches (holes in the ground) used to make rivers or valleys
@@ -221,6 +262,10 @@ def createTrenches(softSelectDist, depth):
     '''
     if areFacesSelected(True) == 0: #if faces aren't selected exit function
         return()
+    if terrainField is not None: #one lowering brush per selected face, all applied at once
+        trenchBrushes = [{'x': x, 'z': z, 'radius': softSelectDist, 'height': -1.0*depth, 'selectedSize': terrainField.spacing} for x, z in selectedFaceCentres()]
+        if brushTerrain(trenchBrushes, 'min'): #overlapping faces lower the ground once, like one soft select move
+            return()
     cmds.softSelect(sse=False) #disable soft select
     selection = cmds.ls(sl=True) #store the selected faces in the selection var
     if (softSelectDist > 0): #if the softSelectDist is greater than 0, enable soft select with the 
@@ -228,38 +273,47 @@ def createTrenches(softSelectDist, depth):
     cmds.move((-1)*depth, y=True, r=True) #move the faces relatively downwards by the depth
     cmds.softSelect(sse=False) #disable soft select
          
-def createWaterCube(seaLevel):
+def createWaterCube(seaLevel, subdivisions=9):
     ''' Creates a water level
     
-    seaLevel = integer input by user to determine height of the water
+    seaLevel:        integer input by user to determine height of the water
+    subdivisions:    Integer n.o. faces along each side of the water surface, any resolution costs one mesh creation
     '''
     
     global globalSeaLevel #use the global variable
     globalSeaLevel = seaLevel #sets the global sea level var to the input sea level
 
     deleteObjects('water') #if an existing water block exists, delete it
-    cmds.polyCube(n='water',w=19.9,h=20,d=19.9,sx=9,sz=9) #creates the water block #OLD W AND d = 20
-    cmds.xform(t=(0,globalBottomOfCube,0)) #sets the pivot point to 0,-10,0
-    cmds.move(0,seaLevel,0, r=True) #moves the top of the cube to be at the input sea level
-    totalVerts = cmds.polyEvaluate('water', v=True) #stores n.o. verts on the water
-    ''' Add water texture on top of the cube '''
-    for vtx in range(0, totalVerts): #loops through each vert 
-        if vtx<10 or vtx>108: #if the vertices are not on the top, skip vert ()
-            continue
-        heightOffset = 0.2
-        randomHeight = random.uniform(-1.0*heightOffset, heightOffset) #randomHeight = a random int between the negative and positive height offset 
-        cmds.select('water.vtx[' + str(vtx) + ']') #select the current vtx
-        cmds.move(randomHeight, y=True, r=True) #offset the vtx by the random height
-    cmds.select('water.vtx[0:9]', 'water.vtx[110:199]') #select all of the verts on the bottom of the cube and translate their Y coords to -10.1 #NOTE: Fix constant values
-    cmds.move(globalBottomOfCube, y=True) #10.1
-
-    #boolean differentiation isolates the water from the terrain
-    #cmds.duplicate('terrain')
-    #cmds.polyBoolOp('water', 'terrain1', op=2, n='water')
-    #cmds.delete(ch=True)
-    #cmds.rename('water')
-    #seperateWater()
+    ''' Build the wavy surface, walls and bottom as arrays and create them in one go '''
+    points, faceCounts, faceConnects = meshBuild.waterBlock(seaLevel, globalBottomOfCube, 19.9, subdivisions, 0.2, random.randint(0, 2**31-2))
+    meshSync.createMesh('water', points, faceCounts, faceConnects)
+    
+def createLakes(seaLevel=None, lakes=None):
+    ''' Fills every basin of the terrain with a lake up to where it would spill over (and the sea up to the sea level),
+        each one a flat mesh covering just its wet part, grouped under water
     
+    seaLevel:    Float sea level, None for just the lakes
+    lakes:       List of lake dictionaries from hydrology.findLakes with their meshes (from the random terrain pipeline),
+                 None works them out from the terrain
+    '''
+    global globalSeaLevel
+    deleteObjects('water') #if existing water exists, delete it
+    if lakes is None:
+        field = getTopField(meshSync.getPoints('terrain')) #the plane, or the top of a cube terrain
+        if field is None:
+            errorMessage('Lakes can only be worked out on a terrain that has not been smoothed since it was created')
+            return
+        lakes = hydrology.findLakes(field.heights, seaLevel, minCells=hydrology.minLakeCells(field.heights.size)) #the same threshold as the random terrain
+        for lake in lakes:
+            lake['points'], lake['faceCounts'], lake['faceConnects'] = meshBuild.waterSurface(field.heights, lake['cells'], lake['level'], field.size)
+    globalSeaLevel = -99 if seaLevel is None else seaLevel
+    
+    waterMeshes = [meshSync.createMesh('lake' + str(i + 1), lake['points'], lake['faceCounts'], lake['faceConnects']) for i, lake in enumerate(lakes)]
+    if waterMeshes:
+        cmds.group(waterMeshes, n='water')
+    else:
+        cmds.group(em=True, n='water')
+
 def undoFunc():
     ''' Allows a UI button to call the undo function '''
     cmds.undo() 
@@ -306,35 +360,28 @@ def importOBJ(fileName, importedName, newName, scaleValue, error1, error2):
     if(errorCheck==1):
         errorMessage('One or more ' + error1 +' models not found, replacing with ' + error2 + "'s\nGo into the guide tab, delete OBJ's & fix the path")
 
-def generateTrees(spawnRate, treeHeight, minTreeSize, maxTreeSize, maxSteepness):        
-    ''' Generates trees on the plane
+def generateTrees(density, treeHeight, minTreeSize, maxTreeSize, maxSteepness, useInstancer=False, smallTreeSpacing=0.6, tallTreeSpacing=0.9):        
+    ''' Generates trees on the plane, see scatter.py
 
-    Note: Vertices on the outer edge of the plane are discarded so
-          trees don't spawn off of the edge
+    Note: Trees are placed on the surface of the terrain's faces rather than on its vertices,
+          so they never spawn off of the edge and the number of trees doesn't depend on the n.o. vertices
 
-    spawnRate:             Integer % chance that a tree will spawn on each vertex
+    density:             Float n.o. trees per unit of ground area
     treeHeight:          Integer y level where small trees spawn < tree height and tall trees spawn on y levels > treeHeight
     minTreeSize:         Integer minimum tree size (scale factor) input by the user
     maxTreeSize:         Integer maximum tree size (scale factor) input by the user
     maxSteepness:        The steepest gradient (integer %) of the slope that trees can spawn on
+    useInstancer:        Boolean, if True every tree is a point on one instancer node instead of its own transform
+    smallTreeSpacing:    Float closest distance another tree can grow to a small tree
+    tallTreeSpacing:     Float closest distance another tree can grow to a tall tree
     '''
     '''
     Other Variables:    
-    insidePlaneVerts:    List of vertices on the edge of the plane
-    outsidePlaneVerts:   List of vertices not on the edge of the plane
-    errorCheck:          Boolean which is set to True when an error occurs to trigger the error message
-    
-    vtxCount:            Integer of the current vertex being accessed used for the progress bar
-    noPlaneVerts:        Integer total of vertices on the plane
-    noInsideVerts:       Integer total of vertices not on the edge of the plane
-    progress2:           Integer % progress
-    mesh:                String stores the name of the current selected mesh
-    normal:              List storing the normal's vector (X,Y,Z integers) of the currently accessed vertex
-    tree:                Identifier for the current tree being created
-    vtxPos:              List of the integer X Y Z corrdinates of the currently accessed vertex
-    treeSpread:          The max/min limits of the random tree X/Z translation
-    randomScale:         The scale factor of the current tree in the user-set range
-    treeObjs:            List of object string names which begin with tree
+    points:              Array of the X Y Z values of every terrain vertex
+    terrainTopology:     Cached connectivity of the terrain, its faces are split into the triangles trees are drawn on
+    field:               The terrain's Heightfield if the terrain is still its plane, used for the cached normals
+    trees:               Dictionary of arrays holding the position, rotation, scale and species of every tree
+    prototypes:          List of the object each tree is an instance of
     '''
 
     global globalSeaLevel
@@ -344,110 +391,38 @@ def generateTrees(spawnRate, treeHeight, minTreeSize, maxTreeSize, maxSteepness)
         errorMessage('Create a terrain first')
         return
 
-    '''delete existing trees, initialise values, make sure the tree files are located'''
-    errorCheck=0
-    vtxCount=0
-    cmds.select('terrain')
-    noPlaneVerts = cmds.polyEvaluate(v=True)
+    '''delete existing trees, make sure the tree files are located'''
     deleteObjects(delTreeList)
     importOBJ('tree.obj', 'Tree', 'smallTreeOBJ', 0.3, 'tree', 'sphere')
     importOBJ('tree2.obj', 'pCylinder1', 'tallTreeOBJ', 0.3, 'tree', 'sphere')
-    cmds.progressWindow(t='Progress Bar', progress=0, status='Waiting...', ii=True)
-    
-    '''loop through every vertex on the inside of the plane'''
-    cmds.select('terrain')
-    print (range(0, noPlaneVerts))
-    for i in range(0, noPlaneVerts):
-        if(getVTXPosition(i) != 'Inside'):
-            continue
-        if(cmds.progressWindow(q=True, ic=True)):
-            break
-        vtxCount=vtxCount+1
-        cmds.select('terrain')
-        mesh = pm.selected()[0]
-        normal = mesh.vtx[i].getNormal()
-        
-        if cmds.objExists('water') == False:
-            globalSeaLevel = -99
-
-
-        '''only create a tree if the random number is greater than
-         the spawn rate and the terrain is flat enough'''
-        vtxYlevel=cmds.pointPosition('terrain.vtx[' + str(i) + ']')[1]
-        if(random.randint(0,100) < spawnRate and normal[1] > 1-maxSteepness and vtxYlevel > globalSeaLevel + 0.3 ):            
-            '''spawn a tall tree above the input height and a small tree below'''    
-            if(vtxYlevel < treeHeight ):
-                tree = cmds.instance('smallTreeOBJ', n='Tree1')
-                cmds.select(tree)
-            else:
-                tree = cmds.instance('tallTreeOBJ', n='Tree1')
-                cmds.select(tree)
-            
-            '''adjust the position of the tree'''
-            vtxPos = cmds.pointPosition('terrain.vtx[' + str(i) + ']')
-            treeSpread = 0.3
-            cmds.move(vtxPos[0] + random.uniform(-treeSpread,treeSpread), vtxPos[1], vtxPos[2] + random.uniform(-treeSpread,treeSpread), tree) #move the tree to the vert's position, with a slightly random x and z nudge to decrease uniformity 
-            cmds.rotate(random.randint(0,360), y=True)
-            randomScale=float(random.uniform(minTreeSize,maxTreeSize)/100.0)
-            cmds.scale(randomScale, randomScale, randomScale)
-
-            '''increase the visual progress on the progress bar'''
-            progress2 = float((float(vtxCount)/float(noPlaneVerts+1)) * 100)
-            cmds.progressWindow(edit=True, progress=progress2, status='generating trees')
-    cmds.progressWindow(endProgress=1)
-    treeObjs = cmds.ls('Tree*') #Selects all objects with the prefix 'Tree' then groups them
-    
-    '''group the trees'''
-    if treeObjs:
-        cmds.select(treeObjs)
-    cmds.group(n="Trees")
-
-def calculateSquareCentre(startXIndex, startYIndex, blockSize, width, terrainData, levelScale):
-    ''' Calculates the height of the square step's centre 
-    Function written by Xiaosong Yang
-    
-    startXIndex: index of the current block being calulated in the x direction   
-    startYIndex: start y value
-    blockSize: size of the current block being calulated (starts off at the max, gradually decreases)
-    width: width of the plane
-    terrainData: list of coordinates of each point 
-    levelScale: scale of the terrain
-    
-    '''
-    levelScale=1.0
-    terrainData[startXIndex+blockSize/2+(startYIndex+blockSize/2)*width] = 0.25*( \
-        terrainData[startXIndex           + startYIndex*width] + \
-        terrainData[startXIndex+blockSize + startYIndex*width] + \
-        terrainData[startXIndex           + (startYIndex+blockSize)*width] + \
-        terrainData[startXIndex+blockSize + (startYIndex+blockSize)*width])+ m.sqrt(levelScale)*random.random()
-    
-def calculateDiamondCentre(startXIndex, startYIndex, blockSize, width, height, terrainData, levelScale):
-    ''' Calculates the height of the diamonds steps centre 
-    Function written by Xiaosong Yang
-      
-    startYIndex: start y value
-    blockSize: size of the current block being calulated (starts off at the max, gradually decreases)
-    width: width of the plane
-    terrainData: list of coordinates of each point 
-    levelScale: scale of the terrain
-    '''
-    levelScale=1.0
-    tmp = 0
-    count = 0;
-    if startXIndex>0:
-        tmp = tmp + terrainData[startXIndex-blockSize+startYIndex*width]
-        count=count+1
-    if startYIndex>0:
-        tmp = tmp + terrainData[startXIndex+(startYIndex-blockSize)*width]
-        count=count+1
-    if startXIndex<width-1:
-        tmp = tmp + terrainData[startXIndex+blockSize+startYIndex*width]
-        count=count+1
-    if startYIndex<height-1:
-        tmp = tmp + terrainData[startXIndex+(startYIndex+blockSize)*width]
-        count=count+1
-    terrainData[startXIndex+startYIndex*width] = tmp/count + m.sqrt(levelScale)*random.random()
-               
+    if cmds.objExists('water') == False:
+        globalSeaLevel = -99
+
+    '''draw every candidate over the terrain at once, then thin them out to the spacing'''
+    points = meshSync.getPoints('terrain')
+    terrainTopology = topology.getTopology('terrain')
+    field = getTerrainField(points)
+    if field is not None:
+        normals = field.maps.normals().reshape(-1, 3) #cached next to the heightfield until the heights change
+    else:
+        normals = terrainTopology.vertexNormals(points)
+    trees = scatter.scatterTrees(points, normals, terrainTopology, np.ones(len(points), dtype=bool), density, treeHeight,
+                                 minTreeSize, maxTreeSize, maxSteepness, globalSeaLevel, (smallTreeSpacing, tallTreeSpacing))
+
+    '''spawn a tall tree above the input height and a small tree below, then group them'''
+    treeCount = len(trees['positions'])
+    rotations = np.zeros((treeCount, 3))
+    rotations[:, 1] = trees['rotations']
+    scales = np.repeat(trees['scales'][:, None], 3, axis=1)
+    if useInstancer == True: #one instancer node with the small tree as prototype 0 and the tall tree as prototype 1
+        instancer = meshSync.createInstancer(['smallTreeOBJ', 'tallTreeOBJ'], trees['tall'].astype(int), trees['positions'], rotations, scales, registry.groupName('Trees'))
+        if instancer is not None: #no trees fit, so nothing was made
+            registry.add('Trees', [instancer], False)
+    else:
+        prototypes = ['tallTreeOBJ' if tall else 'smallTreeOBJ' for tall in trees['tall']]
+        instances = meshSync.createInstances(prototypes, trees['positions'], rotations, scales, 'Tree', registry.groupName('Trees'), registry.nextNumber('Trees'))
+        registry.add('Trees', instances, False)
+
 def createTerrain(n, c1Height, c2Height, c3Height, c4Height, smooth):
     ''' Performs the diamond square algorithm
         Function adapted from Xiaosong Yang
@@ -460,103 +435,163 @@ def createTerrain(n, c1Height, c2Height, c3Height, c4Height, smooth):
     wallsExist = False
     
     deleteObjects(delTerrainList)
-    subdx = subdy = 2 ** n
-    width = height = subdx + 1 
-    terrain = cmds.polyPlane(n='terrain', axis=[0,1,0], w=20, h=20, sx=subdx, sy=subdy, ch=False)[0]
+    # calculate the terrain height data, heights[i, j] is the height of terrain.vtx[i*width+j]
+    heights = heightfield.diamondSquare(n, c1Height, c2Height, c3Height, c4Height)
+    createTerrainMesh(heightfield.subdivideHeights(heights, smooth)) #smoothed as a grid, so the plane and terrainField match
+
+def createTerrainMesh(heights, size=20.0):
+    ''' Creates the size x size terrain plane with one vertex per height
     
-    # initialise the terrain height data
-    terrainData = [0.0]*width*height
-    # the four corner
-    terrainData[0] = c1Height
-    terrainData[width-1] = c2Height
-    terrainData[(height-1)*width] = c4Height
-    terrainData[height*width-1] = c3Height
+    heights:    2D array of heights, heights[i, j] is the height of terrain.vtx[i*width+j]
+    size:       Float width and depth of the plane in world units
+    '''
+    global terrainField
+    subdy, subdx = heights.shape[0] - 1, heights.shape[1] - 1
+    terrain = cmds.polyPlane(n='terrain', axis=[0,1,0], w=size, h=size, sx=subdx, sy=subdy, ch=False)[0]
+    topology.registerGrid(terrain, subdx, subdy) #the plane's topology is known without querying it
+    terrainField = heightfield.Heightfield(heights, size)
     
-    for i in range(n, 0, -1): # different resolution
-        blockSize = 2**i
-        # for each resolution level, we need to calculate the height level for many blocks
-        # calculate the square centre
-        num = 2**(n-i)
-        for j in range(num):
-            startXIndex = j * blockSize
-            for k in range(num):
-                startYIndex = k * blockSize
-                calculateSquareCentre(startXIndex, startYIndex, blockSize, width, terrainData, 1.0*i/n)
-        num = 2**(n-i+1)+1
-        for j in range(num):
-            startXIndex = j * blockSize/2
-            for k in range(num):
-                startYIndex = k * blockSize/2
-                if (j+k)%2==1:
-                    calculateDiamondCentre(startXIndex, startYIndex, blockSize/2, width, height, terrainData, 1.0*i/n)
+    # change the vertex position of the plane according to the heights
+    points = meshSync.getPoints(terrain)
+    points[:, 1] = heights.ravel()
+    meshSync.setPoints(terrain, points)
+    return terrain
+
+def saveTerrainFile(path, dtype='float32'):
+    ''' Saves the terrain's heights to a memory mapped heightfield file (.npy or raw, float32 or uint16) '''
+    points = meshSync.getPoints('terrain')
+    field = getTerrainField(points)
+    if field is None:
+        errorMessage('Only a terrain plane that has not been smoothed or turned into a cube can be saved')
+        return
+    mappedHeightfield.saveHeightfield(path, field.heights, dtype, field.size)
+
+def loadTerrainFile(path):
+    ''' Replaces the terrain with one loaded from a heightfield file saved by saveTerrainFile (or tiledTerrain.py)
     
-    # change the vertex position of the plan according tot he terrainData
-    for i in range(height):
-        for j in range(width):
-            cmds.move(0, terrainData[i*width+j], 0, terrain+".vtx["+str(i*width+j)+"]", r=True)
-    cmds.polySmooth(kb=False, dv=smooth)
-    cmds.delete(ch=True)
+    Files with more than maxTerrainVertices heights are refused before any of their heights are read.
+    '''
+    global wallsExist
+    field = mappedHeightfield.openHeightfieldFile(path)
+    if field.shape[0] * field.shape[1] > maxTerrainVertices:
+        errorMessage('%s has %d x %d heights, too many to load as one mesh' % ((path,) + tuple(field.shape)))
+        return
+    wallsExist = False
+    deleteObjects(delTerrainList)
+    return createTerrainMesh(field[:, :], field.size)
 
-def createBuildings(buildingsPerFace, maxSize, minSize, rotation):    
-    ''' Generates the buildings on the selected face(s)
+def loadTerrainTile(worldSeed, n, column, row, folder=None, level=None, neighbourLevels=(None, None, None, None)):
+    ''' Creates one tile of a tiled world as its own mesh, placed next to its neighbours
+    
+    Tiles are seamless however many of them are loaded, so only the ones needed have to be created.
+    
+    worldSeed:          Integer seed of the world
+    n:                  Integer diamond square levels of every tile
+    column, row:        Integer position of the tile (row increases along -z)
+    folder:             String folder of tiles saved by tiledTerrain.py, the tile is generated here if it isn't there
+    level:              Integer level of detail to create the tile at (see lod.py), None for the full n
+    neighbourLevels:    Tuple of the (top, bottom, left, right) neighbours' levels, coarser borders are stitched to match
+    '''
+    name = 'terrainTile_%d_%d' % (column, row)
+    if cmds.objExists(name):
+        cmds.delete(name)
+    path = None if folder is None else tiledTerrain.tilePath(folder, column, row)
+    if path is not None and os.path.exists(path):
+        heights = np.load(path)
+    else:
+        heights = tiledTerrain.generateTile(worldSeed, n, column, row)
+    if level is not None:
+        heights = lod.stitchTile(heights, level, neighbourLevels)
+    points = heightfield.gridPoints(heights, tiledTerrain.TILE_SIZE)
+    x, z = tiledTerrain.tileOffset(column, row)
+    points[:, 0] += x
+    points[:, 2] += z
+    faceCounts, faceConnects = topology.gridFaces(heights.shape[1] - 1, heights.shape[0] - 1)
+    return meshSync.createMesh(name, points, faceCounts, faceConnects)
+
+def loadTerrainTiles(worldSeed, n, columns, rows, folder=None, camera='persp'):
+    ''' Creates every tile of a tiled world, each at a level of detail picked from its distance to the camera
+    
+    columns, rows:    Integer n.o. tiles of the world
+    camera:           String name of the camera transform the distances are measured from
+    
+    levels:           Dictionary of (column, row) -> level of detail
+    '''
+    cameraX, cameraY, cameraZ = cmds.xform(camera, q=True, ws=True, t=True)
+    levels = lod.selectTileLevels(cameraX, cameraZ, columns, rows, n, tiledTerrain.TILE_SIZE)
+    tiles = []
+    for (column, row), level in sorted(levels.items()):
+        tiles.append(loadTerrainTile(worldSeed, n, column, row, folder, level, lod.tileLevelsAround(levels, column, row)))
+    return tiles
+
+def createBuildings(buildingsPerFace, maxSize, minSize, rotation, faces=None, useInstances=True):    
+    ''' Generates the buildings on the selected face(s), see cityEngine.py
     
     buildingsPerFace:    Integer number of how many buildings are generated per face
     maxSize:             int The maximum size of each building
     minSize:             int The minimum size of each building
     rotation:            int angle of rotation for the building
-    '''
+    faces:               Integer array of the terrain faces to build on, None for the selected faces (which are flattened first)
+    useInstances:        Boolean, if True every building is an instance sharing its style's prototype mesh (only adding a transform each)
+                         instead of being built into one mesh holding a copy of every building
 
-    if areFacesSelected(False) == False: #exit function is faces arent selected
-        return  
-    flattenFaces()            
+    prototype:           String name of the imported building every building is a copy of
+    layout:              Dictionary of arrays holding the position, rotation, scale and roof height of every building
+    '''
+    selection=cmds.ls(sl=True)
+    if faces is None:
+        if areFacesSelected(True) == 0: #exit function is faces arent selected
+            return  
+        flattenFaces()            
+        faces = selectedFaceIndices()
+    if len(faces) == 0:
+        return
     if buildingType==0: #import the .OBJ files
         importOBJ('city.obj', 'pCube1', 'cityOBJ', 1, 'building', 'cube')
+        prototype, roofHeights = 'cityOBJ', (-1, 4) #skyscrapers get a random height
     elif buildingType==1:
         importOBJ('house.obj', 'pCube1', 'houseOBJ', 1, 'building', 'cube')
+        prototype, roofHeights = 'houseOBJ', (0, 0)
     
-    ''' initialise variables '''
-    selection=cmds.ls(sl=True)
-    vtxXValues = 0
-    vtxYValues = 0
-    vtxZValues = 0
-    faceVerts = []
-    face = cmds.ls(sl=True)
-    faceVerts = getFaceVTXValues(face)
-    print(faceVerts)
-    
-    ''' store all of the face values so that the centre of the face can be located to place to building on'''
-    for i in range(len(faceVerts)):
-            vtx=faceVerts[int(i)]
-            vtxXYZ = cmds.pointPosition('terrain.vtx['+vtx+']')
-            vtxXValues = vtxXValues + vtxXYZ[0]
-            vtxYValues = vtxYValues + vtxXYZ[1]
-            vtxZValues = vtxZValues + vtxXYZ[2]
-    
-    grp = cmds.ls('Buildings') #ungroups buildings so new group can be made
-    if grp:
-        cmds.ungroup(grp)
+    ''' lay out every building at once, then create them all in one batched step '''
+    layout = cityEngine.layoutBuildings(meshSync.getPoints('terrain'), topology.getTopology('terrain'), faces, buildingsPerFace,
+                                        minSize, maxSize, rotation, heightRange=roofHeights)
+    prototypePoints = meshSync.getPoints(prototype)
+    number = registry.nextNumber('Buildings') #new buildings are appended to the Buildings group in place
+    if useInstances == True: #the roof height becomes a y scale, as instances can't move the shared roof
+        translations, rotations, scales = cityEngine.instanceTransforms(prototypePoints, layout)
+        instances = meshSync.createInstances([prototype] * len(translations), translations, rotations, scales, 'building', registry.groupName('Buildings'), number)
+        registry.add('Buildings', instances, False)
+    else:
+        faceCounts, faceConnects = meshSync.getFaceVertices(prototype)
+        points, faceCounts, faceConnects = cityEngine.buildingMeshes(cityEngine.groundPrototype(prototypePoints), faceCounts, faceConnects, layout)
+        registry.add('Buildings', [meshSync.createMesh('buildingBlock%d' % number, points, faceCounts, faceConnects)])
+    if selection:
+        cmds.select(selection)
+    else:
+        cmds.select(clear=True)
+
+def createCity(buildingsPerFace, maxSize, minSize, rotation, maxSteepness, useInstances=True):
+    ''' Generates buildings on every face of flat land above the water
     
-    ''' duplicate the stored obj, puts it in the correct position and resizes it'''
-    if(buildingType==0):
-        building = cmds.duplicate('cityOBJ', n='building1')
-        cmds.select(building)
-        cmds.move(vtxXValues/4,vtxYValues/4,vtxZValues/4)
-        cmds.select(building[0]+'.f[1]')
-        cmds.move(0,random.uniform(-1,4),0, r=True)
+    maxSteepness:    The steepest gradient of the slope buildings are built on
+    field:           The terrain's Heightfield if the terrain is still its plane, used for the cached normals
+    land:            Boolean array of the terrain vertices buildings can stand on
+    '''
+    if (cmds.objExists('terrain') == False):
+        errorMessage('Create a terrain first')
+        return
+    points = meshSync.getPoints('terrain')
+    terrainTopology = topology.getTopology('terrain')
+    field = getTerrainField(points)
+    if field is not None:
+        normals = field.maps.normals().reshape(-1, 3) #cached next to the heightfield until the heights change
     else:
-        building = cmds.duplicate('houseOBJ', n='building1')
-        cmds.select(building)
-        cmds.move(vtxXValues/4,vtxYValues/4 +0.5,vtxZValues/4)
-    cmds.select(building)
-    randomScaleFactor = random.uniform(minSize, maxSize)/100
-    cmds.scale(randomScaleFactor, randomScaleFactor, randomScaleFactor, r=True)  
-    cmds.rotate(0, rotation, 0) 
-
-    buildingObjs = cmds.ls('building*') #Selects all objects with the prefix 'building' then groups them
-    if buildingObjs:
-        cmds.select(buildingObjs)
-    cmds.group(n="Buildings")
-    cmds.select(selection)
+        normals = terrainTopology.vertexNormals(points)
+    land = normals[:, 1] > 1 - maxSteepness
+    if cmds.objExists('water'):
+        land &= points[:, 1] > globalSeaLevel + 0.3
+    createBuildings(buildingsPerFace, maxSize, minSize, rotation, cityEngine.facesInMask(terrainTopology, land), useInstances)
 
 def changeFilePath():
     ''' Changes the global filepath string if a non empty string is entered '''
@@ -585,221 +620,87 @@ def initialiseRadioButtons(r, *args):
         buildingType=1 #house
 
 def createWalls():
-    ''' Returns a string saying wether the vertex input is or isn't on the outer edge of the plane
-    
-    vtx:         Integer identifier of the vertex used
-    
-    polyInfo:    List of one string element containing the edge identifies connected to the vertex
-    Split:       List of the polyinfo string split up into words
-    list:        List holding only the edge integer identifiers connected to the vertex
+    ''' Turns the terrain into a cube by adding walls from its outer edge down to globalBottomOfCube and a bottom
+
+    points:             Array of the X Y Z values of every terrain vertex
+    solidPoints:        Array of the vertex positions of the closed terrain (top, then bottom)
+    faceCounts:         Array of the n.o. vertices on each face of the closed terrain
+    faceConnects:       Array of each face's vertices, one face after the other
     '''
     global wallsExist
-    cmds.select('terrain')
-    noVerts = cmds.polyEvaluate(v=True)
-    progressCancelled = True
+    if (cmds.objExists('terrain') == False):
+        errorMessage('No terrain to create a cube or cube already exists')
+        return
     
     '''checking if the terrain has already been extruded'''
-    for vtx in range(noVerts):
-        if(cmds.pointPosition('terrain.vtx['+str(vtx)+']')[1] == globalBottomOfCube):
-            wallsExist = True
-            break
-    
-    if (cmds.objExists('terrain') == False or wallsExist==True):
+    points = meshSync.getPoints('terrain')
+    if (points[:, 1] == globalBottomOfCube).any():
+        wallsExist = True
+    if (wallsExist==True):
         errorMessage('No terrain to create a cube or cube already exists')
         print(wallsExist)
         return
-    
-    '''initialise progress window'''
-    progressStatus = 'Turning terrain into a cube, please wait'
-    progress = 0
-    cmds.progressWindow(t='Progress Bar', progress=0, status=progressStatus, ii=True)
-
-    '''find n.o. edges'''
-    cmds.select('terrain')
-    noEdges = cmds.polyEvaluate(e=True)
-    noTopFaces = cmds.polyEvaluate(f=True) #saved
-    outsideEdges = []
-    for edge in range(noEdges): #loop through every edge  
-        if(cmds.progressWindow(q=True, ic=True)):
-            cmds.progressWindow(endProgress=1)
-            return
-        cmds.select('terrain.e[' + str(edge) + ']')
-        polyInfo = cmds.polyInfo(ev=True)
-        split = polyInfo[0].split(' ')
-        for i in split:
-            split.remove('')
-        for i in split:
-            if i == 'Hard\n':
-                edgeNum = str(split[1])
-                outsideEdges.append(edgeNum[:-1])
-
-        progress = 100*(edge/noEdges)
-
-    cmds.select(d=True)
-
-    progressStatus='Extruding other plane vertices'
-    progressCounter = 0
-    for edge in outsideEdges:
-        if(cmds.progressWindow(q=True, ic=True)):
-            cmds.progressWindow(endProgress=1)
-            return
-
-        cmds.select('terrain.e[' + str(edge) + ']', add=True)
-
-        progressCounter=progressCounter+1
-        progress = 100*(progressCounter/len(outsideEdges))
-        #progress = float(int(edge)/len(outsideEdges))
-        cmds.progressWindow(edit=True, progress=progress, status=progressStatus)
-
-    cmds.polyExtrudeEdge(t=(0,globalBottomOfCube,0), kft=True)
-    
-    '''Flatten the extruded vertices'''
-    cmds.select('terrain')
-    noNewVerts = cmds.polyEvaluate(v=True)
-    cmds.select(d=True)
-    progressStatus='Extruding outer plane vertices'
-    progressCounter = 0
-    for vtx in range(noVerts,noNewVerts):
-        if(cmds.progressWindow(q=True, ic=True)):
-            cmds.progressWindow(endProgress=1)
-            return
-
-        cmds.select('terrain.vtx[' + str(vtx) + ']', add=True)
-
-        progressCounter=progressCounter+1
-        progress = 100*(progressCounter/len(range(noVerts,noNewVerts)))
-        cmds.progressWindow(edit=True, progress=progress, status=progressStatus)
-    cmds.move(globalBottomOfCube, y=True)
-
-    '''Create the bottom too''' #NOTE fix all the costant values (e.g. h=w=20, move to -10 etc.)
-    bottomPlaneSubdivs = m.sqrt(noTopFaces)
-    cmds.polyPlane(n='bottom', sx=bottomPlaneSubdivs, sy=bottomPlaneSubdivs, h=20, w=20)
-    cmds.move(globalBottomOfCube, y=True)
-    cmds.scale(1,-1,1)
-    cmds.polyUnite('terrain', 'bottom')
-    cmds.delete(ch=True)
-    cmds.rename('terrain')
-    cmds.polyMergeVertex(d=0.001)
 
+    '''build the top, walls and bottom as one set of arrays, then replace the terrain with it'''
+    solidPoints, faceCounts, faceConnects = meshBuild.closedSolid(points, topology.getTopology('terrain'), globalBottomOfCube)
+    cmds.delete('terrain')
+    meshSync.createMesh('terrain', solidPoints, faceCounts, faceConnects, meshBuild.planarUVs(solidPoints)) #keeps the plane's UVs on the top
     wallsExist=True
 
-    ''' Delete History '''
-    cmds.select('terrain')
-    cmds.delete(ch=True)
+def createCaves(sphereRadiusMax, sphereRadiusMin, noSpheres, spheres=None):
+    ''' Cuts a cave made of a chain of spheres into the cube terrain
 
-    '''End progress'''
-    cmds.progressWindow(endProgress=1) #d
+    The spheres are blended into one mesh outside Maya (see caveEngine.py), so the only boolean is cutting it out of the terrain.
 
-def seperateWater():
-    global globalSeperatedSea
-    #if globalSeperatedSea == True:
-        #return()
-    cmds.duplicate('terrain')
-    cmds.polyBoolOp('water', 'terrain1', op=1, n='water')
-    cmds.delete(ch=True)
-    cmds.select('terrain')
-    cmds.delete()
-    cmds.select('water')
-    cmds.rename('terrain')
-    globalSeperatedSea = True
-
-def createCaves(sphereRadiusMax, sphereRadiusMin, noSpheres):
+    sphereRadiusMax:    Float biggest sphere radius
+    sphereRadiusMin:    Float smallest sphere radius
+    noSpheres:          Integer n.o. spheres in the cave
+    spheres:            Dictionary from caveEngine.caveSpheres describing the cave (with its mesh if it has been built already),
+                        None makes a new random one
+    '''
     '''if the terrain doesn't exist, exit'''
     if (cmds.objExists('terrain') == False or wallsExist == False):
         errorMessage('Create a cube terrain first')
         return
 
-
-    ''' NOTE: IF WATER EXISTS THEN GIVE ERROR MSG HERE SAYING IF U CONTINUE THE WATER AND LAND IS COMBINED'''
-    seperateWater() #merge sea and water ew
-
-    #set values
-    xPos=0
-    yPos=0
-    zPos=0
-    xPosDiff=0
-    yPosDiff=0
-    zPosDiff=0
-    up=True
-    left=True
-
     #generate cave
-    for i in range(noSpheres):
-        #calculate their positions
-        xPosDiff = random.uniform(2,3)
-        
-        yPosDiff = random.uniform(-1,1)
-        if up==True:
-            yPos += 1.5
-        else:
-            yPos -= 1.5
-        
-        zPosDiff = random.uniform(-1,1)
-        if left==True:
-            zPos -= 1.5
-        else:
-            zPos += 1.5
-        
-        if yPosDiff > 0:
-            up=True
-        else:
-            up=False         
-        if zPosDiff > 0:
-            left=False
-        else:
-            left=True
-          
-        xPos += xPosDiff
-        yPos += yPosDiff    
-        zPos += zPosDiff
-        
-        #create the spheres
-        cmds.polySphere(n='cave0', r=random.uniform(sphereRadiusMin,sphereRadiusMax), sx=random.randint(4,6), sy=random.randint(4,6))    
-        cmds.move(xPos,yPos,zPos,r=True)
-    
-    #boolean union the shapes 
-    for i in range(noSpheres):    
-        if i==1:
-            s1='cave0'
-            s2='cave1'
-            cmds.polyCBoolOp(s1, s2, op=1, n='mergedCave')
-            cmds.delete(ch=True)
-        if i>1:
-            s2='cave'+str(i)
-            cmds.polyCBoolOp('mergedCave', s2, op=1, n='mergedCave')
-            cmds.delete(ch=True)
-            cmds.rename('mergedCave')
-
-    #make it more of a cave shape
-    cmds.polyReduce(p=50)
-    cmds.polySmooth(dv=2)
-    
-    #move the cave to be more in the terrains ground
-    cmds.move(-20,random.uniform(-5,-12),0,r=True)
-    cmds.rotate(0,random.randint(0,360),0)
+    if spheres is None:
+        spheres = caveEngine.caveSpheres(sphereRadiusMax, sphereRadiusMin, noSpheres, random.randint(0, 2**31-2))
+    if 'points' not in spheres:
+        spheres = dict(spheres)
+        spheres['points'], spheres['faceCounts'], spheres['faceConnects'] = caveEngine.caveMesh(spheres)
+    meshSync.createMesh('mergedCave', spheres['points'], spheres['faceCounts'], spheres['faceConnects'])
 
     #difference the cave with the terrain to merge them 
     cmds.polyCBoolOp('terrain', 'mergedCave', op=2, n='terrain')
     cmds.delete(ch=True)
     cmds.rename('terrain')
     
-def createRandomTerrain(checkboxesUsed):
+def createRandomTerrain(checkboxesUsed, seed=0, overrides=None):
     ''' Generates a random terrain by calling a combination of all of the functions
 
+    The terrain is worked out by the stages in pipeline.py, whose outputs are cached,
+    so generating the same seed again only recomputes the stages whose parameters changed.
+
     checkboxesUsed: if the checkboxes are used, import True
+    seed:           Integer seed of the whole terrain, 0 picks a random one
+    overrides:      Dictionary of stage name -> parameters to change, e.g. {'trees': {'density': 0.3}}
+
+    parameters:     Dictionary of every stage's parameters
+    results:        Dictionary of every stage's output
     '''
     global wallsExist
+    global globalSeaLevel
 
     ''' initialis '''
     wallsExist=False
-    waterExists=False
-    globalSeperatedSea=False   
     trees=True
     sea=True
     mountains=True
     lowSubdivs=False
     cube=True
     caves=True
+    erosion=True
 
     if checkboxesUsed == True: #if the checkboxes are used, initialise their values
         trees = cmds.checkBoxGrp('randomTerrainCBG', q=True, v1=True)
@@ -808,98 +709,53 @@ def createRandomTerrain(checkboxesUsed):
         lowSubdivs = cmds.checkBoxGrp('randomTerrainCBG2', q=True, v1=True)
         cube = cmds.checkBoxGrp('randomTerrainCBG2', q=True, v2=True)
         caves = cmds.checkBoxGrp('randomTerrainCBG2', q=True, v3=True)
+        erosion = cmds.checkBoxGrp('randomTerrainCBG3', q=True, v1=True)
         print str(trees) + str(sea) + str(mountains) + str(lowSubdivs)
+    if seed == 0:
+        seed = random.randint(1, 2**31-2)
+    print 'random terrain seed: ' + str(seed)
+
+    '''Work out every stage, reusing the cached ones'''
+    parameters = pipeline.randomParameters(seed, trees, sea, mountains, lowSubdivs, cube, caves, erosion)
+    if overrides:
+        for stage in overrides:
+            parameters[stage].update(overrides[stage])
+    results, keys, computed = pipeline.runPipeline(parameters, randomTerrainCache)
+    print 'recomputed stages: ' + ', '.join(computed)
 
     '''Create the terrain'''
-    if (lowSubdivs == True):
-        createTerrain(3, random.randint(0,8), random.randint(0,8), random.randint(0,8), random.randint(0,8), 1)
-    else:
-        createTerrain(random.randint(3,4), random.randint(0,8), random.randint(0,8), random.randint(0,8), random.randint(0,8), random.randint(0,2))
-    
-    '''set variables'''
-    cmds.select('terrain')
-    noFaces = cmds.polyEvaluate(f=True)
-    noVerts = cmds.polyEvaluate(v=True)
-    
-    '''find lowest point to know where to put sea'''
-    lowestYValue = 10
-    greatestYValue = -15
-    for vtx in range(0, noVerts-1):
-        vtxY = cmds.pointPosition('terrain.vtx['+str(vtx)+']')[1]
-        if(vtxY < lowestYValue):
-            lowestYValue = vtxY
-        elif(vtxY > greatestYValue):
-            greatestYValue = vtxY   
-
-    '''Smooth :)'''
-    if (lowSubdivs == False):
-        smoothTerrain()
-     
-    cmds.select('terrain')
-    noFaces = cmds.polyEvaluate(f=True)
-    noVerts = cmds.polyEvaluate(v=True)
-    
-    '''Create some mountains'''
-    if (mountains == True):
-        def randMountain(rchance,rnum1,rnum2,rnum3,rnum4):
-            if random.uniform(0,1) > rchance:
-                randomMountainFace = random.randint(0, noFaces-1)
-                cmds.select('terrain.f['+str(randomMountainFace)+']')
-                createMountain(random.uniform(rnum1,rnum2),random.uniform(rnum3,rnum4))
-
-        randMountain(0.3,1,6,0.5,5)
-        randMountain(0.5,2,7,0.5,3)
-        randMountain(0.5,2,7,0.5,3)
-        randMountain(0.5,2,7,0.5,3)
-    
-    '''add some heightOffset to the surface'''
-    cmds.select('terrain')
-    noVerts = cmds.polyEvaluate(v=True)
-    if(noVerts < 2000):
-        bumpTerrain(random.uniform(0.05,0.25))
-    elif(noVerts < 4000):
-        bumpTerrain(random.uniform(0.05,0.1))
-    elif(noVerts < 5000):
-        bumpTerrain(random.uniform(0.02,0.05))
-     
-    '''Generates sea level (1 in 2 chance)'''          
-    if (checkboxesUsed == True and sea==True and random.uniform(0,1)) or (checkboxesUsed == False and random.uniform(0,1)):
-        print 'creating sea'
-        #createWaterCube(random.uniform(lowestYValue+1.0,lowestYValue+1.5)+1)
-        createWaterCube(random.uniform(float(lowestYValue)+2.5,float(greatestYValue)-1.0))
-        waterExists=True   
-
-    '''Generates some lakes/rivers'''
-    if random.uniform(0,1) > 0.3 and waterExists==True:
-        cmds.select('terrain.f['+ str(random.randint(0,noFaces-1)) + ']')
-        '''for i in range(random.randint(5,15)):
-            cmds.select(cmds.pickWalk(), add=True)
-        createTrenches(random.uniform(), random.uniform)'''
-        createTrenches(random.uniform(1,5), random.uniform(0,2))
-    
+    deleteObjects(delTerrainList)
+    createTerrainMesh(results['rivers']['heights'])
 
-    '''Generate trees (3 in 5 chance of spawning)'''
-    if trees == True:
-        if noVerts < 1000:
-            generateTrees(random.uniform(5,11), 5.5, 50, 80, 0.3)
-        elif noVerts > 10000:
-            generateTrees(random.uniform(1,4), 5.5, 15, 25, 0.3)
-        elif noVerts > 3000:
-            generateTrees(random.uniform(2,5), 5.5, 15, 30, 0.3)
-        else:
-            generateTrees(random.uniform(2,7), 5.5, 30, 40, 0.3)
+    '''Generates the sea and lakes'''
+    if results['lakes']:
+        print 'creating sea and lakes'
+        createLakes(results['sea']['seaLevel'], results['lakes'])
+    else:
+        globalSeaLevel = -99
+
+    '''Generate trees'''
+    if results['trees'] is not None:
+        importOBJ('tree.obj', 'Tree', 'smallTreeOBJ', 0.3, 'tree', 'sphere')
+        importOBJ('tree2.obj', 'pCylinder1', 'tallTreeOBJ', 0.3, 'tree', 'sphere')
+        treeCount = len(results['trees']['positions'])
+        rotations = np.zeros((treeCount, 3))
+        rotations[:, 1] = results['trees']['rotations']
+        scales = np.repeat(results['trees']['scales'][:, None], 3, axis=1)
+        prototypes = ['tallTreeOBJ' if tall else 'smallTreeOBJ' for tall in results['trees']['tall']]
+        instances = meshSync.createInstances(prototypes, results['trees']['positions'], rotations, scales, 'Tree', registry.groupName('Trees'), registry.nextNumber('Trees'))
+        registry.add('Trees', instances, False)
 
     '''Turn into a cube'''
-    if cube == True:
-        createWalls() #d
+    if results['walls'] is not None:
+        cmds.delete('terrain')
+        meshSync.createMesh('terrain', results['walls']['points'], results['walls']['faceCounts'], results['walls']['faceConnects'],
+                            meshBuild.planarUVs(results['walls']['points']))
+        wallsExist = True
 
     '''Generate Caves'''
-    if caves == True:
-        for i in range(0,random.randint(1,4)):
-            if lowSubdivs == True:
-                createCaves(3.5, 2.5, 20)
-                return()
-            createCaves() #use noverts to determine how big to make the caves
+    for spheres in results['caves']:
+        createCaves(3.5, 2.5, 20, spheres)
 
 def repeatedButtons():
     ''' ui elements repeated on each tab '''
@@ -968,15 +824,29 @@ def createUI():
     cmds.text('Click the button directly below to generate a completely random terrain')
     sep(5)
     cmds.button(label = "Generate Completely Random Terrain", command=lambda *args: createRandomTerrain(False))
+    sep(5)
+    randomSeedControl = cmds.intFieldGrp(label='Seed (0 = random)', value1=0)
     cmds.separator(h=30)
     cmds.text('Check the boxes of the things you want in your terrain, then click the bottom button')
     sep(5)
     randomTerrainCBG = cmds.checkBoxGrp('randomTerrainCBG', numberOfCheckBoxes=3, label='', labelArray3=['Trees', 'Sea', 'Mountains'] )
     randomTerrainCBG2 = cmds.checkBoxGrp('randomTerrainCBG2', numberOfCheckBoxes=3, label='', labelArray3=['Low n.o subdivs','Cube Terrain', 'Caves'] )
+    randomTerrainCBG3 = cmds.checkBoxGrp('randomTerrainCBG3', numberOfCheckBoxes=1, label='', label1='Erosion' )
     sep(10) #probs could do 4 boxes per row
-    cmds.button(label = "Generate Terrain", command=lambda *args: createRandomTerrain(True))
+    cmds.button(label = "Generate Terrain", command=lambda *args: createRandomTerrain(True, cmds.intFieldGrp(randomSeedControl, q=True, value1=True)))
     cmds.separator(h=20)
     cmds.text('After generating the terrain, you can proceed to edit the terrain or generate structures using the other tabs')
+    cmds.separator(h=30)
+    cmds.text('Load one tile of a seamless tiled world (tiles line up with their neighbours)')
+    sep(5)
+    tileWorldControl = cmds.intFieldGrp(numberOfFields=2, label='World seed, levels', value1=0, value2=5)
+    tilePositionControl = cmds.intFieldGrp(numberOfFields=2, label='Tile column, row', value1=0, value2=0)
+    cmds.button(label = "Load Tile", command=lambda *args: loadTerrainTile(cmds.intFieldGrp(tileWorldControl, q=True, value1=True), cmds.intFieldGrp(tileWorldControl, q=True, value2=True),
+                                                                           cmds.intFieldGrp(tilePositionControl, q=True, value1=True), cmds.intFieldGrp(tilePositionControl, q=True, value2=True)))
+    sep(5)
+    tileCountControl = cmds.intFieldGrp(numberOfFields=2, label='World columns, rows', value1=4, value2=4)
+    cmds.button(label = "Load World (less detail further from the camera)", command=lambda *args: loadTerrainTiles(cmds.intFieldGrp(tileWorldControl, q=True, value1=True), cmds.intFieldGrp(tileWorldControl, q=True, value2=True),
+                                                                           cmds.intFieldGrp(tileCountControl, q=True, value1=True), cmds.intFieldGrp(tileCountControl, q=True, value2=True)))
     sep(5)
     repeatedButtons()
     
@@ -1038,14 +908,31 @@ def createUI():
     trenchRadiusControl = cmds.floatSliderGrp(label='Trench walls width', min=0, max=5, value=3, step=0.01, sbm=1, field=True)
     sep(10)
     cmds.button(label = "Create trench on face(s)", command=lambda *args: createTrenches(cmds.floatSliderGrp(trenchRadiusControl, q=True, v=True), cmds.floatSliderGrp(trenchDepthControl, q=True, v=True)))
+    sep(20)
+    cmds.text('Erode the terrain with rain (carves valleys) and landslides (softens steep slopes)')
+    sep(10)
+    hydraulicControl = cmds.intSliderGrp(label='Rain iterations', min=0, max=200, value=50, field=True)
+    thermalControl = cmds.intSliderGrp(label='Landslide iterations', min=0, max=200, value=20, field=True)
+    sep(10)
+    cmds.button(label = "Erode terrain", command=lambda *args: erodeTerrain(cmds.intSliderGrp(hydraulicControl, q=True, v=True), cmds.intSliderGrp(thermalControl, q=True, v=True)))
+    sep(20)
+    cmds.text('Carve rivers where the most water would flow (lower amounts of water give more rivers)')
+    sep(10)
+    riverAccumulationControl = cmds.floatSliderGrp(label='Water to start a river', min=0.005, max=0.2, value=0.03, step=0.005, sbm=1, field=True)
+    riverWidthControl = cmds.floatSliderGrp(label='River width', min=0.05, max=2, value=0.5, step=0.01, sbm=1, field=True)
+    riverDepthControl = cmds.floatSliderGrp(label='River depth', min=0, max=3, value=1, step=0.01, sbm=1, field=True)
+    sep(10)
+    cmds.button(label = "Carve rivers", command=lambda *args: carveRivers(cmds.floatSliderGrp(riverAccumulationControl, q=True, v=True), cmds.floatSliderGrp(riverWidthControl, q=True, v=True), cmds.floatSliderGrp(riverDepthControl, q=True, v=True)))
     sep(10)
     cmds.text('Make sure to have finalised your terrain before adding trees or buildings')
     sep(5)
     cmds.rowColumnLayout( numberOfColumns=4, columnWidth=[(1,166), (2,166), (3,166)], adjustableColumn=2)
     cmds.button(label = "Slightly Flatten Plane", command=lambda *args: bumpTerrain(0))
-    cmds.button(label = "Flatten Selected Faces", command=lambda *args: flattenFaces())
+    cmds.button(label = "Flatten Selected Faces", command=lambda *args: flattenFaces(flatten.MODES[cmds.radioButtonGrp(flattenModeControl, q=True, sl=True) - 1], cmds.floatSliderGrp(flattenFalloffControl, q=True, v=True)))
     cmds.button(label = "Smooth (subdivide) Plane Once", command=lambda *args: smoothTerrain())
     cmds.setParent( '..' )
+    flattenModeControl = cmds.radioButtonGrp(label='Flatten each', labelArray3=['Group of touching faces', 'Face', 'Whole selection'], numberOfRadioButtons=3, sl=1)
+    flattenFalloffControl = cmds.floatSliderGrp(label='Flatten falloff', min=0, max=10, value=2, step=0.01, sbm=1, field=True)
     repeatedButtons()
 
     child9 = cmds.columnLayout(adjustableColumn=True)
@@ -1053,11 +940,16 @@ def createUI():
     cmds.text('Generate water at a given depth')
     sep(10)
     waterDepthControl = cmds.floatSliderGrp(label='Sea level', min=globalBottomOfCube, max=10, value=1, step=0.01, sbm=1, field=True)
+    waterSubdivisionsControl = cmds.intSliderGrp(label='Wave detail (subdivs)', min=1, max=200, value=9, field=True)
     sep(10)
     cmds.rowColumnLayout( numberOfColumns=2, columnWidth=[(1,250), (2,250)], adjustableColumn=2, columnAttach=[(1, 'both', 0), (2, 'both', 0) ])
-    cmds.button(label = "Create water", command=lambda *args: createWaterCube(cmds.floatSliderGrp(waterDepthControl, q=True, v=True)))
+    cmds.button(label = "Create water", command=lambda *args: createWaterCube(cmds.floatSliderGrp(waterDepthControl, q=True, v=True), cmds.intSliderGrp(waterSubdivisionsControl, q=True, v=True)))
     cmds.button(label = "Delete water", command=lambda *args: deleteObjects('water'))
-    cmds.setParent("..") 
+    cmds.setParent("..")
+    sep(10)
+    cmds.text('Or fill each hollow of the terrain with a lake, and the sea up to the sea level')
+    sep(5)
+    cmds.button(label = "Create sea and lakes", command=lambda *args: createLakes(cmds.floatSliderGrp(waterDepthControl, q=True, v=True))) 
     repeatedButtons()
 
     ''' Cave Tab '''
@@ -1079,18 +971,22 @@ def createUI():
     cmds.text('     Adjust the sliders then click generate trees', al='left')
     cmds.text('     Above the tree species threshold height, tall trees will spawn, otherwise smaller trees will spawn', al='left')
     cmds.text('     The maximum angle goes from 0.01 spawning trees on only flat surfaces to 0.99 with trees anywhere', al='left')
-    cmds.text('     Each vertice of the plane has a % chance of generating a tree, use a low spawn rate for a high vertex number', al='left')
+    cmds.text('     Trees are spread evenly at the density you choose, however many vertices the plane has', al='left')
+    cmds.text('     No tree grows closer to another than the spacing of its species', al='left')
     cmds.separator(h=20)
-    noTreesControl = cmds.intSliderGrp(label='Spawn rate per vert', min=1, max=100, value=20, step=1, sbm=1, field=True)
+    noTreesControl = cmds.floatSliderGrp(label='Trees per unit area', min=0.01, max=3, value=0.5, step=0.01, sbm=1, field=True)
+    smallTreeSpacingControl = cmds.floatSliderGrp(label='Small tree spacing', min=0, max=5, value=0.6, step=0.01, sbm=1, field=True)
+    tallTreeSpacingControl = cmds.floatSliderGrp(label='Tall tree spacing', min=0, max=5, value=0.9, step=0.01, sbm=1, field=True)
     treeSteepnessControl = cmds.floatSliderGrp(label='Max angle trees grow on', min=0.01, max=0.99, value=0.3, step=0.01, sbm=1, field=True)
     differentTreeHeightControl = cmds.floatSliderGrp(label='Tree species threshold', min=0, max=10, value=4, step=0.01, sbm=1, field=True)
     sep(5)
     minTreeSizeControl = cmds.floatSliderGrp(label='Minimum Tree Size %', min=0.01, max=100, value=60, step=0.01, sbm=1, field=True)
     maxTreeSizeControl = cmds.floatSliderGrp(label='Maximum Tree Size %', min=0.01, max=100, value=80, step=0.01, sbm=1, field=True)
+    treeInstancerControl = cmds.checkBoxGrp(numberOfCheckBoxes=1, label='', label1='Use one instancer node (faster with lots of trees)')
     #cmds.rowLayout(numberOfColumns=2)
     sep(10)
     cmds.rowColumnLayout( numberOfColumns=2, columnWidth=[(1,250), (2,250)], adjustableColumn=2, columnAttach=[(1, 'both', 0), (2, 'both', 0) ])
-    cmds.button(label = "Generate Trees", command=lambda *args: generateTrees(cmds.intSliderGrp(noTreesControl, q=True, v=True), cmds.floatSliderGrp(differentTreeHeightControl, q=True, v=True), cmds.floatSliderGrp(minTreeSizeControl, q=True, v=True), cmds.floatSliderGrp(maxTreeSizeControl, q=True, v=True), cmds.floatSliderGrp(treeSteepnessControl, q=True, v=True)))
+    cmds.button(label = "Generate Trees", command=lambda *args: generateTrees(cmds.floatSliderGrp(noTreesControl, q=True, v=True), cmds.floatSliderGrp(differentTreeHeightControl, q=True, v=True), cmds.floatSliderGrp(minTreeSizeControl, q=True, v=True), cmds.floatSliderGrp(maxTreeSizeControl, q=True, v=True), cmds.floatSliderGrp(treeSteepnessControl, q=True, v=True), cmds.checkBoxGrp(treeInstancerControl, q=True, v1=True), cmds.floatSliderGrp(smallTreeSpacingControl, q=True, v=True), cmds.floatSliderGrp(tallTreeSpacingControl, q=True, v=True)))
     cmds.button(label = "Delete Trees", command=lambda *args: deleteObjects(delTreeList))
     cmds.setParent( '..' )
     repeatedButtons()
@@ -1100,8 +996,8 @@ def createUI():
     sep(5)
     cmds.text('Select a face that you want to generate a building/buildings on')
     sep(5)
-    #slider for 1-4 : select n.o. buildings per face
-    noBuildingsControl = cmds.intSliderGrp(label='Buildings per face', min=1, max=4, value=1, step=1, sbm=1, field=True)
+    #slider for 1-9 : select n.o. buildings per face
+    noBuildingsControl = cmds.intSliderGrp(label='Buildings per face', min=1, max=9, value=1, step=1, sbm=1, field=True)
     cmds.rowColumnLayout( numberOfColumns=4, columnWidth=[(1,20), (2,150), (3, 150), (4,150)], adjustableColumn=2, columnAttach=[(1, 'both', 0), (2, 'both', 0) ])
     cmds.separator(st='none')
     #radiobuttons asking for city buildings or houses
@@ -1115,12 +1011,15 @@ def createUI():
     minBuildingSizeControl = cmds.floatSliderGrp(label='Minimum Building Size %', min=30, max=100, value=45, step=0.01, sbm=1, field=True)
     maxBuildingSizeControl = cmds.floatSliderGrp(label='Maximum Building Size %', min=30, max=100, value=90, step=0.01, sbm=1, field=True)
     buildingRotationControl = cmds.floatSliderGrp(label='Building Rotation (deg)', min=0, max=360, value=0, step=0.01, sbm=1, field=True)
+    citySteepnessControl = cmds.floatSliderGrp(label='City max steepness', min=0, max=1, value=0.1, step=0.01, sbm=1, field=True)
+    buildingInstancesControl = cmds.checkBoxGrp(label='Share geometry', label1='Instance one mesh per building style', v1=True)
     #no max min
     sep(10)
     cmds.rowColumnLayout( numberOfColumns=4, columnWidth=[(1,166), (2,166), (3,166)], adjustableColumn=2, columnAttach=[(1, 'both', 0), (2, 'both', 0) ])
-    cmds.button(label = "Create a building", command=lambda *args: createBuildings(cmds.intSliderGrp(noBuildingsControl, q=True, v=True), cmds.floatSliderGrp(maxBuildingSizeControl, q=True, v=True), cmds.floatSliderGrp(minBuildingSizeControl, q=True, v=True), cmds.floatSliderGrp(buildingRotationControl, q=True, v=True)))
+    cmds.button(label = "Create a building", command=lambda *args: createBuildings(cmds.intSliderGrp(noBuildingsControl, q=True, v=True), cmds.floatSliderGrp(maxBuildingSizeControl, q=True, v=True), cmds.floatSliderGrp(minBuildingSizeControl, q=True, v=True), cmds.floatSliderGrp(buildingRotationControl, q=True, v=True), None, cmds.checkBoxGrp(buildingInstancesControl, q=True, v1=True)))
     cmds.button(label = "Delete all buildings", command=lambda *args: deleteObjects('Buildings')) 
     cmds.button(label = "Flatten Selected Faces", command=lambda *args: flattenFaces())
+    cmds.button(label = "Build a city on all flat land", command=lambda *args: createCity(cmds.intSliderGrp(noBuildingsControl, q=True, v=True), cmds.floatSliderGrp(maxBuildingSizeControl, q=True, v=True), cmds.floatSliderGrp(minBuildingSizeControl, q=True, v=True), cmds.floatSliderGrp(buildingRotationControl, q=True, v=True), cmds.floatSliderGrp(citySteepnessControl, q=True, v=True), cmds.checkBoxGrp(buildingInstancesControl, q=True, v1=True)))
     cmds.setParent( '..' )
     sep(5)   
     repeatedButtons()
@@ -0,0 +1,143 @@
+"""Landscaper memory mapped heightfields
+
+Keeps a heightfield in a file (.npy or raw) that is memory mapped instead
+of read, so terrains bigger than RAM can be generated, edited and exported
+a window at a time, and reopening a saved terrain only reads its header.
+
+Heights are stored as float32, or as uint16 scaled between minHeight and
+maxHeight (half the size, about 1/65535 of the height range precision).
+A small JSON file next to the heights (path + '.json') holds the size,
+height range and, for raw files, the shape and type.
+
+"""
+import json
+import os
+
+import numpy as np
+
+STORAGE_TYPES = ('float32', 'uint16')
+UINT16_MAX = 65535.0
+
+
+def metadataPath(path):
+    ''' Returns the path of the JSON file describing the heightfield file '''
+    return path + '.json'
+
+def createHeightfieldFile(path, rows, columns, dtype='float32', minHeight=0.0, maxHeight=1.0, size=20.0):
+    ''' Creates a new heightfield file (filled with minHeight) and returns it opened for writing
+
+    path:                    String path, ending in .npy for a NumPy file, anything else is raw
+    rows, columns:           Integer n.o. samples
+    dtype:                   String 'float32' or 'uint16'
+    minHeight, maxHeight:    Float range uint16 values are scaled to (ignored by float32 storage)
+    size:                    Float width and depth of the terrain in world units
+    '''
+    if dtype not in STORAGE_TYPES:
+        raise ValueError('dtype must be one of %s, not %r' % (STORAGE_TYPES, dtype))
+    shape = (int(rows), int(columns))
+    if path.endswith('.npy'):
+        storage = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+    else:
+        storage = np.memmap(path, mode='w+', dtype=dtype, shape=shape)
+    metadata = {'shape': list(shape), 'dtype': dtype, 'minHeight': float(minHeight), 'maxHeight': float(maxHeight), 'size': float(size)}
+    with open(metadataPath(path), 'w') as metadataFile:
+        json.dump(metadata, metadataFile)
+    if dtype == 'float32':
+        storage[:] = minHeight
+    return MappedHeightfield(path, storage, metadata)
+
+def openHeightfieldFile(path, mode='r'):
+    ''' Opens an existing heightfield file without reading its heights
+
+    mode:    String 'r' for read only or 'r+' to write windows back
+    '''
+    metadata = {'minHeight': 0.0, 'maxHeight': 1.0, 'size': 20.0}
+    if os.path.exists(metadataPath(path)):
+        with open(metadataPath(path)) as metadataFile:
+            metadata.update(json.load(metadataFile))
+    if path.endswith('.npy'):
+        storage = np.load(path, mmap_mode=mode)
+        metadata['shape'], metadata['dtype'] = list(storage.shape), str(storage.dtype)
+    elif 'shape' not in metadata:
+        raise IOError('raw heightfield %s has no %s describing its shape' % (path, metadataPath(path)))
+    else:
+        storage = np.memmap(path, mode=mode, dtype=metadata['dtype'], shape=tuple(metadata['shape']))
+    return MappedHeightfield(path, storage, metadata)
+
+def saveHeightfield(path, heights, dtype='float32', size=20.0, blockRows=1024):
+    ''' Writes an in-memory heights array to a heightfield file, returns it opened for writing
+
+    uint16 files use the heights' own range.
+    '''
+    heights = np.asarray(heights)
+    field = createHeightfieldFile(path, heights.shape[0], heights.shape[1], dtype, float(heights.min()), float(heights.max()), size)
+    for first, last in field.rowBlocks(blockRows):
+        field.writeWindow(first, 0, heights[first:last])
+    field.flush()
+    return field
+
+
+class MappedHeightfield(object):
+    ''' A heightfield stored in a memory mapped file, read and written a window at a time
+
+    Indexing it (field[first:last]) reads a window as float32 heights like a 2D array,
+    so it can be passed to code expecting heights, e.g. objExport.writeHeightfield.
+
+    path:        String path of the file
+    storage:     The memory mapped array of stored values (float32 or uint16)
+    minHeight:   Float height of uint16 value 0
+    maxHeight:   Float height of uint16 value 65535
+    size:        Float width and depth of the terrain in world units
+    '''
+    def __init__(self, path, storage, metadata):
+        self.path = path
+        self.storage = storage
+        self.minHeight = metadata['minHeight']
+        self.maxHeight = metadata['maxHeight']
+        self.size = metadata['size']
+
+    @property
+    def shape(self):
+        return self.storage.shape
+
+    @property
+    def spacing(self):
+        ''' Float world distance between neighbouring samples '''
+        return self.size / (self.shape[1] - 1)
+
+    def decode(self, values):
+        ''' Returns stored values as float32 heights '''
+        if self.storage.dtype == np.uint16:
+            scale = (self.maxHeight - self.minHeight) / UINT16_MAX
+            return (self.minHeight + values * scale).astype(np.float32)
+        return np.array(values, dtype=np.float32)
+
+    def encode(self, heights):
+        ''' Returns heights as stored values (uint16 heights are clipped to the height range) '''
+        if self.storage.dtype == np.uint16:
+            heightRange = max(self.maxHeight - self.minHeight, 1e-12)
+            values = np.rint((np.asarray(heights, dtype=np.float64) - self.minHeight) * (UINT16_MAX / heightRange))
+            return np.clip(values, 0, UINT16_MAX).astype(np.uint16)
+        return np.asarray(heights, dtype=np.float32)
+
+    def __getitem__(self, key):
+        return self.decode(self.storage[key])
+
+    def readWindow(self, firstRow, lastRow, firstColumn=0, lastColumn=None):
+        ''' Returns a float32 copy of heights[firstRow:lastRow, firstColumn:lastColumn] '''
+        return self.decode(self.storage[firstRow:lastRow, firstColumn:lastColumn])
+
+    def writeWindow(self, firstRow, firstColumn, heights):
+        ''' Writes a 2D block of heights with its top left sample at (firstRow, firstColumn) '''
+        heights = np.asarray(heights)
+        self.storage[firstRow:firstRow + heights.shape[0], firstColumn:firstColumn + heights.shape[1]] = self.encode(heights)
+
+    def rowBlocks(self, blockRows):
+        ''' Yields the (firstRow, lastRow) ranges splitting the heightfield into blocks of rows '''
+        for first in range(0, self.shape[0], blockRows):
+            yield first, min(self.shape[0], first + blockRows)
+
+    def flush(self):
+        ''' Writes any changed windows to the file '''
+        if hasattr(self.storage, 'flush'):
+            self.storage.flush()
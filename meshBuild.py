@@ -0,0 +1,227 @@
+"""Landscaper mesh builder
+
+Builds whole meshes as vertex/face arrays, so they can be created in Maya
+with a single meshSync.createMesh call instead of extruding, uniting and
+merging geometry one step at a time.
+
+"""
+import numpy as np
+
+import heightfield
+import topology
+
+
+def reversedFaces(faceCounts, faceConnects):
+    ''' Returns faceConnects with the vertex order of every face reversed (flipping its normal)
+
+    faceStarts:    Array of where each face starts in faceConnects
+    '''
+    faceCounts = np.asarray(faceCounts, dtype=np.int64)
+    faceConnects = np.asarray(faceConnects, dtype=np.int64)
+    faceStarts = np.concatenate(([0], np.cumsum(faceCounts)))
+    first = np.repeat(faceStarts[:-1], faceCounts)
+    last = np.repeat(faceStarts[1:] - 1, faceCounts)
+    return faceConnects[first + last - np.arange(len(faceConnects))]
+
+def boundaryEdges(topologyIndex):
+    ''' Returns an (e, 2) array of the border edges, ordered the same way round as the faces they belong to '''
+    vertexCount = topologyIndex.vertexCount
+    start = topologyIndex.faceConnects
+    end = topologyIndex.faceConnects[topologyIndex.nextCorner]
+    keys = np.minimum(start, end) * vertexCount + np.maximum(start, end)
+    borderEdges = topologyIndex.edges[topologyIndex.edgeFaces == 1]
+    onBorder = np.isin(keys, borderEdges[:, 0] * vertexCount + borderEdges[:, 1])
+    return np.stack((start[onBorder], end[onBorder]), axis=1)
+
+def closedSolid(points, topologyIndex, bottomY):
+    ''' Turns an open surface (e.g. the terrain plane) into a closed solid
+
+    The top is the surface itself, the bottom is a copy of it flattened to bottomY
+    facing down, and the skirt walls are one quad per border edge joining the two.
+
+    points:           (n, 3) array of the surface's vertex positions
+    topologyIndex:    TopologyIndex of the surface
+    bottomY:          Float y level of the bottom
+
+    Returns (points, faceCounts, faceConnects) of the solid:
+    bottom vertex i + n sits under top vertex i
+    '''
+    points = np.asarray(points, dtype=np.float64)
+    count = len(points)
+    bottomPoints = points.copy()
+    bottomPoints[:, 1] = bottomY
+
+    # top faces traverse each border edge a -> b, so the wall traverses it b -> a to keep the normals consistent
+    border = boundaryEdges(topologyIndex)
+    walls = np.stack((border[:, 1], border[:, 0], border[:, 0] + count, border[:, 1] + count), axis=1)
+
+    faceCounts = np.concatenate((topologyIndex.faceCounts, topologyIndex.faceCounts, np.full(len(walls), 4, dtype=np.int64)))
+    faceConnects = np.concatenate((topologyIndex.faceConnects,
+                                   reversedFaces(topologyIndex.faceCounts, topologyIndex.faceConnects) + count,
+                                   walls.ravel()))
+    return np.concatenate((points, bottomPoints)), faceCounts, faceConnects
+
+def planarUVs(points):
+    ''' Returns an (n, 2) array of UVs projecting the points straight down onto their x z bounding square
+
+    The same UVs a polyPlane has: (0, 0) at the -x +z corner and (1, 1) at the +x -z corner.
+    '''
+    points = np.asarray(points, dtype=np.float64)
+    low, high = points.min(axis=0), points.max(axis=0)
+    extent = np.maximum(high - low, 1e-12)
+    return np.stack(((points[:, 0] - low[0]) / extent[0], (high[2] - points[:, 2]) / extent[2]), axis=1)
+
+def waterSurface(heights, cells, level, size=20.0):
+    ''' Builds the flat water surface of a lake over a heightfield, with a skirt where it meets the terrain's edge
+
+    Every grid quad with a wet corner is covered, so the water's edge always sits under the shore.
+    Where the lake reaches the border of the terrain a skirt hangs from the water down to the ground,
+    so the water doesn't look hollow from the side of a cube terrain.
+
+    heights:    2D array of the terrain heights (polyPlane layout)
+    cells:      Integer array of the lake's wet cells (row * columns + column)
+    level:      Float height of the water
+    size:       Float width and depth of the terrain in world units
+
+    Returns (points, faceCounts, faceConnects) of the water
+    '''
+    heights = np.asarray(heights, dtype=np.float64)
+    rows, columns = heights.shape
+    wet = np.zeros(heights.size, dtype=bool)
+    wet[cells] = True
+    wet = wet.reshape(heights.shape)
+    covered = wet[:-1, :-1] | wet[:-1, 1:] | wet[1:, :-1] | wet[1:, 1:]
+    quadRows, quadColumns = np.nonzero(covered)
+    first = quadRows * columns + quadColumns
+    quads = np.stack((first, first + 1, first + columns + 1, first + columns), axis=1)
+
+    # keep only the grid vertices the quads use, renumbered from 0
+    used = np.unique(quads)
+    newIndex = np.full(heights.size, -1, dtype=np.int64)
+    newIndex[used] = np.arange(len(used))
+    usedRows, usedColumns = used // columns, used % columns
+    points = np.empty((len(used), 3))
+    points[:, 0] = -0.5 * size + usedColumns * (size / (columns - 1))
+    points[:, 1] = level
+    points[:, 2] = 0.5 * size - usedRows * (size / (rows - 1))
+    quads = newIndex[quads]
+
+    # skirt quads under the border edges of the surface that lie on the terrain's border
+    surface = topology.TopologyIndex(np.full(len(quads), 4, dtype=np.int64), quads.ravel(), len(used))
+    border = boundaryEdges(surface)
+    startRow, endRow = usedRows[border[:, 0]], usedRows[border[:, 1]]
+    startColumn, endColumn = usedColumns[border[:, 0]], usedColumns[border[:, 1]]
+    outside = ((startRow == endRow) & ((startRow == 0) | (startRow == rows - 1))) | \
+              ((startColumn == endColumn) & ((startColumn == 0) | (startColumn == columns - 1)))
+    border = border[outside]
+    skirtVertices = np.unique(border)
+    skirtIndex = np.full(len(used), -1, dtype=np.int64)
+    skirtIndex[skirtVertices] = len(used) + np.arange(len(skirtVertices))
+    skirtPoints = points[skirtVertices].copy()
+    skirtPoints[:, 1] = np.minimum(heights.ravel()[used[skirtVertices]], level)
+    skirt = np.stack((border[:, 1], border[:, 0], skirtIndex[border[:, 0]], skirtIndex[border[:, 1]]), axis=1)
+
+    faceConnects = np.concatenate((quads.ravel(), skirt.ravel()))
+    return np.concatenate((points, skirtPoints)), np.full(len(quads) + len(skirt), 4, dtype=np.int64), faceConnects
+
+def waterBlock(seaLevel, bottomY, size=19.9, subdivisions=9, waveHeight=0.2, seed=None):
+    ''' Builds a block of water: a wavy surface at the sea level, closed with walls and a flat bottom
+
+    Works at any resolution, the surface is a grid of heights jittered all at once then closed like the terrain cube.
+
+    seaLevel:        Float height of the water surface
+    bottomY:         Float height of the bottom of the block
+    size:            Float width and depth of the block in world units
+    subdivisions:    Integer n.o. faces along each side of the surface
+    waveHeight:      Float biggest random offset of a surface vertex, up or down
+    seed:            Integer seed or RandomState used for the waves
+
+    Returns (points, faceCounts, faceConnects) of the water
+    '''
+    surface = np.full((subdivisions + 1, subdivisions + 1), seaLevel, dtype=np.float64)
+    if waveHeight > 0:
+        surface = heightfield.bumpHeights(surface, waveHeight, seed=seed)
+    return closedSolid(heightfield.gridPoints(surface, size), topology.gridTopology(subdivisions, subdivisions), bottomY)
+
+def isosurface(field, origin, voxelSize):
+    ''' Extracts the closed surface where a 3D field crosses 0 (marching tetrahedra)
+
+    Every voxel is split into the same six tetrahedra round its main diagonal, so neighbouring voxels
+    split their shared faces the same way. A tetrahedron has no ambiguous cases: one corner on its own
+    side of the surface cuts off a triangle and two corners a quad, with a vertex where the field
+    crosses 0 along each cut edge. Each face of a tetrahedron is cut by at most one segment, which is
+    shared with the tetrahedron on the other side, so every edge of the mesh has exactly two faces
+    (which a boolean needs). All of it is done as whole-array operations.
+
+    field:        3D array of values sampled on a grid (negative inside), field[i, j, k] is at origin + (i, j, k) * voxelSize
+                  the outside layer must be positive so the surface is closed
+    origin:       (3,) array position of field[0, 0, 0]
+    voxelSize:    Float distance between samples
+
+    corners:      (t, 4) array of the flat grid index of each tetrahedron's corners
+    edgeKeys:     Array of a key per cut edge (its smaller grid index * n.o. samples + its larger one),
+                  tetrahedra sharing an edge share its vertex
+
+    Returns (points, faceCounts, faceConnects), faces wound so their normals point out of the negative region
+    '''
+    field = np.asarray(field, dtype=np.float64)
+    shape = field.shape
+    sampleCount = field.size
+    values = field.ravel()
+
+    # only voxels with corners on both sides of the surface are cut
+    negative = field < 0
+    cellShape = tuple(size - 1 for size in shape)
+    anyInside = np.zeros(cellShape, dtype=bool)
+    allInside = np.ones(cellShape, dtype=bool)
+    for i, j, k in ((i, j, k) for i in (0, 1) for j in (0, 1) for k in (0, 1)):
+        corner = negative[i:i + cellShape[0], j:j + cellShape[1], k:k + cellShape[2]]
+        anyInside |= corner
+        allInside &= corner
+    first = np.ravel_multi_index(np.nonzero(anyInside & ~allInside), shape)
+
+    # the six tetrahedra of a voxel each follow a path from corner (0, 0, 0) to (1, 1, 1) stepping along one axis at a time
+    steps = [int(np.ravel_multi_index(tuple(int(axis == other) for other in range(3)), shape)) for axis in range(3)]
+    corners = []
+    for a, b, c in ((0, 1, 2), (0, 2, 1), (1, 0, 2), (1, 2, 0), (2, 0, 1), (2, 1, 0)):
+        corners.append(np.stack((first, first + steps[a], first + steps[a] + steps[b], first + steps[a] + steps[b] + steps[c]), axis=1))
+    corners = np.concatenate(corners)
+    inside = values[corners] < 0
+    insideCount = inside.sum(axis=1)
+    cut = (insideCount > 0) & (insideCount < 4)
+    corners, inside, insideCount = corners[cut], inside[cut], insideCount[cut]
+
+    # sort each tetrahedron's corners inside first, so the cut edges are the same corner pairs for every case
+    order = np.argsort(~inside, axis=1, kind='mergesort')
+    corners = np.take_along_axis(corners, order, axis=1)
+    single = insideCount != 2
+    lone = np.where(insideCount == 1, 0, 3) #the corner on its own side
+    rows = np.arange(len(corners))
+    others = np.stack([np.where(insideCount == 1, corners[:, i], corners[:, i - 1]) for i in (1, 2, 3)], axis=1)
+    triangleEdges = np.stack([np.stack((corners[rows, lone], others[:, i]), axis=1) for i in range(3)], axis=1)[single]
+    pairs = ~single
+    quadEdges = np.stack([np.stack((corners[pairs, a], corners[pairs, b]), axis=1) for a, b in ((0, 2), (0, 3), (1, 3), (1, 2))], axis=1)
+
+    # one vertex per cut edge, where the field crosses 0 along it
+    allEdges = np.concatenate((triangleEdges.reshape(-1, 2), quadEdges.reshape(-1, 2)))
+    edgeKeys = allEdges.min(axis=1) * sampleCount + allEdges.max(axis=1)
+    edgeKeys, firstUse, vertexIndices = np.unique(edgeKeys, return_index=True, return_inverse=True)
+    ends = allEdges[firstUse]
+    valueA, valueB = values[ends[:, 0]], values[ends[:, 1]]
+    t = np.clip(valueA / (valueA - valueB), 1e-3, 1 - 1e-3)[:, None] #kept off the corners so no two vertices meet
+    startPositions = np.stack(np.unravel_index(ends[:, 0], shape), axis=1)
+    endPositions = np.stack(np.unravel_index(ends[:, 1], shape), axis=1)
+    points = np.asarray(origin, dtype=np.float64) + (startPositions + t * (endPositions - startPositions)) * voxelSize
+
+    # wind every polygon so its normal points from the inside corners towards the outside ones
+    triangles = vertexIndices[:3 * len(triangleEdges)].reshape(-1, 3)
+    quads = vertexIndices[3 * len(triangleEdges):].reshape(-1, 4)
+    outward = [np.stack(np.unravel_index(tetrahedra[:, 1, 1], shape), axis=1) - np.stack(np.unravel_index(tetrahedra[:, 0, 0], shape), axis=1)
+               for tetrahedra in (triangleEdges, quadEdges)]
+    outward[0][insideCount[single] == 3] *= -1 #the lone corner is outside, so its edges point inwards
+    for polygons, direction in zip((triangles, quads), outward):
+        normals = np.cross(points[polygons[:, 2]] - points[polygons[:, 0]], points[polygons[:, -1]] - points[polygons[:, 1]])
+        flip = (normals * direction).sum(axis=1) < 0
+        polygons[flip] = polygons[flip][:, ::-1]
+    faceCounts = np.concatenate((np.full(len(triangles), 3, dtype=np.int64), np.full(len(quads), 4, dtype=np.int64)))
+    return points, faceCounts, np.concatenate((triangles.ravel(), quads.ravel()))
@@ -0,0 +1,316 @@
+"""Landscaper mesh sync
+
+Reads and writes the vertex positions of a whole mesh in one call, so the
+terrain functions don't need a Maya command (and an undo entry) per vertex.
+
+The Maya calls go through a backend object which can be swapped with
+setBackend, e.g. for a CmdsBackend wrapping an in-memory stand-in for maya.cmds.
+
+"""
+import os
+
+import numpy as np
+
+PLUGIN_NAME = 'landscaperCommands'
+PLUGIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), PLUGIN_NAME + '.py')
+
+
+class CmdsBackend(object):
+    ''' Mesh access through maya.cmds
+
+    Only polyEvaluate, polyInfo, xform, listRelatives, getAttr, setAttr, addAttr, group, parent,
+    objExists, particle, particleInstancer, pluginInfo, loadPlugin and the landscaperCommands plugin's
+    commands are used, so any module providing those can be passed in instead of maya.cmds.
+    Writes are a single setAttr on the mesh's tweak array and new meshes and instances are made by a
+    single plugin command, which keeps each of them on the undo queue as one entry.
+
+    cmds:    The maya.cmds module (or a stand-in)
+    '''
+    def __init__(self, cmds):
+        self.cmds = cmds
+
+    def shapeName(self, mesh):
+        ''' Returns the mesh shape of a transform (or the name itself if it is already a shape) '''
+        shapes = self.cmds.listRelatives(mesh, shapes=True, fullPath=True)
+        if shapes:
+            return shapes[0]
+        return mesh
+
+    def vertexCount(self, mesh):
+        ''' Returns the integer n.o. vertices on the mesh '''
+        return self.cmds.polyEvaluate(mesh, v=True)
+
+    def getPoints(self, mesh):
+        ''' Returns an (n, 3) array of the object space vertex positions '''
+        flat = self.cmds.xform(mesh + '.vtx[*]', q=True, t=True, os=True)
+        return np.array(flat, dtype=np.float64).reshape(-1, 3)
+
+    def setPoints(self, mesh, points):
+        ''' Sets every vertex to the object space positions in the (n, 3) points array
+
+        base:      (n, 3) array of the positions stored on the mesh without tweaks
+        tweaks:    (n, 3) array of offsets from base, written in one setAttr
+        '''
+        shape = self.shapeName(mesh)
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        vertexRange = '[0:%d]' % (len(points) - 1)
+        base = np.array(self.cmds.getAttr(shape + '.vt' + vertexRange), dtype=np.float64).reshape(-1, 3)
+        tweaks = points - base
+        self.cmds.setAttr(shape + '.pnts' + vertexRange, *tweaks.ravel().tolist())
+
+    def getFaceVertices(self, mesh):
+        ''' Returns (faceCounts, faceConnects) arrays of every face's vertex indices
+
+        polyInfo returns one string per face, e.g. 'FACE     0:     0      1     12     11 \\n'
+        '''
+        faceCounts = []
+        faceConnects = []
+        for line in self.cmds.polyInfo(mesh, fv=True):
+            vertices = line.split(':')[1].split()
+            faceCounts.append(len(vertices))
+            faceConnects.extend(int(vtx) for vtx in vertices)
+        return np.array(faceCounts, dtype=np.int64), np.array(faceConnects, dtype=np.int64)
+
+    def runCommand(self, command, arguments):
+        ''' Runs one of the landscaperCommands plugin's commands on the arguments tuple, returns its result
+
+        The plugin is loaded the first time one of its commands is needed.
+        '''
+        if not self.cmds.pluginInfo(PLUGIN_NAME, q=True, loaded=True):
+            self.cmds.loadPlugin(PLUGIN_PATH)
+        _commandArguments[command] = arguments
+        try:
+            return getattr(self.cmds, command)()
+        finally:
+            _commandArguments.pop(command, None)
+
+    def createMesh(self, name, points, faceCounts, faceConnects, uvs=None):
+        ''' Creates a new mesh from vertex and face arrays in one call, returns its transform name
+
+        There is no maya.cmds command building a mesh from arrays, so the landscaperCreateMesh plugin
+        command builds it with MFnMesh.create and gives it the default material, as one undo entry.
+        UVs are per vertex, so every face corner uses the UV of its vertex.
+        '''
+        if uvs is not None:
+            uvs = np.asarray(uvs, dtype=np.float64)
+            uvs = (uvs[:, 0].tolist(), uvs[:, 1].tolist())
+        arguments = (name, np.asarray(points, dtype=np.float64).tolist(), [int(c) for c in faceCounts], [int(v) for v in faceConnects], uvs)
+        return self.runCommand('landscaperCreateMesh', arguments)
+
+    def createInstances(self, prototypes, translations, rotations, scales, namePrefix, group, firstNumber=1):
+        ''' Instances the prototypes with the given transforms and groups them, returns the instance names
+
+        The landscaperCreateInstances plugin command creates every transform in one MDagModifier step,
+        so there is no Maya command per object and the whole batch is one undo entry.
+        '''
+        arguments = (list(prototypes), np.asarray(translations, dtype=np.float64).tolist(), np.asarray(rotations, dtype=np.float64).tolist(),
+                     np.asarray(scales, dtype=np.float64).tolist(), namePrefix, group, int(firstNumber))
+        return list(self.runCommand('landscaperCreateInstances', arguments) or [])
+
+    def createInstancer(self, prototypes, prototypeIndices, translations, rotations, scales, group):
+        ''' Drives one instancer node with per-point arrays instead of creating a transform per object
+
+        A particle object holds a point per object with rotationPP, scalePP and indexPP arrays,
+        the instancer then draws prototypes[indexPP] at each point. Both are grouped under the group name,
+        so the node count stays the same however many points there are.
+        The instancer adds each prototype's own transform to every point's, so it draws hidden instances
+        of the prototypes' shapes under identity transforms rather than the (moved and scaled) prototypes.
+        Returns the instancer name, or None if there are no points.
+
+        holders:          List of the hidden identity transforms holding an instance of each prototype's shape
+        particleShape:    String name of the particle shape holding the per-point arrays
+        '''
+        count = len(translations)
+        if count == 0:
+            return None
+        holders = []
+        for i, prototype in enumerate(prototypes):
+            holder = self.cmds.group(em=True, n=group + 'Prototype' + str(i))
+            self.cmds.parent(self.shapeName(prototype), holder, add=True, shape=True)
+            self.cmds.setAttr(holder + '.visibility', False)
+            holders.append(holder)
+        points = self.cmds.particle(p=[tuple(t) for t in translations], n=group + 'Points')
+        particleShape = points[1]
+        perPointArrays = (('rotationPP', 'vectorArray', [tuple(r) for r in rotations]),
+                          ('scalePP', 'vectorArray', [tuple(s) for s in scales]),
+                          ('indexPP', 'doubleArray', [float(i) for i in prototypeIndices]))
+        for attribute, dataType, values in perPointArrays:
+            for name in (attribute, attribute + '0'): #the 0 attribute is the initial state the particles reset to
+                self.cmds.addAttr(particleShape, ln=name, dt=dataType)
+                self.cmds.setAttr(particleShape + '.' + name, values, type=dataType)
+        instancer = self.cmds.particleInstancer(particleShape, addObject=True, object=holders, cycle='None',
+                                                position='worldPosition', rotation='rotationPP', scale='scalePP',
+                                                objectIndex='indexPP', name=group + 'Instancer')
+        if self.cmds.objExists(group):
+            self.cmds.parent(points[0], instancer, holders, group)
+        else:
+            self.cmds.group(points[0], instancer, holders, n=group)
+        return instancer
+
+
+class OpenMayaBackend(CmdsBackend):
+    ''' Mesh access through the OpenMaya 2.0 MFnMesh function set
+
+    Faster than CmdsBackend on big meshes, but writes bypass the undo queue
+    (meshes and instances are still made by the undoable plugin commands).
+    Anything without an OpenMaya version goes through maya.cmds like CmdsBackend.
+    '''
+    def __init__(self, cmds):
+        CmdsBackend.__init__(self, cmds)
+        import maya.api.OpenMaya as om
+        self.om = om
+
+    def fnMesh(self, mesh):
+        ''' Returns an MFnMesh attached to the named mesh '''
+        selection = self.om.MSelectionList()
+        selection.add(mesh)
+        return self.om.MFnMesh(selection.getDagPath(0))
+
+    def vertexCount(self, mesh):
+        ''' Returns the integer n.o. vertices on the mesh '''
+        return self.fnMesh(mesh).numVertices
+
+    def getPoints(self, mesh):
+        ''' Returns an (n, 3) array of the object space vertex positions '''
+        points = self.fnMesh(mesh).getPoints(self.om.MSpace.kObject)
+        return np.array([(p.x, p.y, p.z) for p in points], dtype=np.float64).reshape(-1, 3)
+
+    def setPoints(self, mesh, points):
+        ''' Sets every vertex to the object space positions in the (n, 3) points array '''
+        fn = self.fnMesh(mesh)
+        pointArray = self.om.MPointArray([self.om.MPoint(p) for p in np.asarray(points, dtype=np.float64).tolist()])
+        fn.setPoints(pointArray, self.om.MSpace.kObject)
+        fn.updateSurface()
+
+    def getFaceVertices(self, mesh):
+        ''' Returns (faceCounts, faceConnects) arrays of every face's vertex indices '''
+        faceCounts, faceConnects = self.fnMesh(mesh).getVertices()
+        return np.array(faceCounts, dtype=np.int64), np.array(faceConnects, dtype=np.int64)
+
+
+_backend = None
+_commandArguments = {} #arrays waiting for the plugin command of the same name
+
+def getBackend():
+    ''' Returns the backend in use, defaulting to a CmdsBackend around maya.cmds '''
+    global _backend
+    if _backend is None:
+        import maya.cmds
+        _backend = CmdsBackend(maya.cmds)
+    return _backend
+
+def setBackend(backend):
+    ''' Replaces the backend used by the module level functions (None restores the default) '''
+    global _backend
+    _backend = backend
+
+def commandArguments(command):
+    ''' Returns the arguments tuple CmdsBackend.runCommand handed to the named plugin command '''
+    return _commandArguments.pop(command)
+
+def vertexCount(mesh):
+    ''' Returns the integer n.o. vertices on the mesh '''
+    return getBackend().vertexCount(mesh)
+
+def getPoints(mesh):
+    ''' Returns an (n, 3) array of the mesh's object space vertex positions '''
+    return getBackend().getPoints(mesh)
+
+def setPoints(mesh, points):
+    ''' Writes an (n, 3) array of object space vertex positions to the mesh in one call '''
+    getBackend().setPoints(mesh, points)
+
+def getFaceVertices(mesh):
+    ''' Returns (faceCounts, faceConnects) arrays of every face's vertex indices '''
+    return getBackend().getFaceVertices(mesh)
+
+def createMesh(name, points, faceCounts, faceConnects, uvs=None):
+    ''' Creates a mesh named name from an (n, 3) points array and its faces in one call
+
+    faceCounts:      Integer array of the n.o. vertices on each face
+    faceConnects:    Integer array of every face's vertex indices, one face after the other
+    uvs:             (n, 2) array of each vertex's UV, None for no UVs
+    '''
+    if uvs is None:
+        return getBackend().createMesh(name, points, faceCounts, faceConnects)
+    return getBackend().createMesh(name, points, faceCounts, faceConnects, uvs)
+
+def createInstances(prototypes, translations, rotations, scales, namePrefix, group, firstNumber=1):
+    ''' Creates an instance of prototypes[i] per row of the transform arrays, grouped under the group name
+
+    prototypes:      List of the object names to instance (one per instance)
+    translations:    (k, 3) array of positions
+    rotations:       (k, 3) array of rotations in degrees
+    scales:          (k, 3) array of scale factors
+    namePrefix:      String the instances are named after (e.g. 'Tree' makes Tree1, Tree2...)
+    group:           String name of the group the instances are added to, created if it doesn't exist
+    firstNumber:     Integer the first instance is numbered with
+    '''
+    return getBackend().createInstances(prototypes, translations, rotations, scales, namePrefix, group, firstNumber)
+
+def createInstancer(prototypes, prototypeIndices, translations, rotations, scales, group):
+    ''' Creates a single instancer drawing prototypes[prototypeIndices[i]] with the i'th row of the transform arrays
+
+    prototypes:          List of the object names to instance
+    prototypeIndices:    (k,) integer array of which prototype each point draws
+    translations:        (k, 3) array of positions
+    rotations:           (k, 3) array of rotations in degrees
+    scales:              (k, 3) array of scale factors
+    group:               String name of the group holding the point object and the instancer, created if it doesn't exist
+    '''
+    return getBackend().createInstancer(prototypes, prototypeIndices, translations, rotations, scales, group)
+
+def nearestSelected(points, indices, radius):
+    ''' Finds the closest selected point of every point within the radius of the selection
+
+    points:     (n, 3) array of vertex positions
+    indices:    Integer indices of the selected vertices (at least one)
+    radius:     Float search distance
+
+    Returns (candidates, distance, nearest):
+    candidates:    Integer array of the points inside the selection's bounding box grown by the radius
+    distance:      Array of the distance from each candidate to its closest selected point
+    nearest:       Array of the position in indices of each candidate's closest selected point
+    '''
+    points = np.asarray(points, dtype=np.float64)
+    selected = points[np.asarray(indices, dtype=np.int64)]
+    low = selected.min(axis=0) - radius
+    high = selected.max(axis=0) + radius
+    candidates = np.nonzero(np.all((points >= low) & (points <= high), axis=1))[0]
+    candidatePoints = points[candidates]
+    distance = np.full(len(candidates), np.inf)
+    nearest = np.zeros(len(candidates), dtype=np.int64)
+    chunkSize = max(1, 2 ** 20 // max(1, len(candidates))) #keeps the distance matrix around a million entries
+    for start in range(0, len(selected), chunkSize):
+        offsets = candidatePoints[:, None, :] - selected[None, start:start + chunkSize, :]
+        chunkDistance = np.sqrt((offsets ** 2).sum(axis=2))
+        closest = chunkDistance.argmin(axis=1)
+        closestDistance = chunkDistance[np.arange(len(candidates)), closest]
+        closer = closestDistance < distance
+        distance[closer] = closestDistance[closer]
+        nearest[closer] = start + closest[closer]
+    return candidates, distance, nearest
+
+def softSelectWeights(points, indices, radius):
+    ''' Returns an array of soft select style weights for every point
+
+    Selected points have a weight of 1, which falls off smoothly to 0 at the
+    radius distance from the closest selected point (like Maya's default falloff curve).
+
+    points:     (n, 3) array of vertex positions
+    indices:    Integer indices of the selected vertices
+    radius:     Float falloff distance, 0 means only the selected points are weighted
+    '''
+    indices = np.asarray(indices, dtype=np.int64)
+    weights = np.zeros(len(points))
+    if len(indices) == 0:
+        return weights
+    weights[indices] = 1.0
+    if radius <= 0:
+        return weights
+
+    # only points inside the selection's bounding box (grown by the radius) can be affected
+    candidates, distance, nearest = nearestSelected(points, indices, radius)
+    t = np.clip(distance / radius, 0.0, 1.0)
+    weights[candidates] = np.maximum(weights[candidates], 1.0 - t * t * (3.0 - 2.0 * t))
+    return weights
@@ -0,0 +1,219 @@
+"""Landscaper OBJ exporter
+
+Streams terrains, water and baked instances to Wavefront OBJ files.
+Records are formatted a chunk at a time with one string formatting call
+per chunk, so memory stays bounded however big the terrain is (an
+8193x8193 heightfield is written a few hundred rows at a time).
+
+"""
+import numpy as np
+
+import cityEngine
+import derivedMaps
+
+CHUNK_VERTICES = 2 ** 18 #roughly how many vertices are formatted at once
+
+
+def formatRecords(template, values):
+    ''' Returns the rows of the 2D values array formatted with the one line template, as one string '''
+    values = np.asarray(values)
+    if len(values) == 0:
+        return ''
+    return (template * len(values)) % tuple(values.ravel().tolist())
+
+def readObj(path):
+    ''' Reads the vertices and faces of a simple OBJ file (e.g. the tree assets)
+
+    Only v and f records are used, texture/normal indices on faces are ignored.
+
+    Returns (points, faceCounts, faceConnects)
+    '''
+    points = []
+    faceCounts = []
+    faceConnects = []
+    with open(path) as objFile:
+        for line in objFile:
+            words = line.split()
+            if not words:
+                continue
+            if words[0] == 'v':
+                points.append([float(value) for value in words[1:4]])
+            elif words[0] == 'f':
+                indices = [int(word.split('/')[0]) for word in words[1:]]
+                faceCounts.append(len(indices))
+                faceConnects.extend(index - 1 if index > 0 else len(points) + index for index in indices)
+    return np.array(points, dtype=np.float64).reshape(-1, 3), np.array(faceCounts, dtype=np.int64), np.array(faceConnects, dtype=np.int64)
+
+
+class ObjWriter(object):
+    ''' Writes objects to an open OBJ file one after the other
+
+    OBJ indices count every vertex written before them, so the writer keeps track of them.
+
+    objFile:        File object opened for writing text
+    vertexCount:    Integer n.o. v records written so far
+    normalCount:    Integer n.o. vn records written so far
+    '''
+    def __init__(self, objFile):
+        self.objFile = objFile
+        self.vertexCount = 0
+        self.normalCount = 0
+
+    def writeFaces(self, faceCounts, faceConnects, vertexOffset, normalOffset=None):
+        ''' Writes f records, faces with the same n.o. vertices are formatted together
+
+        vertexOffset:    Integer added to every (0 based) vertex index
+        normalOffset:    Integer added to get each vertex's normal index, None writes faces without normals
+        '''
+        faceCounts = np.asarray(faceCounts, dtype=np.int64)
+        faceConnects = np.asarray(faceConnects, dtype=np.int64)
+        faceStarts = np.concatenate(([0], np.cumsum(faceCounts)))[:-1]
+        for count in np.unique(faceCounts):
+            starts = faceStarts[faceCounts == count]
+            faces = faceConnects[starts[:, None] + np.arange(count)[None, :]] + 1
+            if normalOffset is None:
+                template = 'f' + ' %d' * count + '\n'
+                records = faces + vertexOffset
+            else:
+                template = 'f' + ' %d//%d' * count + '\n'
+                records = np.stack((faces + vertexOffset, faces + normalOffset), axis=2).reshape(len(faces), -1)
+            chunk = max(1, CHUNK_VERTICES // count)
+            for start in range(0, len(records), chunk):
+                self.objFile.write(formatRecords(template, records[start:start + chunk]))
+
+    def writeMesh(self, name, points, faceCounts, faceConnects, normals=None):
+        ''' Writes a mesh from its vertex and face arrays
+
+        name:        String object name
+        points:      (n, 3) array of vertex positions
+        normals:     (n, 3) array of vertex normals, or None
+        '''
+        points = np.asarray(points, dtype=np.float64)
+        self.objFile.write('o %s\n' % name)
+        for start in range(0, len(points), CHUNK_VERTICES):
+            self.objFile.write(formatRecords('v %.6f %.6f %.6f\n', points[start:start + CHUNK_VERTICES]))
+        normalOffset = None
+        if normals is not None:
+            normalOffset = self.normalCount
+            for start in range(0, len(normals), CHUNK_VERTICES):
+                self.objFile.write(formatRecords('vn %.6f %.6f %.6f\n', normals[start:start + CHUNK_VERTICES]))
+            self.normalCount += len(normals)
+        self.writeFaces(faceCounts, faceConnects, self.vertexCount, normalOffset)
+        self.vertexCount += len(points)
+
+    def writeHeightfield(self, name, heights, size=20.0, normals=True):
+        ''' Streams a heightfield (e.g. a memory mapped one) as a grid mesh, a block of rows at a time
+
+        Each block's vertices and normals are written, then the quads between it and the rows before it.
+        The normals use one extra row either side of the block so they match the whole grid's normals.
+
+        name:       String object name
+        heights:    2D array of heights (polyPlane layout)
+        size:       Float width and depth of the grid in world units
+        normals:    Boolean, write vn records
+        '''
+        rows, columns = heights.shape
+        spacing = size / (columns - 1)
+        blockRows = max(2, CHUNK_VERTICES // columns)
+        x = np.linspace(-0.5 * size, 0.5 * size, columns)
+        columnIndex = np.arange(columns - 1)
+        self.objFile.write('o %s\n' % name)
+        for first in range(0, rows, blockRows):
+            last = min(rows, first + blockRows)
+            block = np.asarray(heights[first:last], dtype=np.float64)
+            points = np.empty((last - first, columns, 3))
+            points[..., 0] = x[None, :]
+            points[..., 1] = block
+            points[..., 2] = (0.5 * size - np.arange(first, last) * spacing)[:, None]
+            self.objFile.write(formatRecords('v %.6f %.6f %.6f\n', points.reshape(-1, 3)))
+            if normals:
+                haloFirst, haloLast = max(0, first - 1), min(rows, last + 1)
+                blockNormals = derivedMaps.gridNormals(heights[haloFirst:haloLast], spacing)[first - haloFirst:first - haloFirst + last - first]
+                self.objFile.write(formatRecords('vn %.6f %.6f %.6f\n', blockNormals.reshape(-1, 3)))
+
+            # quads from row r to r+1 for every row pair that is now complete
+            quadRows = np.arange(max(0, first - 1), last - 1)
+            topLeft = (quadRows[:, None] * columns + columnIndex[None, :]).ravel() + 1
+            quads = np.stack((topLeft, topLeft + 1, topLeft + columns + 1, topLeft + columns), axis=1)
+            if normals:
+                records = np.stack((quads + self.vertexCount, quads + self.normalCount), axis=2).reshape(len(quads), -1)
+                self.objFile.write(formatRecords('f %d//%d %d//%d %d//%d %d//%d\n', records))
+            else:
+                self.objFile.write(formatRecords('f %d %d %d %d\n', quads + self.vertexCount))
+        self.vertexCount += rows * columns
+        if normals:
+            self.normalCount += rows * columns
+
+    def writeWaterPlane(self, name, seaLevel, size=20.0):
+        ''' Writes a flat square of water at the sea level '''
+        half = 0.5 * size
+        points = np.array([[-half, seaLevel, half], [half, seaLevel, half], [half, seaLevel, -half], [-half, seaLevel, -half]])
+        self.writeMesh(name, points, [4], [0, 1, 2, 3], np.tile([0.0, 1.0, 0.0], (4, 1)))
+
+    def writeInstances(self, name, prototype, translations, rotations, scales, heightScales=None):
+        ''' Bakes copies of a prototype mesh into the file, transformed by each row of the arrays
+
+        prototype:       (points, faceCounts, faceConnects) of the mesh to copy
+        translations:    (k, 3) array of positions
+        rotations:       (k,) array of y rotations in degrees
+        scales:          (k,) array of uniform scale factors
+        heightScales:    (k,) array of extra y scale factors (e.g. building heights), None for none
+        '''
+        points, faceCounts, faceConnects = prototype
+        translations = np.asarray(translations, dtype=np.float64)
+        if len(translations) == 0:
+            return
+        angles = np.radians(np.asarray(rotations, dtype=np.float64))
+        scales = np.asarray(scales, dtype=np.float64)
+        heightScales = np.ones(len(translations)) if heightScales is None else np.asarray(heightScales, dtype=np.float64)
+        pointCount = len(points)
+        batch = max(1, CHUNK_VERTICES // max(1, pointCount))
+        self.objFile.write('o %s\n' % name)
+        for start in range(0, len(translations), batch):
+            cos = np.cos(angles[start:start + batch])[:, None]
+            sin = np.sin(angles[start:start + batch])[:, None]
+            scale = scales[start:start + batch][:, None]
+            baked = np.empty((len(cos), pointCount, 3))
+            baked[..., 0] = scale * (cos * points[None, :, 0] + sin * points[None, :, 2])
+            baked[..., 1] = scale * heightScales[start:start + batch][:, None] * points[None, :, 1]
+            baked[..., 2] = scale * (cos * points[None, :, 2] - sin * points[None, :, 0])
+            baked += translations[start:start + batch][:, None, :]
+            self.objFile.write(formatRecords('v %.6f %.6f %.6f\n', baked.reshape(-1, 3)))
+            copies = len(cos)
+            offsets = np.repeat(np.arange(copies) * pointCount, len(faceConnects))
+            self.writeFaces(np.tile(faceCounts, copies), np.tile(faceConnects, copies) + offsets, self.vertexCount)
+            self.vertexCount += copies * pointCount
+
+
+def exportTerrain(path, heights, size=20.0, seaLevel=None, trees=None, treeMeshes=None, lakes=None, buildings=None, buildingMeshes=None):
+    ''' Writes a terrain, its water and (optionally) its trees and buildings to one OBJ file
+
+    path:          String path of the .obj file
+    heights:       2D array of heights (can be memory mapped)
+    size:          Float width and depth of the terrain in world units
+    seaLevel:      Float y level of the water, None for no water
+    lakes:         List of lake dictionaries with meshes (see pipeline.lakesStage), written instead of a flat sea plane
+    trees:         Dictionary of tree arrays from scatter.scatterTrees, None for no trees
+    treeMeshes:    Dictionary {'small': prototype, 'tall': prototype} of (points, faceCounts, faceConnects) tree meshes
+    buildings:         Dictionary of style name -> building arrays from cityEngine.layoutBuildings, None for no buildings
+    buildingMeshes:    Dictionary of style name -> (points, faceCounts, faceConnects) building mesh
+    '''
+    with open(path, 'w') as objFile:
+        writer = ObjWriter(objFile)
+        writer.writeHeightfield('terrain', heights, size)
+        if lakes is not None:
+            for i, lake in enumerate(lakes):
+                writer.writeMesh('lake%d' % (i + 1), lake['points'], lake['faceCounts'], lake['faceConnects'])
+        elif seaLevel is not None:
+            writer.writeWaterPlane('water', seaLevel, size)
+        if trees is not None and treeMeshes is not None:
+            for species, tall in (('small', False), ('tall', True)):
+                chosen = trees['tall'] == tall
+                writer.writeInstances(species + 'Trees', treeMeshes[species], trees['positions'][chosen],
+                                      trees['rotations'][chosen], trees['scales'][chosen])
+        if buildings is not None and buildingMeshes is not None:
+            for style in sorted(buildings):
+                points, faceCounts, faceConnects = buildingMeshes[style]
+                layout = buildings[style]
+                writer.writeInstances(style + 'Buildings', (cityEngine.groundPrototype(points), faceCounts, faceConnects), layout['positions'],
+                                      layout['rotations'], layout['scales'], cityEngine.heightScales(points, layout['heights']))
@@ -0,0 +1,92 @@
+"""Landscaper object registry
+
+Keeps track of the objects Landscaper generates per category (e.g. 'Trees'
+or 'Buildings'). Every category lives under one group that new objects are
+parented into in place, and each object is remembered by its UUID, which
+stays the same when it is renamed or reparented. Adding objects never has
+to search or regroup the scene, and clearing a category deletes its group
+in one call.
+
+Like meshSync the Maya calls go through the cmds module passed in, so a
+stand-in for maya.cmds can be used instead.
+
+"""
+
+
+class ObjectRegistry(object):
+    ''' Generated objects per category, each category grouped under a group named after it
+
+    Only ls, listRelatives, group, parent and delete are used.
+
+    cmds:       The maya.cmds module (or a stand-in)
+    groups:     Dictionary of the UUID of each category's group
+    handles:    Dictionary of the list of UUIDs of each category's objects
+    counts:     Dictionary of the n.o. objects ever added to each category, used to number new objects
+    '''
+    def __init__(self, cmds):
+        self.cmds = cmds
+        self.groups = {}
+        self.handles = {}
+        self.counts = {}
+
+    def resolve(self, handles):
+        ''' Returns the full path names of the UUIDs that still exist '''
+        if not handles:
+            return []
+        return self.cmds.ls(handles, long=True) or []
+
+    def groupName(self, category):
+        ''' Returns the name of the category's group, creating it if it doesn't exist
+
+        A top level group with the category's name that isn't registered (e.g. from a reopened scene)
+        is adopted along with its children.
+        '''
+        names = self.resolve([self.groups[category]]) if category in self.groups else []
+        if names:
+            return names[0]
+        existing = self.cmds.ls(category, assemblies=True, long=True)
+        if existing:
+            group = existing[0]
+            children = self.cmds.listRelatives(group, children=True, type='transform', fullPath=True) or []
+            self.handles[category] = self.cmds.ls(children, uuid=True) if children else []
+        else:
+            group = self.cmds.group(em=True, n=category)
+            self.handles[category] = []
+        self.counts[category] = len(self.handles[category])
+        self.groups[category] = self.cmds.ls(group, uuid=True)[0]
+        return group
+
+    def nextNumber(self, category):
+        ''' Returns the integer the next object added to the category can be numbered with '''
+        self.groupName(category)
+        return self.counts[category] + 1
+
+    def add(self, category, nodes, parent=True):
+        ''' Registers the nodes under the category, returns their handles
+
+        parent:    Boolean, if True the nodes are parented into the category's group in one call,
+                   False if they were created inside it already
+        '''
+        group = self.groupName(category)
+        if not nodes:
+            return []
+        handles = self.cmds.ls(nodes, uuid=True)
+        if parent == True:
+            self.cmds.parent(nodes, group)
+        self.handles[category].extend(handles)
+        self.counts[category] += len(nodes)
+        return handles
+
+    def objects(self, category):
+        ''' Returns the full path names of the category's objects that still exist '''
+        return self.resolve(self.handles.get(category))
+
+    def clear(self, category):
+        ''' Deletes the category's group and every object in it in one call '''
+        handle = self.groups.pop(category, None)
+        names = self.resolve([handle]) if handle else self.cmds.ls(category, assemblies=True, long=True)
+        groupPaths = tuple(name + '|' for name in names)
+        names += [name for name in self.resolve(self.handles.pop(category, None)) if not name.startswith(groupPaths)] #anything the user moved out of the group
+        self.counts.pop(category, None)
+        if names:
+            self.cmds.delete(names)
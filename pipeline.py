@@ -0,0 +1,270 @@
+"""Landscaper random terrain pipeline
+
+Maya-free core of createRandomTerrain. The terrain is built by a chain of
+stages (terrain, smoothing, mountains, bumps, erosion, sea, rivers, lakes,
+trees, walls, caves), each one a function of its own parameters (including its own RNG
+seed) and the outputs of the stages before it. Every stage output is kept
+in a StageCache under a key made from those, so re-running with one changed
+parameter only recomputes that stage and the stages after it.
+
+Stage outputs are shared with the cache, so they are never edited in place.
+
+"""
+import numpy as np
+
+import brushes
+import caveEngine
+import erosionEngine
+import heightfield
+import hydrology
+import meshBuild
+import scatter
+import stageCache
+import topology
+
+STAGES = ('terrain', 'smoothing', 'mountains', 'bumps', 'erosion', 'sea', 'rivers', 'lakes', 'trees', 'walls', 'caves')
+UPSTREAM = {
+    'terrain': None,
+    'smoothing': 'terrain',
+    'mountains': 'smoothing',
+    'bumps': 'mountains',
+    'erosion': 'bumps',
+    'sea': 'erosion',
+    'rivers': 'sea',
+    'lakes': 'rivers',
+    'trees': 'lakes',
+    'walls': 'rivers',
+    'caves': 'walls',
+}
+TERRAIN_SIZE = 20.0
+BOTTOM_OF_CUBE = -10.0
+MAX_SMOOTH_VERTS = 100000
+HYDRAULIC_ITERATIONS = 50
+THERMAL_ITERATIONS = 20
+
+
+def newSeed(rng):
+    ''' Draws an integer seed for a stage from the parameter RandomState '''
+    return int(rng.randint(0, 2 ** 31 - 1))
+
+def randomParameters(seed, trees=True, sea=True, mountains=True, lowSubdivs=False, cube=True, caves=True, erosion=True):
+    ''' Draws the parameters of every stage the same way createRandomTerrain always has
+
+    Every value is drawn whether or not its stage is enabled, so turning a stage
+    on or off never changes the parameters (and cached outputs) of the others.
+
+    seed:          Integer seed of the whole terrain
+    trees, sea, mountains, lowSubdivs, cube, caves, erosion:    Booleans matching the automation checkboxes
+
+    Returns a dictionary of stage name -> dictionary of that stage's parameters
+    '''
+    rng = heightfield.getRandomState(seed)
+    parameters = {}
+
+    '''Create the terrain'''
+    if lowSubdivs == True:
+        n, smooth = 3, 1
+    else:
+        n, smooth = int(rng.randint(3, 5)), int(rng.randint(0, 3))
+    parameters['terrain'] = {'n': n, 'corners': [int(rng.randint(0, 9)) for i in range(4)], 'seed': newSeed(rng)}
+
+    '''Smooth (an extra subdivision unless low subdivs is checked or it would go over 100,000 vertices)'''
+    levels = smooth
+    width = 2 ** (n + levels) + 1
+    if lowSubdivs == False and (2 * width - 1) ** 2 <= MAX_SMOOTH_VERTS:
+        levels += 1
+        width = 2 * width - 1
+    parameters['smoothing'] = {'levels': levels}
+    noVerts = width * width
+
+    '''Create some mountains, each one has a chance of not spawning'''
+    mountainSpecs = []
+    for rchance, rnum1, rnum2, rnum3, rnum4 in ((0.3, 1, 6, 0.5, 5), (0.5, 2, 7, 0.5, 3), (0.5, 2, 7, 0.5, 3), (0.5, 2, 7, 0.5, 3)):
+        spawn = rng.uniform(0, 1) > rchance
+        spec = {'u': rng.uniform(0, 1), 'v': rng.uniform(0, 1), 'radius': rng.uniform(rnum1, rnum2), 'height': rng.uniform(rnum3, rnum4)}
+        if spawn:
+            mountainSpecs.append(spec)
+    parameters['mountains'] = {'enabled': bool(mountains), 'mountains': mountainSpecs}
+
+    '''add some heightOffset to the surface, less on denser terrains'''
+    heightOffset = None
+    if noVerts < 2000:
+        heightOffset = rng.uniform(0.05, 0.25)
+    elif noVerts < 4000:
+        heightOffset = rng.uniform(0.05, 0.1)
+    elif noVerts < 5000:
+        heightOffset = rng.uniform(0.02, 0.05)
+    parameters['bumps'] = {'heightOffset': heightOffset, 'seed': newSeed(rng)}
+
+    '''wear the terrain down with rain and landslides (no random values, so the draws after it don't change)'''
+    parameters['erosion'] = {'enabled': bool(erosion), 'hydraulicIterations': HYDRAULIC_ITERATIONS, 'thermalIterations': THERMAL_ITERATIONS}
+
+    '''sea level somewhere between just above the lowest point and just below the highest'''
+    parameters['sea'] = {'enabled': bool(sea), 'fraction': rng.uniform(0, 1)}
+
+    '''rivers (only when there is a sea)'''
+    enabled = bool(rng.uniform(0, 1) > 0.3)
+    minAccumulation = rng.uniform(0.02, 0.06)
+    rng.uniform(0, 1) #unused, keeps the draws after it the same as when this was a trench at (u, v)
+    parameters['rivers'] = {'enabled': enabled, 'minAccumulation': minAccumulation, 'width': 0.2 * rng.uniform(1, 5),
+                            'depth': rng.uniform(0.5, 2)}
+
+    '''fill the basins with lakes, and the sea, whenever there is water (no random values)'''
+    parameters['lakes'] = {'enabled': bool(sea), 'minDepth': 0.05, 'minCells': hydrology.minLakeCells(noVerts)}
+
+    '''trees, at a density per unit area so they look the same on any n.o. vertices'''
+    parameters['trees'] = {'enabled': bool(trees), 'density': rng.uniform(0.2, 0.6), 'treeHeight': 5.5, 'minTreeSize': 30,
+                           'maxTreeSize': 40, 'maxSteepness': 0.3, 'spacings': [0.6, 0.9], 'seed': newSeed(rng)}
+
+    '''turn into a cube, then cut caves into it'''
+    parameters['walls'] = {'enabled': bool(cube), 'bottom': BOTTOM_OF_CUBE}
+    noCaves = 1 if lowSubdivs == True else int(rng.randint(1, 5))
+    parameters['caves'] = {'enabled': bool(caves and cube),
+                           'caves': [{'sphereRadiusMax': 3.5, 'sphereRadiusMin': 2.5, 'noSpheres': 20, 'seed': newSeed(rng)} for i in range(noCaves)]}
+    return parameters
+
+def faceCentre(heights, u, v):
+    ''' Returns the (x, z) centre of the face at fraction (u, v) across the terrain, and the face width '''
+    faces = heights.shape[0] - 1
+    spacing = TERRAIN_SIZE / faces
+    column = min(int(u * faces), faces - 1)
+    row = min(int(v * faces), faces - 1)
+    return -0.5 * TERRAIN_SIZE + (column + 0.5) * spacing, 0.5 * TERRAIN_SIZE - (row + 0.5) * spacing, spacing
+
+def terrainStage(parameters, results):
+    ''' Diamond square heights '''
+    c1Height, c2Height, c3Height, c4Height = parameters['corners']
+    return {'heights': heightfield.diamondSquare(parameters['n'], c1Height, c2Height, c3Height, c4Height, parameters['seed'])}
+
+def smoothingStage(parameters, results):
+    ''' Subdivided heights, like polySmooth on the terrain plane '''
+    return {'heights': heightfield.subdivideHeights(results['terrain']['heights'], parameters['levels'])}
+
+def mountainsStage(parameters, results):
+    ''' Mountains raised like createMountain: a steep top with half the radius, then the full height over the radius '''
+    heights = results['smoothing']['heights']
+    if parameters['enabled'] == False:
+        return {'heights': heights}
+    mountainBrushes = []
+    for mountain in parameters['mountains']:
+        x, z, faceSize = faceCentre(heights, mountain['u'], mountain['v'])
+        mountainBrushes += brushes.mountainBrushes(x, z, mountain['radius'], mountain['height'], faceSize)
+    return {'heights': brushes.applyBrushes(heights, TERRAIN_SIZE, mountainBrushes)}
+
+def bumpsStage(parameters, results):
+    ''' Random bumps on every height '''
+    heights = results['mountains']['heights']
+    if parameters['heightOffset'] is None:
+        return {'heights': heights}
+    return {'heights': heightfield.bumpHeights(heights, parameters['heightOffset'], seed=parameters['seed'])}
+
+def erosionStage(parameters, results):
+    ''' Hydraulic then thermal erosion '''
+    heights = results['bumps']['heights']
+    if parameters['enabled'] == False:
+        return {'heights': heights}
+    return {'heights': erosionEngine.erodeHeights(heights, parameters['hydraulicIterations'], parameters['thermalIterations'], TERRAIN_SIZE)}
+
+def seaStage(parameters, results):
+    ''' Sea level between 2.5 above the lowest and 1 below the highest point of the unsmoothed terrain '''
+    if parameters['enabled'] == False:
+        return {'seaLevel': None}
+    heights = results['terrain']['heights']
+    lowestYValue = float(heights.min()) + 2.5
+    greatestYValue = float(heights.max()) - 1.0
+    return {'seaLevel': lowestYValue + parameters['fraction'] * (greatestYValue - lowestYValue)}
+
+def riversStage(parameters, results):
+    ''' Rivers carved along the paths most of the terrain drains along, down to the sea '''
+    heights = results['erosion']['heights']
+    if parameters['enabled'] == False or results['sea']['seaLevel'] is None:
+        return {'heights': heights}
+    return {'heights': hydrology.carveRivers(heights, TERRAIN_SIZE, parameters['minAccumulation'], parameters['width'],
+                                             parameters['depth'], results['sea']['seaLevel'])}
+
+def lakesStage(parameters, results):
+    ''' Every lake (and the sea) as a water surface mesh covering just its wet cells '''
+    if parameters['enabled'] == False:
+        return []
+    heights = results['rivers']['heights']
+    lakes = hydrology.findLakes(heights, results['sea']['seaLevel'], parameters['minDepth'], parameters['minCells'])
+    for lake in lakes:
+        lake['points'], lake['faceCounts'], lake['faceConnects'] = meshBuild.waterSurface(heights, lake['cells'], lake['level'], TERRAIN_SIZE)
+    return lakes
+
+def treesStage(parameters, results):
+    ''' Tree transforms scattered on the dry inside of the terrain '''
+    if parameters['enabled'] == False:
+        return None
+    field = heightfield.Heightfield(results['rivers']['heights'], TERRAIN_SIZE)
+    dry = np.ones(field.heights.size, dtype=bool)
+    for lake in results['lakes']:
+        dry[lake['cells']] = False
+    seaLevel = results['sea']['seaLevel']
+    if seaLevel is None:
+        seaLevel = -99
+    rows, columns = field.heights.shape
+    return scatter.scatterTrees(field.points(), field.maps.normals().reshape(-1, 3), topology.gridTopology(columns - 1, rows - 1), dry,
+                                parameters['density'], parameters['treeHeight'], parameters['minTreeSize'], parameters['maxTreeSize'],
+                                parameters['maxSteepness'], seaLevel, parameters['spacings'], seed=parameters['seed'])
+
+def wallsStage(parameters, results):
+    ''' The terrain as a closed cube '''
+    if parameters['enabled'] == False:
+        return None
+    heights = results['rivers']['heights']
+    faces = heights.shape[0] - 1
+    points, faceCounts, faceConnects = meshBuild.closedSolid(heightfield.gridPoints(heights, TERRAIN_SIZE),
+                                                             topology.gridTopology(faces, faces), parameters['bottom'])
+    return {'points': points, 'faceCounts': faceCounts, 'faceConnects': faceConnects}
+
+def cavesStage(parameters, results):
+    ''' The sphere chains of each cave, with the blended cave mesh ready to cut out of the terrain '''
+    if parameters['enabled'] == False:
+        return []
+    caves = []
+    for cave in parameters['caves']:
+        spheres = caveEngine.caveSpheres(cave['sphereRadiusMax'], cave['sphereRadiusMin'], cave['noSpheres'], cave['seed'])
+        spheres['points'], spheres['faceCounts'], spheres['faceConnects'] = caveEngine.caveMesh(spheres)
+        caves.append(spheres)
+    return caves
+
+STAGE_FUNCTIONS = {
+    'terrain': terrainStage,
+    'smoothing': smoothingStage,
+    'mountains': mountainsStage,
+    'bumps': bumpsStage,
+    'erosion': erosionStage,
+    'sea': seaStage,
+    'rivers': riversStage,
+    'lakes': lakesStage,
+    'trees': treesStage,
+    'walls': wallsStage,
+    'caves': cavesStage,
+}
+
+def runPipeline(parameters, cache=None):
+    ''' Runs every stage in order, reusing cached outputs where the stage key hasn't changed
+
+    parameters:    Dictionary of stage name -> parameters (see randomParameters)
+    cache:         StageCache to reuse, None runs everything from scratch
+
+    Returns (results, keys, computed):
+    results:       Dictionary of stage name -> stage output
+    keys:          Dictionary of stage name -> stage key
+    computed:      List of the stages that weren't cached
+    '''
+    if cache is None:
+        cache = stageCache.StageCache()
+    results = {}
+    keys = {}
+    computed = []
+    for stage in STAGES:
+        keys[stage] = stageCache.stageKey(stage, parameters[stage], keys.get(UPSTREAM[stage]))
+        if keys[stage] in cache:
+            results[stage] = cache.get(keys[stage])
+        else:
+            results[stage] = STAGE_FUNCTIONS[stage](parameters[stage], results)
+            cache.put(keys[stage], results[stage])
+            computed.append(stage)
+    return results, keys, computed
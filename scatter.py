@@ -0,0 +1,136 @@
+"""Landscaper scatter engine
+
+Maya-free placement of trees (and other scattered objects). Candidates are
+drawn evenly over the ground area of the mesh, so the number of trees
+depends on a density per unit area rather than on how finely the terrain
+is subdivided. They are then thinned by Poisson-disc dart throwing: a grid
+spatial hash keeps each tree's neighbour test to the few cells around it,
+so every candidate costs O(1) and a whole forest takes linear time. The
+results are then created in Maya in a single batched step.
+
+"""
+import numpy as np
+
+import heightfield
+
+
+def groundAreas(points, triangles):
+    ''' Returns the area of each triangle seen from above (projected onto the x z plane) '''
+    corners = np.asarray(points, dtype=np.float64)[triangles]
+    first = corners[:, 1] - corners[:, 0]
+    second = corners[:, 2] - corners[:, 0]
+    return 0.5 * np.abs(first[:, 0] * second[:, 2] - first[:, 2] * second[:, 0])
+
+def surfaceSamples(points, normals, triangles, count, seed=None):
+    ''' Draws points spread evenly over the ground area of the triangles
+
+    points:       (n, 3) array of vertex positions
+    normals:      (n, 3) array of unit vertex normals
+    triangles:    (t, 3) integer array of triangle vertices
+    count:        Integer n.o. points to draw
+    seed:         Integer seed or RandomState
+
+    Returns (positions, normals): (count, 3) arrays of the points and their interpolated normals
+    '''
+    rng = heightfield.getRandomState(seed)
+    points = np.asarray(points, dtype=np.float64)
+    normals = np.asarray(normals, dtype=np.float64)
+    areas = groundAreas(points, triangles)
+    if count == 0 or areas.sum() == 0:
+        return np.zeros((0, 3)), np.zeros((0, 3))
+    chosen = triangles[rng.choice(len(triangles), count, p=areas / areas.sum())]
+
+    '''uniform barycentric coordinates (folding the unit square's far half back onto the triangle)'''
+    u, v = rng.uniform(0, 1, count), rng.uniform(0, 1, count)
+    folded = u + v > 1
+    u[folded], v[folded] = 1 - u[folded], 1 - v[folded]
+    weights = np.stack((1 - u - v, u, v), axis=1)[:, :, None]
+    sampleNormals = (normals[chosen] * weights).sum(axis=1)
+    sampleNormals /= np.maximum(np.sqrt((sampleNormals ** 2).sum(axis=1)), 1e-12)[:, None]
+    return (points[chosen] * weights).sum(axis=1), sampleNormals
+
+def poissonDisc(positions, radii, limit=None):
+    ''' Returns the indices of the positions kept by dart throwing
+
+    In order, each position is kept unless a kept position is closer (in x z) than the larger of their radii.
+    The kept positions are stored in a grid spatial hash with cells as wide as the largest radius,
+    so each test only looks at the 3x3 cells around the position.
+
+    positions:    (k, 3) array of candidate positions, in the (random) order they are tried
+    radii:        (k,) array of the minimum spacing of each candidate
+    limit:        Integer most positions to keep, None for no limit
+    '''
+    radii = np.asarray(radii, dtype=np.float64)
+    if len(radii) == 0 or limit == 0:
+        return np.zeros(0, dtype=np.int64)
+    cellSize = max(float(radii.max()), 1e-9)
+    xs, zs, radiusList = positions[:, 0].tolist(), positions[:, 2].tolist(), radii.tolist()
+    columns = np.floor(positions[:, 0] / cellSize).astype(np.int64).tolist()
+    rows = np.floor(positions[:, 2] / cellSize).astype(np.int64).tolist()
+    grid = {}
+    kept = []
+    for i in range(len(radiusList)):
+        x, z, radius, column, row = xs[i], zs[i], radiusList[i], columns[i], rows[i]
+        clear = True
+        for cell in ((column + dc, row + dr) for dc in (-1, 0, 1) for dr in (-1, 0, 1)):
+            for j in grid.get(cell, ()):
+                spacing = max(radius, radiusList[j])
+                if (xs[j] - x) ** 2 + (zs[j] - z) ** 2 < spacing * spacing:
+                    clear = False
+                    break
+            if clear == False:
+                break
+        if clear:
+            grid.setdefault((column, row), []).append(i)
+            kept.append(i)
+            if limit is not None and len(kept) >= limit:
+                break
+    return np.array(kept, dtype=np.int64)
+
+def scatterTrees(points, normals, topologyIndex, candidates, density, treeHeight, minTreeSize, maxTreeSize, maxSteepness, seaLevel,
+                 spacings=(0.6, 0.9), attempts=30, seed=None):
+    ''' Places trees at a density per unit area, no closer together than their species' spacing, and returns their transforms
+
+    points:           (n, 3) array of vertex positions
+    normals:          (n, 3) array of unit vertex normals
+    topologyIndex:    TopologyIndex of the mesh
+    candidates:       Boolean array of the vertices trees can grow around, faces with any other vertex get no trees
+                      (e.g. not on the edge of the plane)
+    density:          Float n.o. trees per unit of ground area the trees can grow on
+    treeHeight:       Float y level where small trees spawn below and tall trees spawn above
+    minTreeSize:      Float minimum tree size (scale factor %)
+    maxTreeSize:      Float maximum tree size (scale factor %)
+    maxSteepness:     The steepest gradient of the slope that trees can spawn on
+    seaLevel:         Float y level of the water, trees only spawn 0.3 above it
+    spacings:         (small, tall) Floats closest distance a small or tall tree allows another tree
+    attempts:         Integer n.o. candidates drawn per tree wanted, the density is reached unless the spacing makes it too crowded
+    seed:             Integer seed or RandomState
+
+    Returns a dictionary of arrays with one entry per tree:
+    positions:       (k, 3) array of the tree positions
+    rotations:       (k,) array of the y rotations in degrees
+    scales:          (k,) array of the uniform scale factors
+    tall:            (k,) boolean array, True for tall trees
+    '''
+    rng = heightfield.getRandomState(seed)
+    triangles = topologyIndex.triangles()
+    triangles = triangles[np.asarray(candidates, dtype=bool)[triangles].all(axis=1)]
+    area = groundAreas(points, triangles).sum()
+
+    '''draw every candidate at once, then keep the ones above the water on flat enough ground'''
+    positions, sampleNormals = surfaceSamples(points, normals, triangles, int(np.ceil(attempts * density * area)), rng)
+    valid = (sampleNormals[:, 1] > 1 - maxSteepness) & (positions[:, 1] > seaLevel + 0.3)
+    growArea = area * valid.mean() if len(valid) else 0.0
+    positions = positions[valid]
+
+    '''thin them out so no tree is closer to another than its spacing, stopping at the density'''
+    tall = positions[:, 1] >= treeHeight
+    kept = poissonDisc(positions, np.where(tall, spacings[1], spacings[0]), int(round(density * growArea)))
+    positions, tall = positions[kept], tall[kept]
+    treeCount = len(positions)
+    return {
+        'positions': positions,
+        'rotations': rng.randint(0, 361, treeCount).astype(np.float64),
+        'scales': rng.uniform(minTreeSize, maxTreeSize, treeCount) / 100.0,
+        'tall': tall,
+    }
@@ -0,0 +1,85 @@
+"""Landscaper stage cache
+
+Content addressed cache for the stages of the random terrain pipeline.
+A stage's key is a hash of its name, its parameters (including its own
+RNG seed) and the key of the stage it builds on, so changing one
+parameter only misses the cache for that stage and the stages after it.
+
+"""
+import collections
+import hashlib
+import json
+import os
+import pickle
+
+
+def stageKey(stageName, parameters, upstreamKey=None):
+    ''' Returns the hex string key of a stage output
+
+    stageName:      String name of the stage
+    parameters:     Dictionary of the stage's parameters (JSON serialisable)
+    upstreamKey:    String key of the stage this one builds on, or None
+    '''
+    description = json.dumps([stageName, parameters, upstreamKey], sort_keys=True)
+    return hashlib.sha1(description.encode('utf-8')).hexdigest()
+
+
+class StageCache(object):
+    ''' Bounded in-memory LRU of stage outputs with an optional on-disk tier
+
+    maxEntries:    Integer n.o. outputs kept in memory, the least recently used is dropped first
+    directory:     String folder the outputs are also pickled to (None keeps everything in memory)
+    entries:       OrderedDict of key -> output, most recently used last
+    '''
+    def __init__(self, maxEntries=32, directory=None):
+        self.maxEntries = maxEntries
+        self.directory = directory
+        self.entries = collections.OrderedDict()
+        if directory is not None and not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError: #another process made it first
+                if not os.path.isdir(directory):
+                    raise
+
+    def __contains__(self, key):
+        return key in self.entries or (self.directory is not None and os.path.exists(self.diskPath(key)))
+
+    def diskPath(self, key):
+        ''' Returns the path the output of the key is pickled to '''
+        return os.path.join(self.directory, key + '.pkl')
+
+    def get(self, key):
+        ''' Returns the cached output of the key, or None if it isn't cached '''
+        if key in self.entries:
+            output = self.entries.pop(key)
+            self.entries[key] = output #move to the most recently used end
+            return output
+        if self.directory is not None and os.path.exists(self.diskPath(key)):
+            with open(self.diskPath(key), 'rb') as cacheFile:
+                output = pickle.load(cacheFile)
+            self.remember(key, output)
+            return output
+        return None
+
+    def put(self, key, output):
+        ''' Stores the output of the key in memory (and on disk if there is a directory) '''
+        self.remember(key, output)
+        if self.directory is not None:
+            temporaryPath = '%s.%d.tmp' % (self.diskPath(key), os.getpid()) #unique per process so workers can share the folder
+            with open(temporaryPath, 'wb') as cacheFile:
+                pickle.dump(output, cacheFile, 2) #protocol 2 can be read by python 2 and 3
+            if os.path.exists(self.diskPath(key)): #os.rename can't replace a file on Windows
+                os.remove(self.diskPath(key))
+            os.rename(temporaryPath, self.diskPath(key))
+
+    def remember(self, key, output):
+        ''' Adds the output to the in-memory LRU, dropping the oldest entries past maxEntries '''
+        self.entries.pop(key, None)
+        self.entries[key] = output
+        while len(self.entries) > self.maxEntries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        ''' Empties the in-memory tier (the disk tier is left alone) '''
+        self.entries.clear()
@@ -0,0 +1,10 @@
+"""Landscaper tests
+
+The modules sit next to main.py rather than in a package, so the folder
+above this one goes on the path. Nothing here needs Maya.
+
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
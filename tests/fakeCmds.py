@@ -0,0 +1,119 @@
+"""Landscaper fake cmds
+
+An in-memory stand-in for the few maya.cmds calls meshSync's CmdsBackend
+makes, so the backend can be tested without Maya. Meshes are stored as
+their base vertex positions plus a tweak per vertex, like a Maya mesh's
+.vt and .pnts attributes.
+
+The landscaperCommands plugin commands are faked too: they take their
+arrays from meshSync.commandArguments like the real ones.
+
+"""
+import re
+
+import numpy as np
+
+import meshSync
+
+
+class FakeCmds(object):
+    ''' Stand-in for maya.cmds holding meshes in dictionaries
+
+    meshes:       Dictionary of each mesh's transform name to its {'shape', 'base', 'tweaks', 'faceCounts', 'faceConnects', 'uvs'} dictionary
+    instances:    Dictionary of each instance's name to its {'prototype', 'translation', 'rotation', 'scale', 'group'} dictionary
+    plugins:      List of the paths of the loaded plugins
+    calls:        List of the name of every command called, in order
+    '''
+    def __init__(self):
+        self.meshes = {}
+        self.instances = {}
+        self.plugins = []
+        self.calls = []
+
+    def addMesh(self, name, points, faceCounts=(), faceConnects=(), uvs=None):
+        ''' Adds a mesh with the (n, 3) points as its base positions and no tweaks '''
+        points = np.array(points, dtype=np.float64).reshape(-1, 3)
+        self.meshes[name] = {'shape': name + 'Shape', 'base': points, 'tweaks': np.zeros_like(points),
+                             'faceCounts': list(faceCounts), 'faceConnects': list(faceConnects), 'uvs': uvs}
+
+    def mesh(self, name):
+        ''' Returns the dictionary of the mesh with the transform or shape name '''
+        for transform, mesh in self.meshes.items():
+            if name in (transform, mesh['shape']):
+                return mesh
+        raise ValueError('No object matches name: ' + name)
+
+    def plug(self, attribute):
+        ''' Splits 'mesh.attr[first:last]' into (mesh dictionary, 'attr', slice), [*] meaning every element '''
+        node, name = attribute.split('.', 1)
+        match = re.match(r'(\w+)\[(\*|(\d+)(?::(\d+))?)\]$', name)
+        if match is None:
+            return self.mesh(node), name, slice(None)
+        if match.group(2) == '*':
+            return self.mesh(node), match.group(1), slice(None)
+        first = int(match.group(3))
+        last = int(match.group(4)) if match.group(4) else first
+        return self.mesh(node), match.group(1), slice(first, last + 1)
+
+    def listRelatives(self, name, shapes=False, fullPath=False):
+        self.calls.append('listRelatives')
+        if shapes and name in self.meshes:
+            return [self.meshes[name]['shape']]
+        return None
+
+    def polyEvaluate(self, name, v=False):
+        self.calls.append('polyEvaluate')
+        return len(self.mesh(name)['base'])
+
+    def xform(self, name, q=False, t=False, os=False):
+        self.calls.append('xform')
+        mesh, attribute, vertices = self.plug(name)
+        assert q and t and os and attribute == 'vtx'
+        return (mesh['base'] + mesh['tweaks'])[vertices].ravel().tolist()
+
+    def getAttr(self, name):
+        self.calls.append('getAttr')
+        mesh, attribute, vertices = self.plug(name)
+        assert attribute == 'vt'
+        return [tuple(point) for point in mesh['base'][vertices].tolist()]
+
+    def setAttr(self, name, *values, **flags):
+        self.calls.append('setAttr')
+        mesh, attribute, vertices = self.plug(name)
+        assert attribute == 'pnts'
+        mesh['tweaks'][vertices] = np.array(values, dtype=np.float64).reshape(-1, 3)
+
+    def polyInfo(self, name, fv=False):
+        self.calls.append('polyInfo')
+        mesh = self.mesh(name)
+        lines = []
+        start = 0
+        for face, count in enumerate(mesh['faceCounts']):
+            vertices = ''.join('%6d' % vertex for vertex in mesh['faceConnects'][start:start + count])
+            lines.append('FACE %5d:%s \n' % (face, vertices))
+            start += count
+        return lines
+
+    def pluginInfo(self, name, q=False, loaded=False):
+        self.calls.append('pluginInfo')
+        return any(path.endswith(name + '.py') for path in self.plugins)
+
+    def loadPlugin(self, path):
+        self.calls.append('loadPlugin')
+        self.plugins.append(path)
+
+    def landscaperCreateMesh(self):
+        self.calls.append('landscaperCreateMesh')
+        name, points, faceCounts, faceConnects, uvs = meshSync.commandArguments('landscaperCreateMesh')
+        self.addMesh(name, points, faceCounts, faceConnects, uvs)
+        return name
+
+    def landscaperCreateInstances(self):
+        self.calls.append('landscaperCreateInstances')
+        prototypes, translations, rotations, scales, namePrefix, group, firstNumber = meshSync.commandArguments('landscaperCreateInstances')
+        names = []
+        for i, transform in enumerate(zip(prototypes, translations, rotations, scales)):
+            name = namePrefix + str(firstNumber + i)
+            self.instances[name] = dict(zip(('prototype', 'translation', 'rotation', 'scale'), transform), group=group)
+            names.append(name)
+        return names
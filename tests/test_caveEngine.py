@@ -0,0 +1,29 @@
+"""Landscaper cave tests
+
+"""
+import numpy as np
+
+import caveEngine
+import meshBuild
+from test_meshBuild import assertClosed, signedVolume
+
+
+def testCaveMeshesAreManifold():
+    for seed in range(40):
+        points, faceCounts, faceConnects = caveEngine.caveMesh(caveEngine.caveSpheres(3, 1.5, 12, seed))
+        assertClosed(points, faceCounts, faceConnects) #every edge on exactly two faces, so polyCBoolOp can cut it out
+        assert signedVolume(points, faceCounts, faceConnects) > 0
+
+def testIsosurfaceOfSphere():
+    axis = np.linspace(-2, 2, 21)
+    x, y, z = np.meshgrid(axis, axis, axis, indexing='ij', sparse=True)
+    points, faceCounts, faceConnects = meshBuild.isosurface(np.sqrt(x ** 2 + y ** 2 + z ** 2) - 1.5, (-2, -2, -2), 0.2)
+    assertClosed(points, faceCounts, faceConnects)
+    assert np.allclose(np.sqrt((points ** 2).sum(axis=1)), 1.5, atol=0.05)
+    assert np.isclose(signedVolume(points, faceCounts, faceConnects), 4.0 / 3.0 * np.pi * 1.5 ** 3, rtol=0.05)
+
+def testTouchingBlobsStayManifold():
+    field = np.ones((6, 5, 5))
+    field[1:3, 1:3, 1:3] = -1
+    field[3:5, 3, 3] = -1 #a second blob only meeting the first along a voxel's diagonal
+    assertClosed(*meshBuild.isosurface(field, (0, 0, 0), 1.0))
@@ -0,0 +1,23 @@
+"""Landscaper erosion tests
+
+"""
+import numpy as np
+
+import erosionEngine
+import heightfield
+
+
+def testErosionConservesTotalHeight():
+    heights = heightfield.diamondSquare(5, 0, 8, 3, 5, seed=2) * 2
+    for eroded in (erosionEngine.hydraulicErosion(heights, 40), erosionEngine.thermalErosion(heights, 40, 20.0 / 32),
+                   erosionEngine.erodeHeights(heights, 20, 20)):
+        assert eroded.shape == heights.shape
+        assert eroded.dtype == heights.dtype
+        assert np.isclose(eroded.sum(dtype=np.float64), heights.sum(dtype=np.float64), rtol=1e-4)
+        assert not np.array_equal(eroded, heights)
+
+def testThermalErosionFlattensSteepSlopes():
+    cliff = np.zeros((9, 9), dtype=np.float32)
+    cliff[:, 4:] = 10
+    eroded = erosionEngine.thermalErosion(cliff, 200, 1.0, talusAngle=35.0)
+    assert np.abs(np.diff(eroded, axis=1)).max() < np.abs(np.diff(cliff, axis=1)).max()
@@ -0,0 +1,68 @@
+"""Landscaper heightfield tests
+
+"""
+import numpy as np
+
+import heightfield
+
+
+class ConstantState(np.random.RandomState):
+    ''' RandomState whose random_sample is always the same value, so the loop and the arrays add the same offsets '''
+    def __init__(self, value):
+        np.random.RandomState.__init__(self, 0)
+        self.value = value
+
+    def random_sample(self, size=None):
+        return np.full(size, self.value)
+
+
+def loopDiamondSquare(n, c1Height, c2Height, c3Height, c4Height, offset):
+    ''' The per-cell diamond square loop diamondSquare replaced (calculateSquareCentre / calculateDiamondCentre),
+    with a constant offset instead of random.random()
+    '''
+    width = height = 2 ** n + 1
+    terrainData = [0.0] * width * height
+    terrainData[0] = c1Height
+    terrainData[width - 1] = c2Height
+    terrainData[(height - 1) * width] = c4Height
+    terrainData[height * width - 1] = c3Height
+    for i in range(n, 0, -1):
+        blockSize = 2 ** i
+        num = 2 ** (n - i)
+        for j in range(num):
+            for k in range(num):
+                x, y = j * blockSize, k * blockSize
+                terrainData[x + blockSize // 2 + (y + blockSize // 2) * width] = 0.25 * (
+                    terrainData[x + y * width] + terrainData[x + blockSize + y * width] +
+                    terrainData[x + (y + blockSize) * width] + terrainData[x + blockSize + (y + blockSize) * width]) + offset
+        num = 2 ** (n - i + 1) + 1
+        half = blockSize // 2
+        for j in range(num):
+            for k in range(num):
+                if (j + k) % 2 == 1:
+                    x, y = j * half, k * half
+                    total, count = 0.0, 0
+                    if x > 0:
+                        total, count = total + terrainData[x - half + y * width], count + 1
+                    if y > 0:
+                        total, count = total + terrainData[x + (y - half) * width], count + 1
+                    if x < width - 1:
+                        total, count = total + terrainData[x + half + y * width], count + 1
+                    if y < height - 1:
+                        total, count = total + terrainData[x + (y + half) * width], count + 1
+                    terrainData[x + y * width] = total / count + offset
+    return np.array(terrainData).reshape(height, width)
+
+
+def testDiamondSquareMatchesLoop():
+    for n, corners, offset in ((1, (1, 2, 3, 4), 0.0), (4, (0, 8, 3, 5), 0.5), (6, (7, 1, 0, 2), 0.25)):
+        heights = heightfield.diamondSquare(n, *corners, seed=ConstantState(offset))
+        assert heights.shape == (2 ** n + 1, 2 ** n + 1)
+        assert heights.dtype == np.float32
+        np.testing.assert_allclose(heights, loopDiamondSquare(n, *(corners + (offset,))), rtol=1e-5, atol=1e-5)
+
+def testDiamondSquareSeeded():
+    first = heightfield.diamondSquare(5, 1, 2, 3, 4, seed=7)
+    assert np.array_equal(first, heightfield.diamondSquare(5, 1, 2, 3, 4, seed=7))
+    assert not np.array_equal(first, heightfield.diamondSquare(5, 1, 2, 3, 4, seed=8))
+    assert (first[0, 0], first[0, -1], first[-1, -1], first[-1, 0]) == (1, 2, 3, 4)
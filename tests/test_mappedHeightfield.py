@@ -0,0 +1,37 @@
+"""Landscaper memory mapped heightfield tests
+
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+import heightfield
+import mappedHeightfield
+
+
+def roundTrip(dtype, extension):
+    ''' Saves a terrain 35 units wide and reopens it, returns (heights, reopened shape, reopened size, reopened heights) '''
+    folder = tempfile.mkdtemp()
+    try:
+        heights = heightfield.diamondSquare(4, 0, 8, 3, 5, seed=3)
+        path = os.path.join(folder, 'terrain' + extension)
+        mappedHeightfield.saveHeightfield(path, heights, dtype, 35.0, blockRows=5)
+        field = mappedHeightfield.openHeightfieldFile(path)
+        return heights, field.shape, field.size, field[:, :]
+    finally:
+        shutil.rmtree(folder)
+
+
+def testFloat32RoundTripKeepsSize():
+    heights, shape, size, loaded = roundTrip('float32', '.npy')
+    assert shape == heights.shape
+    assert size == 35.0
+    assert np.array_equal(loaded, heights)
+
+def testUint16RoundTrip():
+    heights, shape, size, loaded = roundTrip('uint16', '.raw')
+    assert shape == heights.shape
+    assert size == 35.0
+    assert np.abs(loaded - heights).max() <= (heights.max() - heights.min()) / 65535.0
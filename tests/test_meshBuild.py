@@ -0,0 +1,48 @@
+"""Landscaper mesh builder tests
+
+"""
+import numpy as np
+
+import heightfield
+import meshBuild
+import topology
+
+
+def signedVolume(points, faceCounts, faceConnects):
+    ''' Returns the volume a closed mesh encloses, negative if its faces point inwards
+
+    Each face is split into a fan of triangles from its first corner (the fan's first and last triangles are flat).
+    '''
+    index = topology.TopologyIndex(faceCounts, faceConnects, len(points))
+    points = np.asarray(points, dtype=np.float64)
+    first = points[np.repeat(index.faceConnects[index.faceStarts[:-1]], index.faceCounts)]
+    corners = points[index.faceConnects]
+    nextCorners = points[index.faceConnects[index.nextCorner]]
+    return np.einsum('ij,ij->i', first, np.cross(corners, nextCorners)).sum() / 6.0
+
+def assertClosed(points, faceCounts, faceConnects):
+    ''' Every edge has exactly two faces, which go along it in opposite directions (so the normals agree) '''
+    index = topology.TopologyIndex(faceCounts, faceConnects, len(points))
+    assert np.all(index.edgeFaces == 2)
+    directed = index.faceConnects * len(points) + index.faceConnects[index.nextCorner]
+    assert len(np.unique(directed)) == len(directed)
+
+
+def testClosedSolidIsWatertight():
+    heights = heightfield.diamondSquare(4, 0, 8, 3, 5, seed=1)
+    solid = meshBuild.closedSolid(heightfield.gridPoints(heights), topology.gridTopology(16, 16), -10)
+    assertClosed(*solid)
+    assert signedVolume(*solid) > 0
+    assert len(solid[0]) == 2 * 17 * 17
+
+def testClosedSolidVolume():
+    flat = heightfield.gridPoints(np.full((9, 9), 2.0))
+    solid = meshBuild.closedSolid(flat, topology.gridTopology(8, 8), -10)
+    assert np.isclose(signedVolume(*solid), 20 * 20 * 12)
+    assert np.all(solid[0][81:, 1] == -10)
+
+def testPlanarUVsMatchPolyPlane():
+    uvs = meshBuild.planarUVs(heightfield.gridPoints(np.zeros((3, 3))))
+    assert np.allclose(uvs[0], (0, 0)) #-x +z corner
+    assert np.allclose(uvs[8], (1, 1)) #+x -z corner
+    assert np.allclose(uvs[1], (0.5, 0))
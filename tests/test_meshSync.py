@@ -0,0 +1,110 @@
+"""Landscaper mesh sync tests
+
+CmdsBackend runs on a FakeCmds stand-in for maya.cmds.
+
+"""
+import numpy as np
+
+import meshSync
+import topology
+from fakeCmds import FakeCmds
+
+
+def makeBackend(points, faceCounts=(), faceConnects=()):
+    ''' Returns (fake cmds, CmdsBackend) with the points as a mesh named terrain '''
+    cmds = FakeCmds()
+    cmds.addMesh('terrain', points, faceCounts, faceConnects)
+    return cmds, meshSync.CmdsBackend(cmds)
+
+def gridPoints():
+    ''' Returns the (9, 3) points of a 3 x 3 vertex plane '''
+    rows, columns = np.mgrid[0:3, 0:3]
+    return np.stack((columns.ravel(), np.zeros(9), rows.ravel()), axis=1).astype(np.float64)
+
+
+def testGetPointsIncludesTweaks():
+    cmds, backend = makeBackend(gridPoints())
+    cmds.meshes['terrain']['tweaks'][4] = (0, 2.5, 0)
+    points = backend.getPoints('terrain')
+    assert points.shape == (9, 3)
+    expected = gridPoints()
+    expected[4, 1] = 2.5
+    assert np.array_equal(points, expected)
+    assert backend.vertexCount('terrain') == 9
+
+def testSetPointsIsOneSetAttr():
+    cmds, backend = makeBackend(gridPoints())
+    points = gridPoints()
+    points[:, 1] = np.arange(9) * 0.5
+    backend.setPoints('terrain', points)
+    assert cmds.calls.count('setAttr') == 1 #one undo entry however many vertices move
+    assert np.array_equal(cmds.meshes['terrain']['base'], gridPoints()) #only the tweaks change
+    assert np.array_equal(backend.getPoints('terrain'), points)
+
+def testModuleFunctionsUseBackend():
+    cmds, backend = makeBackend(gridPoints())
+    meshSync.setBackend(backend)
+    try:
+        points = meshSync.getPoints('terrain')
+        points[:, 1] += 1
+        meshSync.setPoints('terrain', points)
+        assert np.array_equal(meshSync.getPoints('terrain'), points)
+    finally:
+        meshSync.setBackend(None)
+
+def testGetFaceVertices():
+    faceCounts, faceConnects = topology.gridFaces(2, 2)
+    faceCounts, faceConnects = np.append(faceCounts, 3), np.append(faceConnects, (0, 4, 8)) #a triangle on top of the quads
+    cmds, backend = makeBackend(gridPoints(), faceCounts, faceConnects)
+    counts, connects = backend.getFaceVertices('terrain')
+    assert np.array_equal(counts, faceCounts)
+    assert np.array_equal(connects, faceConnects)
+    assert cmds.calls.count('polyInfo') == 1
+
+def testGetTopologyIsCached():
+    cmds, backend = makeBackend(gridPoints(), *topology.gridFaces(2, 2))
+    meshSync.setBackend(backend)
+    try:
+        index = topology.getTopology('terrain')
+        assert topology.getTopology('terrain') is index
+        assert cmds.calls.count('polyInfo') == 1
+        assert list(np.nonzero(~index.boundary)[0]) == [4]
+    finally:
+        meshSync.setBackend(None)
+        topology.invalidate('terrain')
+
+def testCreateInstancesIsOnePluginCommand():
+    cmds, backend = makeBackend(gridPoints())
+    translations = np.arange(9, dtype=np.float64).reshape(3, 3)
+    rotations = np.zeros((3, 3))
+    scales = np.full((3, 3), 0.5)
+    names = backend.createInstances(['tallTree', 'smallTree', 'tallTree'], translations, rotations, scales, 'Tree', 'Trees', 4)
+    assert names == ['Tree4', 'Tree5', 'Tree6']
+    assert cmds.instances['Tree5']['prototype'] == 'smallTree'
+    assert cmds.instances['Tree6']['translation'] == [6, 7, 8]
+    assert cmds.instances['Tree6']['group'] == 'Trees'
+    backend.createInstances(['tallTree'], translations[:1], rotations[:1], scales[:1], 'Tree', 'Trees', 7)
+    assert cmds.plugins == [meshSync.PLUGIN_PATH] #loaded once
+    assert cmds.calls.count('landscaperCreateInstances') == 2 #one undo entry per batch
+    assert meshSync._commandArguments == {}
+
+def testCreateMeshIsOnePluginCommand():
+    cmds, backend = makeBackend(gridPoints())
+    faceCounts, faceConnects = topology.gridFaces(2, 2)
+    uvs = gridPoints()[:, [0, 2]] / 2
+    assert backend.createMesh('water', gridPoints() - 1, faceCounts, faceConnects, uvs) == 'water'
+    assert cmds.calls.count('landscaperCreateMesh') == 1
+    assert np.array_equal(backend.getPoints('water'), gridPoints() - 1)
+    assert np.array_equal(backend.getFaceVertices('water')[1], faceConnects)
+    assert cmds.meshes['water']['uvs'] == (list(uvs[:, 0]), list(uvs[:, 1]))
+    backend.createMesh('lake', gridPoints(), faceCounts, faceConnects)
+    assert cmds.meshes['lake']['uvs'] is None
+    assert cmds.plugins == [meshSync.PLUGIN_PATH]
+
+def testSoftSelectWeights():
+    points = gridPoints()
+    weights = meshSync.softSelectWeights(points, [4], 1.5)
+    assert weights[4] == 1.0
+    assert np.all((weights[[1, 3, 5, 7]] > 0) & (weights[[1, 3, 5, 7]] < 1))
+    assert np.all(weights[[0, 2, 6, 8]] < weights[1]) #further away, smaller weight
+    assert np.array_equal(meshSync.softSelectWeights(points, [4], 0), np.eye(9)[4])
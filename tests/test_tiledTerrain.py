@@ -0,0 +1,20 @@
+"""Landscaper tiled terrain tests
+
+"""
+import numpy as np
+
+import tiledTerrain
+
+
+def testNeighbouringTilesShareEdges():
+    tiles = dict(((column, row), tiledTerrain.generateTile(5, 4, column, row)) for column in (-1, 0, 1) for row in (0, 1))
+    for (column, row), heights in tiles.items():
+        assert heights.shape == (17, 17)
+        if (column + 1, row) in tiles:
+            assert np.array_equal(heights[:, -1], tiles[column + 1, row][:, 0])
+        if (column, row + 1) in tiles:
+            assert np.array_equal(heights[-1], tiles[column, row + 1][0])
+
+def testTilesDependOnlyOnPosition():
+    assert np.array_equal(tiledTerrain.generateTile(5, 4, 2, 3), tiledTerrain.generateTile(5, 4, 2, 3))
+    assert not np.array_equal(tiledTerrain.generateTile(5, 4, 2, 3), tiledTerrain.generateTile(6, 4, 2, 3))
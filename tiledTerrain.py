@@ -0,0 +1,168 @@
+"""Landscaper tiled terrain
+
+Splits a world bigger than one grid into diamond square tiles that can be
+generated independently (and in parallel) but still join up seamlessly.
+
+Every tile corner and every tile edge gets its own seed made from the world
+seed and its position, so the two tiles either side of an edge compute the
+exact same border heights (corners from the corner seeds, edges by 1D
+midpoint displacement between them). Each tile then runs diamond square with
+its border fixed to those edges.
+
+Tile (column, row) covers one 20x20 terrain, column increasing along +x and
+row along -z like the rows of the terrain plane.
+
+usage: python tiledTerrain.py 8x8 --n 7 --seed 3 --out world --workers 8
+
+With --world the tiles are instead written into one memory mapped
+heightfield file (see mappedHeightfield.py) covering the whole world.
+
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+import heightfield
+import mappedHeightfield
+
+TILE_SIZE = 20.0
+MAX_CORNER_HEIGHT = 9 #corner heights are drawn like the random terrain's, integers in [0, 9)
+
+
+def featureSeed(worldSeed, kind, *position):
+    ''' Returns the integer seed of one corner, edge or tile of the world
+
+    Made from a hash rather than hash() so every process (and python 2 and 3) agrees on it.
+
+    kind:        String 'corner', 'horizontalEdge', 'verticalEdge' or 'tile'
+    position:    Integer lattice coordinates of the feature
+    '''
+    description = json.dumps([worldSeed, kind] + list(position))
+    return int(hashlib.sha1(description.encode('utf-8')).hexdigest()[:8], 16)
+
+def cornerHeight(worldSeed, column, row):
+    ''' Returns the height of the tile corner at lattice point (column, row) '''
+    return heightfield.getRandomState(featureSeed(worldSeed, 'corner', column, row)).randint(0, MAX_CORNER_HEIGHT)
+
+def tileEdges(worldSeed, n, column, row):
+    ''' Returns the (top row, bottom row, left column, right column) border of a tile
+
+    Horizontal edge (column, row) runs from corner (column, row) to (column+1, row),
+    vertical edge (column, row) from corner (column, row) to (column, row+1).
+    '''
+    def horizontal(c, r):
+        return heightfield.midpointDisplacement(n, cornerHeight(worldSeed, c, r), cornerHeight(worldSeed, c + 1, r),
+                                                featureSeed(worldSeed, 'horizontalEdge', c, r))
+
+    def vertical(c, r):
+        return heightfield.midpointDisplacement(n, cornerHeight(worldSeed, c, r), cornerHeight(worldSeed, c, r + 1),
+                                                featureSeed(worldSeed, 'verticalEdge', c, r))
+
+    return horizontal(column, row), horizontal(column, row + 1), vertical(column, row), vertical(column + 1, row)
+
+def generateTile(worldSeed, n, column, row):
+    ''' Returns the (2**n + 1) x (2**n + 1) float32 heights of one tile, needing nothing but its position '''
+    edges = tileEdges(worldSeed, n, column, row)
+    top, bottom = edges[0], edges[1]
+    return heightfield.diamondSquare(n, top[0], top[-1], bottom[-1], bottom[0],
+                                     featureSeed(worldSeed, 'tile', column, row), edges)
+
+def tileOffset(column, row, size=TILE_SIZE):
+    ''' Returns the (x, z) centre of a tile in world units '''
+    return column * size, -row * size
+
+def tilePath(folder, column, row):
+    ''' Returns the path a tile's heights are saved to '''
+    return os.path.join(folder, 'tile_%d_%d.npy' % (column, row))
+
+def saveTile(job):
+    ''' Worker function: generates one tile and saves it as .npy, returns (column, row, path, seconds)
+
+    job:    Tuple of (worldSeed, n, column, row, folder)
+    '''
+    worldSeed, n, column, row, folder = job
+    start = time.time()
+    path = tilePath(folder, column, row)
+    np.save(path, generateTile(worldSeed, n, column, row))
+    return column, row, path, time.time() - start
+
+def heightRange(n):
+    ''' Returns the (lowest, highest) height a tile can have: the corners plus at most 1 of noise per level '''
+    return 0.0, float(MAX_CORNER_HEIGHT - 1 + n)
+
+def writeTileToWorld(job):
+    ''' Worker function: generates one tile and writes it into its window of the world file, returns (column, row, path, seconds)
+
+    Neighbouring tiles write the same values to their shared border, so the order they are written in doesn't matter.
+
+    job:    Tuple of (worldSeed, n, column, row, path)
+    '''
+    worldSeed, n, column, row, path = job
+    start = time.time()
+    world = mappedHeightfield.openHeightfieldFile(path, 'r+')
+    world.writeWindow(row * 2 ** n, column * 2 ** n, generateTile(worldSeed, n, column, row))
+    world.flush()
+    return column, row, path, time.time() - start
+
+def runJobs(function, jobs, workers=None):
+    ''' Runs the tile jobs across a pool of worker processes, printing each as it finishes '''
+    pool = multiprocessing.Pool(max(1, workers or multiprocessing.cpu_count()))
+    try:
+        for column, row, path, seconds in pool.imap_unordered(function, jobs):
+            print('tile %d %d -> %s (%.2fs)' % (column, row, path, seconds))
+    finally:
+        pool.close()
+        pool.join()
+
+def generateWorldFile(worldSeed, n, columns, rows, path, dtype='float32', workers=None):
+    ''' Generates every tile of a world straight into one memory mapped heightfield file, returns it opened for reading
+
+    The world is (rows * 2**n + 1) x (columns * 2**n + 1) samples and never has to fit in memory.
+    '''
+    lowest, highest = heightRange(n)
+    mappedHeightfield.createHeightfieldFile(path, rows * 2 ** n + 1, columns * 2 ** n + 1, dtype, lowest, highest,
+                                            columns * TILE_SIZE).flush() #size is the world's width, its depth follows from the spacing
+    runJobs(writeTileToWorld, [(worldSeed, n, column, row, path) for row in range(rows) for column in range(columns)], workers)
+    return mappedHeightfield.openHeightfieldFile(path)
+
+def generateTiles(worldSeed, n, columns, rows, folder, workers=None):
+    ''' Generates and saves every tile of a columns x rows world across a pool of worker processes
+
+    Writes world.json next to the tiles describing the world, returns the list of tile paths
+    '''
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    with open(os.path.join(folder, 'world.json'), 'w') as worldFile:
+        json.dump({'seed': worldSeed, 'n': n, 'columns': columns, 'rows': rows, 'tileSize': TILE_SIZE}, worldFile)
+    jobs = [(worldSeed, n, column, row, folder) for row in range(rows) for column in range(columns)]
+    runJobs(saveTile, jobs, workers)
+    return [tilePath(folder, column, row) for row in range(rows) for column in range(columns)]
+
+def main(arguments=None):
+    ''' Command line entry point '''
+    parser = argparse.ArgumentParser(description='Generate a seamless tiled Landscaper world without Maya.')
+    parser.add_argument('tiles', help="n.o. tiles as columns x rows, e.g. '8x8'")
+    parser.add_argument('--n', type=int, default=7, help='diamond square levels per tile (default: 7, 129x129 heights)')
+    parser.add_argument('--seed', type=int, default=0, help='world seed (default: 0)')
+    parser.add_argument('--out', default='world', help='output folder (default: world)')
+    parser.add_argument('--world', help='write the whole world into this one heightfield file (.npy or raw) instead of tile files')
+    parser.add_argument('--uint16', action='store_true', help='store the --world file as uint16 instead of float32')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help='n.o. worker processes (default: all cores)')
+    arguments = parser.parse_args(arguments)
+
+    columns, rows = [int(count) for count in arguments.tiles.lower().split('x')]
+    start = time.time()
+    if arguments.world:
+        generateWorldFile(arguments.seed, arguments.n, columns, rows, arguments.world,
+                          'uint16' if arguments.uint16 else 'float32', arguments.workers)
+    else:
+        generateTiles(arguments.seed, arguments.n, columns, rows, arguments.out, arguments.workers)
+    print('%d tiles in %.1fs' % (columns * rows, time.time() - start))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""Landscaper topology index
+
+Vertex connectivity of a mesh (neighbours, boundary and corner vertices)
+built once from its face-vertex lists, instead of selecting vertices and
+parsing polyInfo output one at a time.
+
+"""
+import numpy as np
+
+import meshSync
+
+
+class TopologyIndex(object):
+    ''' Connectivity tables of a polygon mesh
+
+    faceCounts:      Integer array of the n.o. vertices on each face
+    faceConnects:    Integer array of every face's vertex indices, one face after the other
+    vertexCount:     Integer n.o. vertices on the mesh
+
+    faceStarts:      Array where face f's vertices are faceConnects[faceStarts[f]:faceStarts[f+1]]
+    nextCorner:      Array of the position in faceConnects of the next vertex round the same face
+    edges:           (e, 2) array of the unique edges, smaller vertex index first
+    edgeFaces:       Array of the n.o. faces sharing each edge (1 means the edge is on the border)
+    neighbourStarts: Array where vertex v's neighbours are neighbourIndices[neighbourStarts[v]:neighbourStarts[v+1]]
+    valence:         Array of the n.o. edges connected to each vertex
+    boundary:        Boolean array, True for vertices on the outer edge of the mesh
+    corner:          Boolean array, True for border vertices with only two edges
+    '''
+    def __init__(self, faceCounts, faceConnects, vertexCount):
+        self.vertexCount = int(vertexCount)
+        self.faceCounts = np.asarray(faceCounts, dtype=np.int64)
+        self.faceConnects = np.asarray(faceConnects, dtype=np.int64)
+        self.faceStarts = np.concatenate(([0], np.cumsum(self.faceCounts)))
+
+        # each face corner makes an edge with the next corner of the same face (wrapping round at the end)
+        self.nextCorner = np.arange(1, len(self.faceConnects) + 1)
+        self.nextCorner[self.faceStarts[1:] - 1] = self.faceStarts[:-1]
+        start = self.faceConnects
+        end = self.faceConnects[self.nextCorner]
+        keys = np.minimum(start, end) * self.vertexCount + np.maximum(start, end)
+        keys, self.edgeFaces = np.unique(keys, return_counts=True)
+        self.edges = np.stack((keys // self.vertexCount, keys % self.vertexCount), axis=1)
+
+        # neighbour lists, sorted by vertex so each vertex's neighbours are one slice
+        both = np.concatenate((self.edges, self.edges[:, ::-1]))
+        order = np.argsort(both[:, 0], kind='mergesort')
+        self.neighbourIndices = both[order, 1]
+        self.valence = np.bincount(both[:, 0], minlength=self.vertexCount)
+        self.neighbourStarts = np.concatenate(([0], np.cumsum(self.valence)))
+
+        self.boundary = np.zeros(self.vertexCount, dtype=bool)
+        self.boundary[self.edges[self.edgeFaces == 1].ravel()] = True
+        self.corner = self.boundary & (self.valence <= 2)
+
+    def isBoundary(self, vtx):
+        ''' Returns True if the vertex is on the outer edge of the mesh '''
+        return bool(self.boundary[vtx])
+
+    def isCorner(self, vtx):
+        ''' Returns True if the vertex is a corner of the mesh '''
+        return bool(self.corner[vtx])
+
+    def neighbours(self, vtx):
+        ''' Returns an array of the vertices sharing an edge with the vertex '''
+        return self.neighbourIndices[self.neighbourStarts[vtx]:self.neighbourStarts[vtx + 1]]
+
+    def faceVertices(self, face):
+        ''' Returns an array of the face's vertices '''
+        return self.faceConnects[self.faceStarts[face]:self.faceStarts[face + 1]]
+
+    def triangles(self):
+        ''' Returns a (t, 3) array of the vertices of every face split into a fan of triangles '''
+        triangleCounts = np.maximum(self.faceCounts - 2, 0)
+        first = np.repeat(self.faceStarts[:-1], triangleCounts)
+        step = np.arange(triangleCounts.sum()) - np.repeat(np.cumsum(triangleCounts) - triangleCounts, triangleCounts) + 1
+        return np.stack((self.faceConnects[first], self.faceConnects[first + step], self.faceConnects[first + step + 1]), axis=1)
+
+    def vertexNormals(self, points):
+        ''' Returns an (n, 3) array of unit vertex normals for the (n, 3) points array
+
+        faceNormals:    (f, 3) array of area weighted face normals (Newell's method, works for any polygon)
+        '''
+        points = np.asarray(points, dtype=np.float64)
+        corners = points[self.faceConnects]
+        crosses = np.cross(corners, points[self.faceConnects[self.nextCorner]])
+        faceNormals = np.add.reduceat(crosses, self.faceStarts[:-1], axis=0)
+        normals = np.zeros((self.vertexCount, 3))
+        np.add.at(normals, self.faceConnects, np.repeat(faceNormals, self.faceCounts, axis=0))
+        lengths = np.sqrt((normals ** 2).sum(axis=1))
+        lengths[lengths == 0] = 1.0
+        return normals / lengths[:, None]
+
+    def classify(self, vtx):
+        ''' Returns 'Inside', 'Edge' or 'Corner' depending on where the vertex is on the mesh '''
+        if self.corner[vtx]:
+            return 'Corner'
+        elif self.boundary[vtx]:
+            return 'Edge'
+        return 'Inside'
+
+
+def gridFaces(subdx, subdy):
+    ''' Returns the (faceCounts, faceConnects) arrays of a polyPlane with subdx by subdy faces
+
+    Vertex row*(subdx+1) + column sits on row `row` and column `column` of the plane,
+    with row 0 along the +z edge and column 0 along the -x edge (the polyPlane layout).
+    '''
+    width = subdx + 1
+    rows, columns = np.mgrid[0:subdy, 0:subdx]
+    first = (rows * width + columns).ravel()
+    faceConnects = np.stack((first, first + 1, first + width + 1, first + width), axis=1).ravel()
+    return np.full(subdx * subdy, 4, dtype=np.int64), faceConnects
+
+def gridTopology(subdx, subdy):
+    ''' Returns the TopologyIndex of a polyPlane with subdx by subdy faces, without querying Maya '''
+    faceCounts, faceConnects = gridFaces(subdx, subdy)
+    return TopologyIndex(faceCounts, faceConnects, (subdx + 1) * (subdy + 1))
+
+
+_topologies = {}
+
+def registerGrid(mesh, subdx, subdy):
+    ''' Stores the analytic topology of a freshly created polyPlane '''
+    _topologies[mesh] = gridTopology(subdx, subdy)
+
+def invalidate(mesh=None):
+    ''' Forgets the cached topology of the mesh (or every mesh if None is passed) '''
+    if mesh is None:
+        _topologies.clear()
+    else:
+        _topologies.pop(mesh, None)
+
+def getTopology(mesh):
+    ''' Returns the cached TopologyIndex of the mesh, rebuilding it if the vertex count changed
+
+    vertexCount:    Integer n.o. vertices the mesh has now
+    '''
+    vertexCount = meshSync.vertexCount(mesh)
+    index = _topologies.get(mesh)
+    if index is None or index.vertexCount != vertexCount:
+        faceCounts, faceConnects = meshSync.getFaceVertices(mesh)
+        index = TopologyIndex(faceCounts, faceConnects, vertexCount)
+        _topologies[mesh] = index
+    return index